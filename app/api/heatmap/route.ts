@@ -2,23 +2,63 @@ import { NextRequest, NextResponse } from 'next/server';
 import { spawn } from 'child_process';
 import path from 'path';
 import fs from 'fs';
+import { heatmapWorkerPool } from '@/lib/heatmap-worker-pool';
+import { forwardPythonStderr } from '@/lib/stage-timing';
 
 export const maxDuration = 60; // 60 segundos para Vercel Pro
 
+// Pool de workers Python en caliente (HEATMAP_WORKER_POOL=0 vuelve a un proceso por petición)
+const USE_WORKER_POOL = process.env.HEATMAP_WORKER_POOL !== '0';
+
 export async function POST(request: NextRequest) {
   try {
     const body = await request.json();
-    const { jsonFile, team = 'HOME' } = body;
+    const {
+      jsonFile,
+      team = 'HOME',
+      stream = false,
+      deadline,
+      live = false,
+      session,
+      actions,
+      statsOnly = false,
+    } = body;
 
-    if (!jsonFile) {
+    // El modo directo puede recibir solo acciones nuevas de una sesión ya abierta
+    const liveSession = live && USE_WORKER_POOL;
+    if (!jsonFile && !(liveSession && session)) {
       return NextResponse.json(
         { error: 'jsonFile path is required' },
         { status: 400 }
       );
     }
 
+    // Modo directo: solo se recalculan los jugadores con acciones nuevas
+    if (liveSession) {
+      const result = await heatmapWorkerPool.run({ jsonFile, team, live, session, actions });
+      // Sesión perdida en el worker: el cliente debe reenviar con jsonFile
+      return NextResponse.json(result, { status: result?.resync_required ? 409 : 200 });
+    }
+
+    // Solo estadísticas: sin render ni caché, responde en decenas de ms
+    if (statsOnly) {
+      const result = USE_WORKER_POOL
+        ? await heatmapWorkerPool.run({ jsonFile, team, statsOnly })
+        : await runPythonScript(jsonFile, team, ['--stats-only']);
+      return NextResponse.json(result);
+    }
+
+    // Modo streaming: una línea NDJSON por artefacto en cuanto está listo
+    if (stream) {
+      return new Response(streamHeatmaps(jsonFile, team, deadline), {
+        headers: { 'Content-Type': 'application/x-ndjson; charset=utf-8' },
+      });
+    }
+
     // Ejecutar script Python
-    const result = await runPythonScript(jsonFile, team);
+    const result = USE_WORKER_POOL
+      ? await heatmapWorkerPool.run({ jsonFile, team, deadline })
+      : await runPythonScript(jsonFile, team, deadline ? ['--deadline', String(deadline)] : []);
 
     return NextResponse.json(result);
   } catch (error) {
@@ -30,11 +70,71 @@ export async function POST(request: NextRequest) {
   }
 }
 
-function runPythonScript(jsonFile: string, team: string): Promise<any> {
+function streamHeatmaps(
+  jsonFile: string,
+  team: string,
+  deadline?: number
+): ReadableStream<Uint8Array> {
+  const encoder = new TextEncoder();
+
+  return new ReadableStream<Uint8Array>({
+    start(controller) {
+      let closed = false;
+      const close = () => {
+        if (!closed) {
+          closed = true;
+          controller.close();
+        }
+      };
+      const send = (record: unknown) => {
+        if (!closed) {
+          controller.enqueue(encoder.encode(JSON.stringify(record) + '\n'));
+        }
+      };
+      const fail = (error: Error) => {
+        send({ type: 'error', error: error.message });
+        close();
+      };
+
+      if (USE_WORKER_POOL) {
+        heatmapWorkerPool
+          .stream({ jsonFile, team, deadline }, send)
+          .then(close, fail);
+        return;
+      }
+
+      // Sin pool: el script ya escribe NDJSON, se reenvía tal cual
+      const pythonScript = path.join(process.cwd(), 'scripts', 'generate_heatmap.py');
+      const args = [pythonScript, jsonFile, team, '--stream'];
+      if (deadline) {
+        args.push('--deadline', String(deadline));
+      }
+      const pythonProcess = spawn('python', args, {
+        cwd: process.cwd(),
+        stdio: ['pipe', 'pipe', 'pipe'],
+      });
+
+      pythonProcess.stdout?.on('data', (data: Buffer) => {
+        if (!closed) {
+          controller.enqueue(new Uint8Array(data));
+        }
+      });
+
+      forwardPythonStderr(pythonProcess.stderr, (line) => {
+        console.error('Python error:', line);
+      });
+
+      pythonProcess.on('close', close);
+      pythonProcess.on('error', fail);
+    },
+  });
+}
+
+function runPythonScript(jsonFile: string, team: string, extraArgs: string[] = []): Promise<any> {
   return new Promise((resolve, reject) => {
     const pythonScript = path.join(process.cwd(), 'scripts', 'generate_heatmap.py');
     
-    const pythonProcess = spawn('python', [pythonScript, jsonFile, team], {
+    const pythonProcess = spawn('python', [pythonScript, jsonFile, team, ...extraArgs], {
       cwd: process.cwd(),
       stdio: ['pipe', 'pipe', 'pipe'],
     });
@@ -46,9 +146,9 @@ function runPythonScript(jsonFile: string, team: string): Promise<any> {
       stdout += data.toString();
     });
 
-    pythonProcess.stderr?.on('data', (data: Buffer) => {
-      stderr += data.toString();
-      console.error('Python error:', data.toString());
+    forwardPythonStderr(pythonProcess.stderr, (line) => {
+      stderr += line + '\n';
+      console.error('Python error:', line);
     });
 
     pythonProcess.on('close', (code: number | null) => {
@@ -0,0 +1,90 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { spawn } from 'child_process';
+import path from 'path';
+import { forwardPythonStderr } from '@/lib/stage-timing';
+
+// Los informes largos se ejecutan como trabajos en segundo plano (scripts/report-job.py):
+// POST crea el trabajo y vuelve en seguida; GET consulta el progreso por páginas.
+// Un trabajo interrumpido se reanuda volviendo a enviarlo con el mismo jobId.
+
+const REPORTS = ['heatmaps', 'match'];
+
+export async function POST(request: NextRequest) {
+  try {
+    const { jsonFile, report = 'heatmaps', jobId, rasterDpi } = await request.json();
+
+    if (!jsonFile) {
+      return NextResponse.json({ error: 'jsonFile path is required' }, { status: 400 });
+    }
+    if (!REPORTS.includes(report)) {
+      return NextResponse.json({ error: `Unknown report: ${report}` }, { status: 400 });
+    }
+
+    const args = ['submit', jsonFile, '--report', report, '--detach'];
+    if (jobId) {
+      args.push('--job-id', String(jobId));
+    }
+    if (rasterDpi) {
+      args.push('--raster-dpi', String(rasterDpi));
+    }
+    const status = await runReportJob(args);
+    return NextResponse.json(status, { status: 202 });
+  } catch (error) {
+    console.error('Error in report-jobs API:', error);
+    return NextResponse.json(
+      { error: error instanceof Error ? error.message : 'Unknown error' },
+      { status: 500 }
+    );
+  }
+}
+
+export async function GET(request: NextRequest) {
+  try {
+    const jobId = request.nextUrl.searchParams.get('jobId');
+    const status = await runReportJob(jobId ? ['status', jobId] : ['status']);
+    return NextResponse.json(status);
+  } catch (error) {
+    return NextResponse.json(
+      { error: error instanceof Error ? error.message : 'Unknown error' },
+      { status: 404 }
+    );
+  }
+}
+
+function runReportJob(args: string[]): Promise<any> {
+  return new Promise((resolve, reject) => {
+    const pythonScript = path.join(process.cwd(), 'scripts', 'report-job.py');
+
+    const pythonProcess = spawn('python', [pythonScript, ...args], {
+      cwd: process.cwd(),
+      stdio: ['pipe', 'pipe', 'pipe'],
+    });
+
+    let stdout = '';
+    let stderr = '';
+
+    pythonProcess.stdout?.on('data', (data: Buffer) => {
+      stdout += data.toString();
+    });
+
+    forwardPythonStderr(pythonProcess.stderr, (line) => {
+      stderr += line + '\n';
+    });
+
+    pythonProcess.on('close', (code: number | null) => {
+      if (code === 0) {
+        try {
+          resolve(JSON.parse(stdout));
+        } catch (e) {
+          reject(new Error('Failed to parse Python output'));
+        }
+      } else {
+        reject(new Error(stderr.trim() || `report-job.py exited with code ${code}`));
+      }
+    });
+
+    pythonProcess.on('error', (err: Error) => {
+      reject(err);
+    });
+  });
+}
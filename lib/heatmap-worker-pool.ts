@@ -0,0 +1,298 @@
+// Pool de workers Python persistentes para generar heatmaps
+// Cada worker ejecuta `generate_heatmap.py --worker`: precarga pandas/matplotlib
+// una sola vez y atiende peticiones JSON por línea (stdin/stdout).
+
+import { spawn, ChildProcess } from 'child_process';
+import path from 'path';
+import readline from 'readline';
+import { forwardPythonStderr } from '@/lib/stage-timing';
+
+const POOL_SIZE = Number(process.env.HEATMAP_WORKERS || 2);
+const MAX_JOBS_PER_WORKER = Number(process.env.HEATMAP_WORKER_MAX_JOBS || 50);
+const JOB_TIMEOUT_MS = Number(process.env.HEATMAP_WORKER_TIMEOUT_MS || 55000);
+// Un worker que no envía "ready" en este plazo (import colgado) se mata
+const STARTUP_TIMEOUT_MS = Number(process.env.HEATMAP_WORKER_STARTUP_MS || 30000);
+// Arranques fallidos seguidos antes de rechazar la cola; espera entre reintentos
+const MAX_STARTUP_FAILURES = Number(process.env.HEATMAP_WORKER_MAX_STARTUP_FAILURES || 3);
+const RESPAWN_BACKOFF_MS = 500;
+const MAX_RESPAWN_BACKOFF_MS = 10000;
+
+export interface HeatmapJob {
+  jsonFile: string;
+  team: string;
+  // Plazo en segundos: los mapas de jugadores bajan de calidad para cumplirlo
+  deadline?: number;
+  // Modo directo: estado incremental en el worker; se sincroniza con jsonFile
+  // o se le añaden solo las acciones nuevas de `actions`
+  live?: boolean;
+  session?: string;
+  actions?: unknown[];
+  // Solo estadísticas por jugador, sin imágenes (no importa numpy/matplotlib)
+  statsOnly?: boolean;
+}
+
+// Clave de la sesión en directo de un trabajo (null si no es en directo)
+function liveSessionKey(job: HeatmapJob): string | null {
+  if (!job.live) {
+    return null;
+  }
+  return `${job.session ?? job.jsonFile}:${job.team}`;
+}
+
+// Registro NDJSON del modo streaming (equipo primero, luego cada jugador y las métricas)
+export type HeatmapRecord =
+  | { type: 'team_heatmap'; image: string }
+  | { type: 'player'; player: string; image: string; stats: Record<string, number> }
+  | {
+      type: 'metrics';
+      team: Record<string, number> | null;
+      players: Record<string, Record<string, number>>;
+    }
+  | { type: 'render_plan'; degraded: boolean; deadline_met?: boolean; cached?: boolean; artifacts: any[] };
+
+interface PendingJob {
+  id: number;
+  job: HeatmapJob;
+  onRecord?: (record: HeatmapRecord) => void;
+  resolve: (result: any) => void;
+  reject: (error: Error) => void;
+  timer?: NodeJS.Timeout;
+}
+
+interface Worker {
+  process: ChildProcess;
+  ready: boolean;
+  jobs: number;
+  current: PendingJob | null;
+  startupTimer?: NodeJS.Timeout;
+}
+
+class HeatmapWorkerPool {
+  private workers: Worker[] = [];
+  private queue: PendingJob[] = [];
+  private nextId = 1;
+  // Worker que guarda el estado de cada sesión en directo
+  private sessionWorkers = new Map<string, Worker>();
+  // Workers que murieron antes de "ready" seguidos y reintento programado
+  private startupFailures = 0;
+  private respawnTimer: NodeJS.Timeout | null = null;
+
+  run(job: HeatmapJob): Promise<any> {
+    return new Promise((resolve, reject) => {
+      this.queue.push({ id: this.nextId++, job, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  // Igual que run(), pero entrega cada artefacto en cuanto el worker lo emite
+  stream(job: HeatmapJob, onRecord: (record: HeatmapRecord) => void): Promise<void> {
+    return new Promise((resolve, reject) => {
+      this.queue.push({ id: this.nextId++, job, onRecord, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  private spawnWorker(): Worker {
+    const pythonScript = path.join(process.cwd(), 'scripts', 'generate_heatmap.py');
+    const child = spawn(
+      'python',
+      [pythonScript, '--worker', '--max-jobs', String(MAX_JOBS_PER_WORKER)],
+      { cwd: process.cwd(), stdio: ['pipe', 'pipe', 'pipe'] }
+    );
+
+    const worker: Worker = { process: child, ready: false, jobs: 0, current: null };
+    worker.startupTimer = setTimeout(() => {
+      console.error('Worker de heatmaps sin "ready" tras', STARTUP_TIMEOUT_MS, 'ms');
+      child.kill('SIGKILL');
+    }, STARTUP_TIMEOUT_MS);
+
+    // Una línea de stdout = una respuesta completa
+    readline.createInterface({ input: child.stdout! }).on('line', (line) => {
+      this.handleLine(worker, line);
+    });
+
+    // Tiempos por etapa (HEATMAP_STAGE_TIMING=1) al sink de métricas; el resto al log
+    forwardPythonStderr(child.stderr, (line) => {
+      console.error('Python worker:', line);
+    });
+
+    child.on('exit', (code) => this.handleExit(worker, code));
+    child.on('error', (err) => {
+      // p. ej. ENOENT: el proceso no llegó a arrancar y puede no emitir 'exit'
+      console.error('Error en worker de heatmaps:', err);
+      this.handleExit(worker, null);
+    });
+
+    this.workers.push(worker);
+    return worker;
+  }
+
+  private handleLine(worker: Worker, line: string) {
+    let message: any;
+    try {
+      message = JSON.parse(line);
+    } catch {
+      console.error('Respuesta no válida del worker:', line.slice(0, 200));
+      return;
+    }
+
+    if (message.ready) {
+      worker.ready = true;
+      clearTimeout(worker.startupTimer);
+      this.startupFailures = 0;
+      this.dispatch();
+      return;
+    }
+
+    const pending = worker.current;
+    if (!pending || message.id !== pending.id) {
+      return;
+    }
+
+    // Frames intermedios del modo streaming
+    if (message.record) {
+      pending.onRecord?.(message.record);
+      return;
+    }
+
+    clearTimeout(pending.timer);
+    worker.current = null;
+    worker.jobs += 1;
+
+    if (message.ok) {
+      pending.resolve(message.result);
+    } else {
+      pending.reject(new Error(`Python script failed: ${message.error}`));
+    }
+
+    this.dispatch();
+  }
+
+  private handleExit(worker: Worker, code: number | null) {
+    // 'error' y 'exit' pueden llegar ambos para el mismo proceso
+    if (!this.workers.includes(worker)) {
+      return;
+    }
+    clearTimeout(worker.startupTimer);
+    this.workers = this.workers.filter((w) => w !== worker);
+    for (const [key, owner] of this.sessionWorkers) {
+      if (owner === worker) {
+        // La sesión se reconstruye desde jsonFile en otro worker
+        this.sessionWorkers.delete(key);
+      }
+    }
+
+    // Si el worker muere con un trabajo en curso, se rechaza (no se reintenta)
+    if (worker.current) {
+      clearTimeout(worker.current.timer);
+      worker.current.reject(new Error(`Python worker exited with code ${code}`));
+      worker.current = null;
+    }
+
+    if (!worker.ready) {
+      // Murió arrancando (import roto, python ausente...): no relanzar en bucle
+      this.startupFailures += 1;
+      if (this.startupFailures >= MAX_STARTUP_FAILURES) {
+        const error = new Error(
+          `Python worker failed to start ${this.startupFailures} times (last exit code ${code})`
+        );
+        this.startupFailures = 0;
+        for (const pending of this.queue.splice(0)) {
+          pending.reject(error);
+        }
+        return;
+      }
+      this.scheduleRespawn();
+      return;
+    }
+
+    // Sustituir el worker (reciclado o caída) si queda trabajo pendiente
+    this.dispatch();
+  }
+
+  // Reintento de arranque con espera exponencial tras un fallo de arranque
+  private scheduleRespawn() {
+    if (this.respawnTimer) {
+      return;
+    }
+    const delay = Math.min(
+      RESPAWN_BACKOFF_MS * 2 ** (this.startupFailures - 1),
+      MAX_RESPAWN_BACKOFF_MS
+    );
+    this.respawnTimer = setTimeout(() => {
+      this.respawnTimer = null;
+      this.dispatch();
+    }, delay);
+  }
+
+  private isFree(worker: Worker): boolean {
+    return worker.ready && !worker.current && worker.jobs < MAX_JOBS_PER_WORKER;
+  }
+
+  // Worker para un trabajo: el dueño de su sesión en directo si lo tiene
+  // (null = ocupado, esperar), o cualquiera libre (undefined = ninguno)
+  private pickWorker(pending: PendingJob): Worker | null | undefined {
+    const key = liveSessionKey(pending.job);
+    const owner = key ? this.sessionWorkers.get(key) : undefined;
+    if (owner && this.workers.includes(owner) && owner.jobs < MAX_JOBS_PER_WORKER) {
+      return this.isFree(owner) ? owner : null;
+    }
+
+    const worker = this.workers.find((w) => this.isFree(w));
+    if (worker && key) {
+      this.sessionWorkers.set(key, worker);
+    }
+    return worker;
+  }
+
+  private dispatch() {
+    let index = 0;
+    while (index < this.queue.length) {
+      const worker = this.pickWorker(this.queue[index]);
+
+      if (worker === null) {
+        // Su sesión está ocupada en otro trabajo: no bloquear al resto de la cola
+        index += 1;
+        continue;
+      }
+
+      if (!worker) {
+        // Arrancar workers hasta completar el pool; el trabajo espera al "ready"
+        // (salvo durante la espera tras un fallo de arranque)
+        const alive = this.workers.filter((w) => w.jobs < MAX_JOBS_PER_WORKER);
+        if (alive.length < POOL_SIZE && !this.respawnTimer) {
+          this.spawnWorker();
+          continue;
+        }
+        return;
+      }
+
+      const pending = this.queue.splice(index, 1)[0];
+      worker.current = pending;
+      pending.timer = setTimeout(() => {
+        // Un trabajo colgado bloquea el worker: se mata y se sustituye
+        worker.process.kill('SIGKILL');
+      }, JOB_TIMEOUT_MS);
+
+      worker.process.stdin?.write(
+        JSON.stringify({
+          id: pending.id,
+          jsonFile: pending.job.jsonFile,
+          team: pending.job.team,
+          deadline: pending.job.deadline,
+          live: pending.job.live,
+          session: pending.job.session,
+          actions: pending.job.actions,
+          statsOnly: pending.job.statsOnly,
+          stream: Boolean(pending.onRecord),
+        }) + '\n'
+      );
+    }
+  }
+}
+
+// Instancia única por proceso de Node (sobrevive entre peticiones en caliente)
+const globalForPool = globalThis as unknown as { heatmapWorkerPool?: HeatmapWorkerPool };
+
+export const heatmapWorkerPool =
+  globalForPool.heatmapWorkerPool ?? (globalForPool.heatmapWorkerPool = new HeatmapWorkerPool());
@@ -0,0 +1,70 @@
+// Tiempos por etapa de los scripts Python (HEATMAP_STAGE_TIMING=1)
+// Con la variable activa, cada etapa escribe en stderr una línea JSON
+// {"event": "stage_timing", "stage", "wall_ms", "cpu_ms", "rows", "bytes", ...}.
+// Aquí se separan esas líneas del resto de stderr y se envían al sink de métricas.
+
+import readline from 'readline';
+import type { Readable } from 'stream';
+
+export interface StageTiming {
+  event: 'stage_timing';
+  stage: string;
+  wall_ms: number;
+  cpu_ms: number;
+  parent?: string;
+  rows?: number;
+  bytes?: number;
+  script?: string;
+  job?: number;
+  team?: string;
+  [field: string]: unknown;
+}
+
+export type StageTimingSink = (timing: StageTiming) => void;
+
+// Por defecto, una línea JSON en los logs del servidor (la recoge el agregador de logs)
+let sink: StageTimingSink = (timing) => {
+  console.info(JSON.stringify({ metric: 'python_stage', ...timing }));
+};
+
+export function setStageTimingSink(next: StageTimingSink) {
+  sink = next;
+}
+
+// Línea de tiempos o null si es texto normal de stderr
+export function parseStageTiming(line: string): StageTiming | null {
+  if (!line.startsWith('{')) {
+    return null;
+  }
+  try {
+    const record = JSON.parse(line);
+    if (record?.event === 'stage_timing' && typeof record.stage === 'string') {
+      return record as StageTiming;
+    }
+  } catch {
+    // No es JSON: texto normal
+  }
+  return null;
+}
+
+// Lee stderr línea a línea: los tiempos van al sink y el resto a onText
+export function forwardPythonStderr(
+  stderr: Readable | null | undefined,
+  onText: (line: string) => void
+) {
+  if (!stderr) {
+    return;
+  }
+  readline.createInterface({ input: stderr }).on('line', (line) => {
+    const timing = parseStageTiming(line);
+    if (timing) {
+      try {
+        sink(timing);
+      } catch (error) {
+        console.error('Error enviando tiempos de etapa:', error);
+      }
+    } else {
+      onText(line);
+    }
+  });
+}
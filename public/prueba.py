@@ -1,6 +1,12 @@
 import json
+import os
+import sys
 import pandas as pd
 
+# Índice de partición compartido con los scripts de informes
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from match_frame import partition
+
 file_path = 'AttackMetrics_RINCONADA_vs_ALCALA_20260109.json'
 with open(file_path, 'r') as f:
     data = json.load(f)
@@ -117,9 +123,10 @@ def draw_pitch(ax):
     ax.axis('off')
 
 # Loop
+players = partition(home_df, 'player')
 for i, player in enumerate(players_sorted):
     ax = axes[i]
-    player_data = home_df[home_df['player'] == player]
+    player_data = players.group(player)
     
     # Draw pitch
     draw_pitch(ax)
@@ -238,9 +245,10 @@ def draw_pitch(ax):
     ax.axis('off')
 
 # Plot individual players
+players = partition(home_df, 'player')
 for i, player in enumerate(players_sorted):
     ax = axes[i]
-    player_data = home_df[home_df['player'] == player]
+    player_data = players.group(player)
     
     draw_pitch(ax)
     
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Informes PDF de muchos partidos en un solo proceso caliente
+Toma un directorio de JSON (o CSV de AnalistaPro) de partidos o un manifiesto y genera todos los PDF
+(y, opcionalmente, el JSON de heatmaps de cada equipo) importando matplotlib,
+pandas y las fuentes una sola vez por proceso. Con --workers reparte los
+partidos entre varios procesos, cada uno caliente.
+
+Manifiesto: .json con una lista de rutas u objetos {"json": ..., "pdf": ...},
+o texto con una ruta por línea (# para comentarios). Las rutas relativas lo
+son al manifiesto.
+
+Uso:
+    python batch-reports.py <directorio|manifiesto> <directorio_salida>
+                            [--report heatmaps|match] [--workers N] [--payloads]
+                            [--raster-dpi N] [--max-size MB] [--skip-existing]
+                            [--summary resumen.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+from csv_ingest import csv_schema, is_csv
+from pdf_output import megabytes
+from report_jobs import REPORTS, load_report_module
+from stage_timing import set_context, stage
+
+# Equipos del JSON de heatmaps (--payloads) y sufijo del fichero junto al PDF
+PAYLOAD_TEAMS = ('HOME', 'AWAY')
+PAYLOAD_SUFFIX = '.heatmaps.json'
+
+
+def is_derived_json(name):
+    """JSON generado por los scripts (heatmaps, índices y métricas), no un partido"""
+    from grid_archive import INDEX_SUFFIX
+    from possession_metrics import METRICS_SUFFIX
+    from season_store import INDEX_FILE
+
+    return name == INDEX_FILE or name.endswith((PAYLOAD_SUFFIX, INDEX_SUFFIX, METRICS_SUFFIX))
+
+
+def read_manifest(source):
+    """Lista de (json_path, pdf_path o None) de un directorio o manifiesto"""
+    if os.path.isdir(source):
+        # Sin los JSON derivados: con la salida en el mismo directorio, una segunda
+        # pasada tomaría sus propios .heatmaps.json por partidos
+        paths = sorted(os.path.join(source, name) for name in os.listdir(source)
+                       if is_csv(name) or (name.endswith('.json') and not is_derived_json(name)))
+        # De los CSV solo los de AnalistaPro (con coordenadas) son partidos
+        return [(path, None) for path in paths
+                if not is_csv(path) or csv_schema(path) == 'analista']
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r', encoding='utf-8') as f:
+        if source.endswith('.json'):
+            items = json.load(f)
+        else:
+            items = [line.strip() for line in f]
+            items = [line for line in items if line and not line.startswith('#')]
+
+    entries = []
+    for item in items:
+        if isinstance(item, str):
+            json_path, pdf_path = item, None
+        else:
+            json_path, pdf_path = item['json'], item.get('pdf')
+        entries.append((os.path.join(base, json_path),
+                        None if pdf_path is None else os.path.join(base, pdf_path)))
+    return entries
+
+
+def plan_outputs(entries, output_dir):
+    """Asigna <salida>/<nombre>.pdf a las entradas sin PDF; error si dos coinciden"""
+    planned, seen = [], {}
+    for json_path, pdf_path in entries:
+        name = os.path.splitext(os.path.basename(json_path))[0]
+        pdf_path = os.path.abspath(pdf_path or os.path.join(output_dir, name + '.pdf'))
+        if pdf_path in seen:
+            raise ValueError(f"{json_path} y {seen[pdf_path]} escribirían el mismo PDF: {pdf_path}")
+        seen[pdf_path] = json_path
+        planned.append({'match': name, 'json': os.path.abspath(json_path), 'pdf': pdf_path})
+    return planned
+
+
+def payload_path(entry):
+    """JSON de heatmaps que acompaña al PDF de una entrada"""
+    return os.path.splitext(entry['pdf'])[0] + PAYLOAD_SUFFIX
+
+
+def is_up_to_date(entry, payloads=False):
+    """El PDF (y con payloads su JSON de heatmaps) existe y es posterior al JSON del partido"""
+    outputs = [entry['pdf']] + ([payload_path(entry)] if payloads else [])
+    try:
+        source = os.path.getmtime(entry['json'])
+        return all(os.path.getmtime(path) >= source for path in outputs)
+    except OSError:
+        return False
+
+
+def warm_worker(report, payloads):
+    """Inicializa un proceso: importa el script, matplotlib y las fuentes una vez"""
+    module = load_report_module(report)
+    module.load_pyplot()
+    if payloads:
+        import generate_heatmap
+        generate_heatmap.warm_up()
+
+
+def write_payloads(entry, use_cache=True):
+    """JSON de heatmaps (base64) de ambos equipos junto al PDF"""
+    from generate_heatmap import generate_heatmaps
+
+    payload = {team: generate_heatmaps(entry['json'], team, use_cache) for team in PAYLOAD_TEAMS}
+    path = payload_path(entry)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+    return path
+
+
+def process_match(entry, report, options):
+    """Genera el informe (y los heatmaps) de un partido; devuelve su resultado"""
+    module = load_report_module(report)
+    set_context(match=entry['match'])
+    started = time.perf_counter()
+    log = io.StringIO()
+    result = dict(entry, ok=False, error=None)
+    try:
+        os.makedirs(os.path.dirname(entry['pdf']), exist_ok=True)
+        with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            with stage('match', match=entry['match']):
+                if report == 'heatmaps':
+                    ok = module.generate_pdf_report(entry['json'], entry['pdf'], None, None,
+                                                    options['raster_dpi'], options['max_bytes'])
+                else:
+                    ok = module.generate_report(entry['json'], entry['pdf'], options['raster_dpi'],
+                                                options['max_bytes']) == 0
+                if ok and options['payloads']:
+                    result['payloads'] = write_payloads(entry, options['use_cache'])
+        result['ok'] = ok
+        if not ok:
+            # Los scripts informan del error por su salida: se guarda la última línea
+            lines = log.getvalue().strip().splitlines()
+            result['error'] = lines[-1] if lines else 'error desconocido'
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = round(time.perf_counter() - started, 2)
+    if result['ok']:
+        result['bytes'] = os.path.getsize(entry['pdf'])
+    return result
+
+
+def run_batch(entries, report='heatmaps', workers=1, **options):
+    """Procesa los partidos en este proceso o en un pool caliente; resultados en el orden de entrada"""
+    results = [None] * len(entries)
+
+    def report_progress(index, result):
+        results[index] = result
+        done = sum(r is not None for r in results)
+        label = 'OK' if result['ok'] else 'ERROR'
+        detail = f"{result['seconds']:.1f} s" if result['ok'] else result['error']
+        print(f"[{label}] {done}/{len(entries)} {result['match']}  {detail}", flush=True)
+
+    if workers <= 1 or len(entries) <= 1:
+        warm_worker(report, options['payloads'])
+        for index, entry in enumerate(entries):
+            report_progress(index, process_match(entry, report, options))
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=warm_worker,
+                             initargs=(report, options['payloads'])) as pool:
+        futures = {pool.submit(process_match, entry, report, options): index
+                   for index, entry in enumerate(entries)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Proceso del pool caído (p. ej. sin memoria)
+                result = dict(entries[index], ok=False, error=str(e), seconds=None)
+            report_progress(index, result)
+    return results
+
+
+def print_summary(results, skipped, elapsed):
+    ok = [r for r in results if r['ok']]
+    failed = [r for r in results if not r['ok']]
+    print(f"\nResumen: {len(ok)} generados, {len(failed)} con error, {len(skipped)} al día "
+          f"({elapsed:.1f} s en total)")
+    for result in failed:
+        print(f"  ERROR {result['match']}: {result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Genera los informes PDF de muchos partidos en un proceso caliente")
+    parser.add_argument('source', help="directorio con JSON de partidos o manifiesto")
+    parser.add_argument('output_dir')
+    parser.add_argument('--report', choices=sorted(REPORTS), default='heatmaps')
+    parser.add_argument('--workers', type=int, default=1,
+                        help="procesos en paralelo, un partido cada vez (0 = todos los núcleos)")
+    parser.add_argument('--payloads', action='store_true',
+                        help="escribe también <partido>.heatmaps.json con los heatmaps de ambos equipos")
+    parser.add_argument('--no-cache', action='store_false', dest='use_cache',
+                        help="no usar la caché de heatmaps (p. ej. tras un cambio de estilo)")
+    parser.add_argument('--raster-dpi', type=int, default=None)
+    parser.add_argument('--max-size', type=megabytes, default=None, dest='max_bytes')
+    parser.add_argument('--skip-existing', action='store_true',
+                        help="omite los partidos cuyo PDF (y con --payloads su JSON de "
+                             "heatmaps) es posterior a su JSON")
+    parser.add_argument('--summary', help="fichero JSON con el resultado de cada partido")
+    args = parser.parse_args()
+    set_context(script='batch-reports')
+
+    try:
+        entries = plan_outputs(read_manifest(args.source), args.output_dir)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    if not entries:
+        print(f"[ERROR] No hay partidos en {args.source}", file=sys.stderr)
+        return 1
+
+    skipped = [entry for entry in entries
+               if args.skip_existing and is_up_to_date(entry, args.payloads)]
+    pending = [entry for entry in entries if entry not in skipped]
+    workers = os.cpu_count() if args.workers == 0 else args.workers
+    print(f"{len(pending)} partidos ({len(skipped)} al día), {workers} proceso(s)")
+
+    started = time.perf_counter()
+    results = run_batch(pending, args.report, workers, payloads=args.payloads,
+                        use_cache=args.use_cache, raster_dpi=args.raster_dpi,
+                        max_bytes=args.max_bytes)
+    elapsed = time.perf_counter() - started
+    print_summary(results, skipped, elapsed)
+
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump({'report': args.report, 'elapsed_s': round(elapsed, 2),
+                       'skipped': [entry['match'] for entry in skipped],
+                       'matches': results}, f, ensure_ascii=False, indent=1)
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los generadores de mapas de calor e informes de Attack Metrics
+Genera partidos sintéticos con semilla fija (match_generator), mide
+generate_heatmaps, generate_pdf_report y generate_report etapa por etapa y
+escribe los resultados en JSON. Con --baseline compara contra una ejecución
+anterior y termina con error si algún caso empeora más de la tolerancia.
+El subcomando startup comprueba el presupuesto de importación de cada script
+de entrada.
+
+Cada caso se ejecuta en un proceso propio: importación en frío y pico de
+memoria comparables entre casos.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import importlib.util
+from datetime import datetime
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = (500, 3000, 20000)
+DEFAULT_PLAYERS = (11, 18)
+DEFAULT_TOLERANCE = 0.25
+
+# Objetivo -> (fichero, función); los módulos con guion se cargan por ruta
+TARGETS = {
+    'heatmaps': ('generate_heatmap.py', 'generate_heatmaps'),
+    'pdf': ('generate-heatmap-report.py', 'generate_pdf_report'),
+    'report': ('generate-report.py', 'generate_report'),
+}
+
+# Etapas medidas: (módulo, atributo) -> etapa. El módulo 'target' es el propio
+# script; el resto se parchean en su módulo de origen (importaciones perezosas).
+STAGES = {
+    'heatmaps': {
+        ('json', 'load'): 'parse',
+        ('match_frame', 'match_frame'): 'frame',
+        ('match_frame', 'select_team'): 'frame',
+        ('match_frame', 'partition'): 'partition',
+        ('heatmap_density', 'player_density_grids'): 'density',
+        ('possession_metrics', 'assign_possessions'): 'possessions',
+        ('xg_model', 'fill_xg'): 'xg',
+        ('target', 'render_team_image'): 'render_team',
+        ('target', 'render_player_image'): 'render_players',
+        ('target', 'img_to_base64'): 'encode',
+    },
+    'pdf': {
+        ('target', 'load_match_data'): 'parse',
+        ('match_frame', 'match_frame'): 'frame',
+        ('match_frame', 'select_team'): 'frame',
+        ('match_frame', 'partition'): 'partition',
+        ('heatmap_density', 'player_density_grids'): 'density',
+        ('heatmap_density', 'single_density'): 'density',
+        ('pitch_zones', 'frame_zone_table'): 'zones',
+        ('possession_metrics', 'assign_possessions'): 'possessions',
+        ('xg_model', 'fill_xg'): 'xg',
+        ('target', 'generate_statistics_page'): 'page_statistics',
+        ('target', 'generate_team_heatmap'): 'page_team',
+        ('target', 'generate_player_heatmaps'): 'page_players',
+        ('target', 'generate_recoveries_map'): 'page_recoveries',
+        ('target', 'generate_pass_network'): 'page_pass_network',
+        ('target', 'generate_flow_field'): 'page_flow_field',
+        ('target', 'generate_shot_map'): 'page_shot_map',
+        ('target', 'merge_pdf_pages'): 'merge',
+    },
+    'report': {
+        ('target', 'load_match_data'): 'parse',
+        ('match_frame', 'match_frame'): 'frame',
+        ('match_frame', 'select_team'): 'frame',
+        ('match_frame', 'partition'): 'partition',
+        ('target', 'generate_statistics_page'): 'page_statistics',
+        ('target', 'generate_team_heatmap'): 'page_team',
+        ('target', 'generate_player_heatmaps'): 'page_players',
+    },
+}
+
+# Presupuesto de importación de cada script de entrada (ms, sin el arranque del
+# intérprete): los errores de uso, aciertos de caché y peticiones de solo
+# estadísticas no deben pagar numpy, pandas ni matplotlib
+STARTUP_BUDGETS_MS = {
+    'generate_heatmap.py': 60,
+    'generate-heatmap-report.py': 60,
+    'generate-report.py': 60,
+    'season-heatmap.py': 60,
+}
+HEAVY_MODULES = ('numpy', 'pandas', 'matplotlib', 'seaborn', 'scipy')
+
+# Importa un script por ruta (sin ejecutar su __main__) y mide el tiempo
+_IMPORT_PROBE = """
+import importlib.util, json, sys, time
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location('probe', sys.argv[1])
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+elapsed = time.perf_counter() - started
+print(json.dumps({'import_ms': elapsed * 1000,
+                  'heavy': sorted(m for m in sys.argv[2:] if m in sys.modules)}))
+"""
+
+
+def load_target(target):
+    """Importa el script del objetivo (registrado en sys.modules para que el pool pueda usarlo)"""
+    file_name, function_name = TARGETS[target]
+    module_name = os.path.splitext(file_name)[0].replace('-', '_')
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(module_name,
+                                                      os.path.join(SCRIPTS_DIR, file_name))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    module = sys.modules[module_name]
+    return module, getattr(module, function_name)
+
+
+class StageTimer:
+    """Tiempo exclusivo por etapa: una etapa anidada no cuenta en la que la contiene"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.totals = {}
+        self.calls = {}
+        self._stack = []
+        self._mark = None
+        self._patches = []
+
+    def _switch(self):
+        now = self.clock()
+        if self._stack:
+            stage = self._stack[-1]
+            self.totals[stage] = self.totals.get(stage, 0.0) + now - self._mark
+        self._mark = now
+
+    def wrap(self, function, stage):
+        def timed(*args, **kwargs):
+            self._switch()
+            self._stack.append(stage)
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._switch()
+                self._stack.pop()
+        timed.__wrapped__ = function
+        return timed
+
+    def patch(self, module, attribute, stage):
+        original = getattr(module, attribute, None)
+        if original is None:
+            return
+        self._patches.append((module, attribute, original))
+        setattr(module, attribute, self.wrap(original, stage))
+
+    def restore(self):
+        for module, attribute, original in reversed(self._patches):
+            setattr(module, attribute, original)
+        self._patches = []
+
+    def reset(self):
+        self.totals = {}
+        self.calls = {}
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso en MB (None si no se puede medir)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux da KB; macOS, bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_case(target, n_actions, n_players, seed, repeat, workers=None):
+    """Ejecuta un caso en este proceso y devuelve su resultado"""
+    from match_generator import write_synthetic_match
+
+    with tempfile.TemporaryDirectory(prefix='attack-bench-') as tmp:
+        json_path = write_synthetic_match(os.path.join(tmp, 'match.json'),
+                                          n_actions, n_players, seed)
+        output_path = os.path.join(tmp, 'report.pdf')
+
+        started = time.perf_counter()
+        module, function = load_target(target)
+        import_s = time.perf_counter() - started
+
+        timer = StageTimer()
+        for (module_name, attribute), stage in STAGES[target].items():
+            owner = module if module_name == 'target' else importlib.import_module(module_name)
+            timer.patch(owner, attribute, stage)
+
+        runs = []
+        output_bytes = None
+        try:
+            for _ in range(repeat):
+                timer.reset()
+                started = time.perf_counter()
+                if target == 'heatmaps':
+                    result = function(json_path, use_cache=False)
+                    ok = result.get('team_heatmap') is not None
+                    output_bytes = len(json.dumps(result))
+                elif target == 'pdf':
+                    ok = function(json_path, output_path, workers)
+                else:
+                    ok = function(json_path, output_path) == 0
+                total = time.perf_counter() - started
+                if not ok:
+                    raise RuntimeError(f"{target} falló con {n_actions} acciones")
+                if target != 'heatmaps':
+                    output_bytes = os.path.getsize(output_path)
+
+                stages = {stage: round(value, 4) for stage, value in timer.totals.items()}
+                stages['other'] = round(max(total - sum(timer.totals.values()), 0.0), 4)
+                runs.append({'total_s': round(total, 4), 'stages': stages})
+        finally:
+            timer.restore()
+
+    return {
+        'target': target,
+        'actions': n_actions,
+        'players': n_players,
+        'seed': seed,
+        'workers': workers,
+        'import_s': round(import_s, 4),
+        'runs': runs,
+        'median_s': round(statistics.median(run['total_s'] for run in runs), 4),
+        'stages': {stage: round(statistics.median(run['stages'].get(stage, 0.0) for run in runs), 4)
+                   for stage in runs[0]['stages']},
+        'output_bytes': output_bytes,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_case_subprocess(target, n_actions, n_players, seed, repeat, workers=None):
+    """Ejecuta un caso en un proceso nuevo; su salida de diagnóstico se descarta"""
+    command = [sys.executable, os.path.abspath(__file__), 'case', target,
+               str(n_actions), str(n_players), '--seed', str(seed), '--repeat', str(repeat)]
+    if workers:
+        command += ['--workers', str(workers)]
+    env = dict(os.environ, HEATMAP_CACHE='0', MPLBACKEND='Agg')
+    # El benchmark no debe tocar el almacén de temporada real
+    env.pop('SEASON_STORE_DIR', None)
+    completed = subprocess.run(command, env=env, cwd=SCRIPTS_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Caso {target}/{n_actions}/{n_players} falló:\n{completed.stderr[-2000:]}")
+    # El resultado es la última línea de stdout
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment_info():
+    """Versiones y máquina, para comparar solo resultados comparables"""
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+    for package in ('numpy', 'pandas', 'matplotlib'):
+        try:
+            info[package] = __import__(package).__version__
+        except ImportError:
+            info[package] = None
+    try:
+        info['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPTS_DIR,
+                                        capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        info['commit'] = None
+    return info
+
+
+def case_key(case):
+    return case['target'], case['actions'], case['players'], case.get('workers')
+
+
+def compare_results(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Casos cuya mediana supera la de la referencia en más de la tolerancia"""
+    previous = {case_key(case): case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in results['cases']:
+        reference = previous.get(case_key(case))
+        if reference is None or not reference['median_s']:
+            continue
+        ratio = case['median_s'] / reference['median_s']
+        if ratio > 1 + tolerance:
+            slower = [stage for stage, value in case['stages'].items()
+                      if value > reference['stages'].get(stage, 0.0) * (1 + tolerance) + 0.01]
+            regressions.append({'case': case_key(case), 'ratio': round(ratio, 3),
+                                'stages': slower})
+    return regressions
+
+
+def print_case(case):
+    stages = ', '.join(f"{stage} {value:.3f}" for stage, value in
+                       sorted(case['stages'].items(), key=lambda item: -item[1]) if value >= 0.001)
+    print(f"{case['target']:<9} {case['actions']:>8} acc. {case['players']:>3} jug.  "
+          f"{case['median_s']:8.3f} s  (import {case['import_s']:.2f} s, "
+          f"{case['peak_rss_mb']} MB)  {stages}")
+
+
+def run_benchmark(targets, sizes, players, seed=0, repeat=1, workers=None):
+    """Ejecuta la matriz de casos y devuelve el documento de resultados"""
+    results = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'repeat': repeat,
+        'environment': environment_info(),
+        'cases': [],
+    }
+    for target in targets:
+        for n_actions in sizes:
+            for n_players in players:
+                case = run_case_subprocess(target, n_actions, n_players, seed, repeat, workers)
+                results['cases'].append(case)
+                print_case(case)
+    return results
+
+
+def measure_startup(script, repeat=5):
+    """Mediana del tiempo de importación de un script, módulos pesados que carga y
+    tiempo total del proceso ante un error de uso (sin argumentos)"""
+    path = os.path.join(SCRIPTS_DIR, script)
+    imports, usage, heavy = [], [], []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-c', _IMPORT_PROBE, path, *HEAVY_MODULES],
+                                   cwd=SCRIPTS_DIR, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"No se pudo importar {script}:\n{completed.stderr[-2000:]}")
+        probe = json.loads(completed.stdout)
+        imports.append(probe['import_ms'])
+        heavy = probe['heavy']
+
+        started = time.perf_counter()
+        subprocess.run([sys.executable, path], cwd=SCRIPTS_DIR, capture_output=True)
+        usage.append((time.perf_counter() - started) * 1000)
+
+    budget = STARTUP_BUDGETS_MS.get(script)
+    import_ms = statistics.median(imports)
+    return {
+        'script': script,
+        'import_ms': round(import_ms, 1),
+        'usage_error_ms': round(statistics.median(usage), 1),
+        'budget_ms': budget,
+        'heavy_modules': heavy,
+        'ok': not heavy and (budget is None or import_ms <= budget),
+    }
+
+
+def check_startup(repeat=5):
+    """Mide todos los scripts de entrada con presupuesto"""
+    results = []
+    for script in STARTUP_BUDGETS_MS:
+        entry = measure_startup(script, repeat)
+        results.append(entry)
+        heavy = f"  importa {', '.join(entry['heavy_modules'])}" if entry['heavy_modules'] else ''
+        print(f"{'OK ' if entry['ok'] else 'MAL'} {script:<28} import {entry['import_ms']:6.1f} ms "
+              f"(presupuesto {entry['budget_ms']} ms), error de uso "
+              f"{entry['usage_error_ms']:6.1f} ms{heavy}")
+    return results
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de mapas de calor e informes")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="ejecutar la matriz de casos")
+    run_parser.add_argument('--targets', default=','.join(TARGETS),
+                            help=f"objetivos separados por comas ({', '.join(TARGETS)})")
+    run_parser.add_argument('--sizes', type=int_list, default=list(DEFAULT_SIZES),
+                            help="nº de acciones por partido (p. ej. 500,3000,1000000)")
+    run_parser.add_argument('--players', type=int_list, default=list(DEFAULT_PLAYERS),
+                            help="jugadores por equipo (p. ej. 11,18,40)")
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeat', type=int, default=1, help="ejecuciones por caso")
+    run_parser.add_argument('--workers', type=int, default=None,
+                            help="procesos de generate_pdf_report (las páginas se miden fuera del pool)")
+    run_parser.add_argument('--output', help="fichero JSON de resultados")
+    run_parser.add_argument('--baseline', help="resultados anteriores con los que comparar")
+    run_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help="empeoramiento admitido sobre la referencia (0.25 = 25%%)")
+
+    generate_parser = commands.add_parser('generate', help="escribir un partido sintético")
+    generate_parser.add_argument('output_path')
+    generate_parser.add_argument('--actions', type=int, default=3000)
+    generate_parser.add_argument('--players', type=int, default=18)
+    generate_parser.add_argument('--seed', type=int, default=0)
+
+    startup_parser = commands.add_parser('startup',
+                                         help="comprobar el presupuesto de importación")
+    startup_parser.add_argument('--repeat', type=int, default=5)
+    startup_parser.add_argument('--output', help="fichero JSON de resultados")
+
+    # Uso interno: un caso en este proceso, resultado como última línea de stdout
+    case_parser = commands.add_parser('case')
+    case_parser.add_argument('target', choices=tuple(TARGETS))
+    case_parser.add_argument('actions', type=int)
+    case_parser.add_argument('players', type=int)
+    case_parser.add_argument('--seed', type=int, default=0)
+    case_parser.add_argument('--repeat', type=int, default=1)
+    case_parser.add_argument('--workers', type=int, default=None)
+
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        from match_generator import write_synthetic_match
+        write_synthetic_match(args.output_path, args.actions, args.players, args.seed)
+        print(f"[OK] Partido sintético generado: {args.output_path}")
+        sys.exit(0)
+
+    if args.command == 'startup':
+        try:
+            startup = check_startup(args.repeat)
+        except RuntimeError as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            sys.exit(1)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'version': RESULTS_VERSION,
+                           'created': datetime.now().isoformat(timespec='seconds'),
+                           'environment': environment_info(), 'startup': startup}, f, indent=1)
+        sys.exit(0 if all(entry['ok'] for entry in startup) else 1)
+
+    if args.command == 'case':
+        case = run_case(args.target, args.actions, args.players, args.seed, args.repeat,
+                        args.workers)
+        print(json.dumps(case))
+        sys.exit(0)
+
+    targets = [target for target in args.targets.split(',') if target]
+    unknown = [target for target in targets if target not in TARGETS]
+    if unknown:
+        parser.error(f"objetivos desconocidos: {', '.join(unknown)}")
+
+    try:
+        results = run_benchmark(targets, args.sizes, args.players, args.seed, args.repeat,
+                                args.workers)
+    except RuntimeError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+        print(f"[OK] Resultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            target, n_actions, n_players, _ = regression['case']
+            stages = ', '.join(regression['stages']) or 'sin etapa destacada'
+            print(f"[REGRESIÓN] {target} {n_actions} acc. {n_players} jug.: "
+                  f"x{regression['ratio']} ({stages})")
+        sys.exit(1 if regressions else 0)
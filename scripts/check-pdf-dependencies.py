@@ -26,6 +26,17 @@ def check_dependencies():
             print(f"❌ {package} - NO ENCONTRADO")
             missing.append(package)
     
+    # Opcionales: solo habilitan funciones adicionales
+    optional = {
+        'pypdf': 'renderizado de páginas en paralelo (--workers)',
+    }
+    for package, feature in optional.items():
+        try:
+            __import__(package)
+            print(f"✅ {package} - Instalado (opcional)")
+        except ImportError:
+            print(f"➖ {package} - No instalado (opcional: {feature})")
+    
     print()
     
     if missing:
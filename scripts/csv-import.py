@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Importa CSV de AnalistaPro, DataHub y Portero
+Detecta el esquema de cada CSV (o de todos los de un directorio, recursivo) y
+lo convierte al JSON de Attack Metrics, que leen la web y los scripts de
+informes. Con --inspect solo resume cada fichero (esquema, filas, equipos y
+acciones) leyéndolo por bloques, sin cargarlo entero.
+
+Uso:
+    python csv-import.py <csv|directorio>... [--output-dir DIR] [--schema analista|datahub|portero]
+    python csv-import.py <csv|directorio>... --inspect
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from csv_ingest import SCHEMAS, CsvSchemaError, csv_schema, iter_archive, iter_csv_chunks, \
+    load_csv_match
+from stage_timing import set_context, stage
+
+
+def csv_files(paths, schema=None):
+    """(ruta, esquema) de cada CSV indicado o encontrado en los directorios"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_archive(path, schema)
+            continue
+        found = csv_schema(path)
+        if found is None:
+            raise CsvSchemaError(f"{path}: cabecera no reconocida")
+        if schema is None or found == schema:
+            yield path, found
+
+
+def inspect_csv(path, schema):
+    """Resumen de un CSV recorrido por bloques"""
+    rows, teams, types = 0, {}, {}
+    for chunk in iter_csv_chunks(path, schema, columns=('team', 'type')):
+        rows += len(chunk)
+        for name, totals in (('team', teams), ('type', types)):
+            if name in chunk:
+                for value, count in chunk[name].value_counts().items():
+                    totals[value] = totals.get(value, 0) + int(count)
+    return {'file': path, 'schema': schema, 'rows': rows, 'teams': teams, 'types': types}
+
+
+def convert_csv(path, output_dir=None):
+    """Escribe <nombre>.json junto al CSV (o en output_dir); devuelve la ruta"""
+    with stage('csv_load', bytes=os.path.getsize(path)) as info:
+        data = load_csv_match(path)
+        info['rows'] = len(data['actions'])
+    name = os.path.splitext(os.path.basename(path))[0] + '.json'
+    json_path = os.path.join(output_dir or os.path.dirname(path), name)
+    tmp = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, json_path)
+    return json_path, len(data['actions'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte CSV de AnalistaPro, DataHub y Portero "
+                                                 "al JSON de Attack Metrics")
+    parser.add_argument('paths', nargs='+', help="CSV o directorios con CSV")
+    parser.add_argument('--schema', choices=sorted(SCHEMAS), default=None,
+                        help="solo los CSV de este esquema")
+    parser.add_argument('--output-dir', default=None,
+                        help="directorio de los JSON (por defecto, junto a cada CSV)")
+    parser.add_argument('--inspect', action='store_true',
+                        help="solo resume cada CSV en JSON, sin convertirlo")
+    args = parser.parse_args()
+    set_context(script='csv-import')
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    try:
+        for path, schema in csv_files(args.paths, args.schema):
+            if args.inspect:
+                print(json.dumps(inspect_csv(path, schema), ensure_ascii=False))
+            else:
+                json_path, n_actions = convert_csv(path, args.output_dir)
+                print(f"[OK] {path} ({schema}): {n_actions} acciones -> {json_path}")
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+Lectura de los CSV de AnalistaPro, DataHub y Portero
+Cada herramienta exporta con su propio esquema y delimitador. El esquema se
+detecta por la cabecera, cada columna se lee ya con su tipo (float32,
+categoría o segundos) y los nombres pasan a los del JSON de Attack Metrics
+('x', 'y', 'team', 'player', 'type', 'res'...), de modo que las tablas sirven
+a match_frame, al almacén de temporada y a los motores de estadísticas.
+
+Los ficheros se leen por bloques de filas: un archivo de varias temporadas se
+recorre con iter_csv_chunks / iter_archive sin tenerlo entero en memoria.
+"""
+
+import csv
+import os
+import re
+
+# numpy y pandas se importan dentro de las funciones: los scripts importan
+# este módulo sin pagar su coste si la entrada es JSON
+
+# Filas por bloque al leer un CSV
+CSV_CHUNK_ROWS = 50_000
+
+# Tipos de columna: 'float' (float32, NaN si falta), 'int' (Int32 con nulos),
+# 'category', 'clock' ('MM:SS' o minutos decimales -> segundos) y
+# 'add_seconds' (segundos que se suman a la columna 'seconds')
+SCHEMAS = {
+    # Export de posesiones de AnalistaPro / Attack Metrics
+    'analista': {
+        'delimiter': ',',
+        'required': ('Posesion ID', 'Minuto', 'Jugador', 'Equipo', 'Accion'),
+        'columns': {
+            'Posesion ID': ('possession', 'category'),
+            'Seq Index': ('seq', 'int'),
+            'Periodo': ('period', 'category'),
+            'Equipo': ('team', 'category'),
+            'Minuto': ('seconds', 'clock'),
+            'Jugador': ('player', 'category'),
+            'Fase': ('phase', 'category'),
+            'Accion': ('type', 'category'),
+            'Resultado': ('res', 'category'),
+            'Zona Inicio': ('zone', 'category'),
+            'Zona Inicio (33%)': ('zone', 'category'),
+            'Zona Fin (33%)': ('zoneEnd', 'category'),
+            'Carril': ('lane', 'category'),
+            'X': ('x', 'float'),
+            'Y': ('y', 'float'),
+            'X Fin': ('endX', 'float'),
+            'Y Fin': ('endY', 'float'),
+            'xG': ('xg', 'float'),
+            'xGOT': ('xgot', 'float'),
+        },
+        # Vocabulario de AnalistaPro -> el del JSON
+        'values': {
+            'type': {'Tiro': 'Disparo', 'Conduce': 'Conducción'},
+            'res': {'Completo': 'Completado', 'Exitosa': 'Completado', 'Exitoso': 'Completado',
+                    'Incompleto': 'Fallado', 'Parado': 'Parada'},
+            'phase': {'-': None},
+        },
+        'constants': {},
+    },
+    # Disparos de DataHub (sin coordenadas)
+    'datahub': {
+        'delimiter': ';',
+        'required': ('Minuto', 'Jugador', 'Equipo', 'xG', 'xGOT'),
+        'columns': {
+            'Minuto': ('seconds', 'clock'),
+            'Segundo': ('seconds', 'add_seconds'),
+            'Seg': ('seconds', 'add_seconds'),
+            'Jugador': ('player', 'category'),
+            'Equipo': ('team', 'category'),
+            'Resultado': ('res', 'category'),
+            'xG': ('xg', 'float'),
+            'xGOT': ('xgot', 'float'),
+        },
+        'values': {
+            'team': {'Propio': 'HOME', 'Rival': 'AWAY'},
+            'res': {'Parado': 'Parada'},
+        },
+        'constants': {'type': 'Disparo'},
+    },
+    # Acciones del portero propio, una fila por acción y jornada
+    'portero': {
+        'delimiter': ',',
+        'required': ('Portero', 'Zona', 'Res'),
+        'columns': {
+            'Jornada': ('matchday', 'int'),
+            'Min': ('seconds', 'clock'),
+            'Minuto': ('seconds', 'clock'),
+            'Portero': ('player', 'category'),
+            'Cat': ('cat', 'category'),
+            'Accion': ('type', 'category'),
+            'Var': ('variant', 'category'),
+            'Zona': ('zone', 'category'),
+            'Res': ('res', 'category'),
+            'xG': ('xg', 'float'),
+        },
+        'values': {},
+        'constants': {'team': 'HOME'},
+    },
+}
+
+# Orden de las columnas de un partido al pasarlo a acciones del JSON
+ACTION_KEYS = ('min', 'period', 'team', 'player', 'type', 'res', 'x', 'y', 'endX', 'endY',
+               'xg', 'xgot', 'phase', 'lane', 'zone', 'zoneEnd', 'possession')
+
+_DECIMAL_COMMA = re.compile(r'\d,\d')
+
+
+class CsvSchemaError(ValueError):
+    """CSV cuya cabecera no corresponde a ningún esquema conocido"""
+
+
+def is_csv(path):
+    return str(path).lower().endswith('.csv')
+
+
+def detect_schema(path):
+    """Esquema de un CSV por su cabecera: (nombre, delimitador, separador decimal, cabecera)"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        first = f.readline()
+        sample = [f.readline() for _ in range(5)]
+    delimiter = ';' if first.count(';') > first.count(',') else ','
+    header = [name.strip() for name in next(csv.reader([first], delimiter=delimiter), [])]
+
+    for name, schema in SCHEMAS.items():
+        if schema['delimiter'] == delimiter and set(schema['required']) <= set(header):
+            # Con ';' el export puede venir con coma decimal (Excel en español)
+            decimal = ',' if delimiter == ';' and any(_DECIMAL_COMMA.search(line) for line in sample) \
+                else '.'
+            return name, delimiter, decimal, header
+    raise CsvSchemaError(f"{path}: cabecera no reconocida ({', '.join(header) or 'vacía'})")
+
+
+def csv_schema(path):
+    """Nombre del esquema de un CSV o None si no se reconoce"""
+    try:
+        return detect_schema(path)[0]
+    except (CsvSchemaError, UnicodeDecodeError):
+        return None
+
+
+def _clock_lookup(series):
+    """Segundos de cada valor de una columna de tiempo (cada texto distinto una sola vez)"""
+    import numpy as np
+    from match_frame import MISSING_SECONDS, parse_clock
+
+    def seconds(value):
+        text = str(value).strip()
+        if ':' in text:
+            return parse_clock(text)
+        try:
+            # Minutos decimales (2.25 = 2 min 15 s)
+            return parse_clock(float(text.replace(',', '.')))
+        except ValueError:
+            return MISSING_SECONDS
+
+    categories = series.cat.categories
+    lookup = np.array([seconds(value) for value in categories] + [MISSING_SECONDS], dtype=np.int32)
+    return lookup[series.cat.codes.to_numpy()]
+
+
+def _map_categories(series, mapping):
+    """Renombra categorías según mapping (None = ausente); las que coinciden se unen"""
+    import numpy as np
+    import pandas as pd
+
+    labels = [mapping.get(value, value) for value in series.cat.categories]
+    uniques = list(dict.fromkeys(label for label in labels if label is not None))
+    index = {label: i for i, label in enumerate(uniques)}
+    # Última posición = código -1 (valor ausente)
+    remap = np.array([-1 if label is None else index[label] for label in labels] + [-1],
+                     dtype=np.int32)
+    return pd.Series(pd.Categorical.from_codes(remap[series.cat.codes.to_numpy()], uniques),
+                     index=series.index)
+
+
+def _typed_chunk(chunk, schema, header_values):
+    """Bloque leído -> columnas con los nombres del JSON y su tipo final"""
+    import numpy as np
+    import pandas as pd
+    from match_frame import MISSING_SECONDS
+
+    # Cabeceras repetidas (exports concatenados): las columnas de texto traen su nombre
+    repeated = np.zeros(len(chunk), dtype=bool)
+    for source, value in header_values.items():
+        repeated |= (chunk[source] == value).to_numpy()
+    if repeated.any():
+        chunk = chunk[~repeated].copy()
+        for source, value in header_values.items():
+            chunk[source] = chunk[source].cat.remove_categories([value])
+
+    columns = {}
+    extra_seconds = None
+    for source, (target, kind) in schema['columns'].items():
+        if source not in chunk:
+            continue
+        series = chunk[source]
+        if kind == 'float':
+            columns[target] = series.astype(np.float32)
+        elif kind == 'int':
+            columns[target] = series.astype('Int32')
+        elif kind == 'clock':
+            columns[target] = pd.Series(_clock_lookup(series), index=chunk.index)
+        elif kind == 'add_seconds':
+            extra_seconds = series.fillna(0).astype(np.int32).to_numpy()
+        else:
+            mapping = schema['values'].get(target)
+            if mapping:
+                series = _map_categories(series, mapping)
+            columns[target] = series
+
+    if extra_seconds is not None and 'seconds' in columns:
+        seconds = columns['seconds'].to_numpy()
+        columns['seconds'] = pd.Series(
+            np.where(seconds == MISSING_SECONDS, MISSING_SECONDS, seconds + extra_seconds),
+            index=chunk.index, dtype=np.int32)
+
+    for target, value in schema['constants'].items():
+        columns[target] = pd.Series(pd.Categorical([value] * len(chunk)), index=chunk.index)
+    return pd.DataFrame(columns)
+
+
+def iter_csv_chunks(path, schema=None, chunk_rows=CSV_CHUNK_ROWS, columns=None):
+    """Bloques tipados de un CSV (DataFrames de hasta chunk_rows filas)
+
+    columns limita la lectura a esas columnas de destino ('x', 'team'...).
+    """
+    import numpy as np
+    import pandas as pd
+
+    name, delimiter, decimal, header = detect_schema(path)
+    if schema is not None and schema != name:
+        raise CsvSchemaError(f"{path}: es un CSV de {name}, no de {schema}")
+    spec = SCHEMAS[name]
+
+    usecols, dtype, na_values, header_values = [], {}, {}, {}
+    for source, (target, kind) in spec['columns'].items():
+        if source not in header or (columns is not None and target not in columns):
+            continue
+        usecols.append(source)
+        if kind in ('float', 'int', 'add_seconds'):
+            # Una cabecera repetida se lee como NaN en vez de romper el tipo numérico
+            dtype[source] = np.float32 if kind == 'float' else np.float64
+            na_values[source] = [source]
+        else:
+            dtype[source] = 'category'
+            header_values[source] = source
+
+    reader = pd.read_csv(path, sep=delimiter, decimal=decimal, usecols=usecols, dtype=dtype,
+                         na_values=na_values, encoding='utf-8-sig', skipinitialspace=True,
+                         chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            chunk.columns = [column.strip() for column in chunk.columns]
+            yield _typed_chunk(chunk, spec, header_values)
+
+
+def concat_chunks(chunks):
+    """Une bloques tipados conservando las categorías (unión de los valores de cada bloque)"""
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for name in chunks[0].columns:
+        parts = [chunk[name] for chunk in chunks if name in chunk]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[name] = pd.Series(union_categoricals(parts))
+        else:
+            columns[name] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def read_csv_frame(path, schema=None, columns=None, chunk_rows=CSV_CHUNK_ROWS):
+    """Tabla tipada de un CSV completo (nombres de columna del JSON)"""
+    return concat_chunks(iter_csv_chunks(path, schema, chunk_rows, columns))
+
+
+def iter_archive(root, schema=None):
+    """Rutas de los CSV de un directorio (y sus subdirectorios, p. ej. una carpeta por temporada)
+
+    Con schema solo se devuelven los de ese esquema; los CSV no reconocidos se saltan.
+    """
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            if not is_csv(path):
+                continue
+            found = csv_schema(path)
+            if found is not None and (schema is None or found == schema):
+                yield path, found
+
+
+def frame_actions(frame):
+    """Acciones del JSON (lista de dicts) a partir de una tabla tipada; NaN -> None"""
+    import numpy as np
+    import pandas as pd
+    from match_frame import MISSING_SECONDS
+
+    columns = {}
+    if 'seconds' in frame:
+        seconds = frame['seconds'].to_numpy()
+        # Cada segundo distinto se formatea una sola vez
+        uniques, inverse = np.unique(seconds, return_inverse=True)
+        labels = np.array([None if s == MISSING_SECONDS else f"{s // 60:02d}:{s % 60:02d}"
+                           for s in uniques.tolist()], dtype=object)
+        columns['min'] = labels[inverse]
+    for name in frame.columns:
+        if name == 'seconds':
+            continue
+        series = frame[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.astype(object)
+        else:
+            values = series.astype(object) if series.dtype.kind in 'iub' or series.dtype == 'Int32' \
+                else series.astype(np.float64).round(4).astype(object)
+        columns[name] = values.where(series.notna(), None).to_numpy()
+
+    keys = [key for key in ACTION_KEYS if key in columns] + \
+        [key for key in columns if key not in ACTION_KEYS]
+    rows = zip(*(columns[key].tolist() for key in keys))
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def csv_config(path, source):
+    """Configuración del partido para un CSV: los exports no traen nombres de equipo"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return {'homeTeam': 'LOCAL', 'awayTeam': 'VISITANTE', 'homeName': 'LOCAL',
+            'awayName': 'VISITANTE', 'source': source, 'file': stem}
+
+
+def load_csv_table(path):
+    """Configuración y tabla tipada de un CSV (como match_frame.load_match con un JSON)"""
+    source = detect_schema(path)[0]
+    return csv_config(path, source), read_csv_frame(path, source)
+
+
+def load_csv_match(path):
+    """CSV -> datos con la forma del JSON de Attack Metrics ({'config', 'actions'})"""
+    config, frame = load_csv_table(path)
+    return {'config': config, 'actions': frame_actions(frame)}
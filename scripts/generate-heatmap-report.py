@@ -5,31 +5,54 @@ Genera mapas de calor de jugadores individuales, equipo y recuperaciones
 """
 
 import sys
+import os
+import io
 import json
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # Backend sin GUI
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
-from matplotlib.backends.backend_pdf import PdfPages
-from matplotlib.patches import Rectangle, Circle
+import time
+import argparse
 from datetime import datetime
+from functools import lru_cache
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configuración de estilo
-plt.rcParams['font.family'] = 'sans-serif'
-plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans']
-sns.set_style("white")
+from csv_ingest import is_csv, load_csv_match
+from pdf_output import DEFAULT_RASTER_DPI, fit_pdf_size, megabytes
+from stage_timing import set_context, stage, timed_pages
+
+# numpy, pandas, matplotlib, seaborn y los módulos de cálculo se importan
+# dentro de las funciones: un error de argumentos no paga su importación
+
+@lru_cache(maxsize=None)
+def load_pyplot():
+    """matplotlib (backend sin GUI) con el estilo del informe; se configura una sola vez"""
+    import matplotlib
+    matplotlib.use('Agg')  # Backend sin GUI
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
+    # Configuración de estilo
+    plt.rcParams['font.family'] = 'sans-serif'
+    plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans']
+    sns.set_style("white")
+    return plt
 
 def load_match_data(json_path):
-    """Carga datos del partido desde JSON"""
-    with open(json_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Carga datos del partido desde JSON (o CSV de AnalistaPro / DataHub / Portero)"""
+    if is_csv(json_path):
+        with stage('csv_load', bytes=os.path.getsize(json_path)) as info:
+            data = load_csv_match(json_path)
+            info['rows'] = len(data['actions'])
+        return data
+    with stage('json_load', bytes=os.path.getsize(json_path)) as info:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        info['rows'] = len(data.get('actions', []))
+    return data
 
 def draw_pitch(ax, line_color='black', pitch_color='white'):
     """Dibuja un campo de fútbol profesional"""
+    from pitch_layer import stamp_pitch
+    
     ax.set_facecolor(pitch_color)
     
     # Configurar límites
@@ -37,104 +60,71 @@ def draw_pitch(ax, line_color='black', pitch_color='white'):
     ax.set_ylim(-2, 102)
     ax.set_aspect('auto')
     
-    # Contorno del campo
-    ax.plot([0, 0, 100, 100, 0], [0, 100, 100, 0, 0], 
-            color=line_color, linewidth=2, zorder=10)
-    
-    # Línea de medio campo
-    ax.plot([50, 50], [0, 100], color=line_color, linewidth=2, zorder=10)
-    
-    # Área grande izquierda (penalty area) - solo 3 líneas
-    ax.plot([16.5, 16.5], [21.1, 78.9], color=line_color, linewidth=1.5, zorder=10)  # vertical
-    ax.plot([0, 16.5], [21.1, 21.1], color=line_color, linewidth=1.5, zorder=10)     # horizontal inferior
-    ax.plot([0, 16.5], [78.9, 78.9], color=line_color, linewidth=1.5, zorder=10)     # horizontal superior
-    
-    # Área grande derecha (penalty area) - solo 3 líneas
-    ax.plot([83.5, 83.5], [21.1, 78.9], color=line_color, linewidth=1.5, zorder=10)  # vertical
-    ax.plot([83.5, 100], [21.1, 21.1], color=line_color, linewidth=1.5, zorder=10)   # horizontal inferior
-    ax.plot([83.5, 100], [78.9, 78.9], color=line_color, linewidth=1.5, zorder=10)   # horizontal superior
-    
-    # Área pequeña izquierda (goal area) - solo 3 líneas
-    ax.plot([5.5, 5.5], [36.8, 63.2], color=line_color, linewidth=1.5, zorder=10)    # vertical
-    ax.plot([0, 5.5], [36.8, 36.8], color=line_color, linewidth=1.5, zorder=10)      # horizontal inferior
-    ax.plot([0, 5.5], [63.2, 63.2], color=line_color, linewidth=1.5, zorder=10)      # horizontal superior
-    
-    # Área pequeña derecha (goal area) - solo 3 líneas
-    ax.plot([94.5, 94.5], [36.8, 63.2], color=line_color, linewidth=1.5, zorder=10)  # vertical
-    ax.plot([94.5, 100], [36.8, 36.8], color=line_color, linewidth=1.5, zorder=10)   # horizontal inferior
-    ax.plot([94.5, 100], [63.2, 63.2], color=line_color, linewidth=1.5, zorder=10)   # horizontal superior
-    
-    # Círculo central
-    theta = np.linspace(0, 2*np.pi, 100)
-    x_circle = 50 + 9.15 * np.cos(theta)
-    y_circle = 50 + 9.15 * np.sin(theta)
-    ax.plot(x_circle, y_circle, color=line_color, linewidth=1.5, zorder=10)
-    
-    # Punto central
-    ax.plot(50, 50, 'o', color=line_color, markersize=3, zorder=11)
-    
-    # Puntos de penalty
-    ax.plot(11, 50, 'o', color=line_color, markersize=3, zorder=11)
-    ax.plot(89, 50, 'o', color=line_color, markersize=3, zorder=11)
-    
-    # Arcos de área de penalty - izquierda (mirando hacia el área)
-    theta_left = np.linspace(-0.93, 0.93, 50)
-    arc_x_left = 11 + 9.15 * np.cos(theta_left)
-    arc_y_left = 50 + 9.15 * np.sin(theta_left)
-    ax.plot(arc_x_left, arc_y_left, color=line_color, linewidth=1.5, zorder=10)
-    
-    # Arcos de área de penalty - derecha (mirando hacia el área)
-    theta_right = np.linspace(np.pi - 0.93, np.pi + 0.93, 50)
-    arc_x_right = 89 + 9.15 * np.cos(theta_right)
-    arc_y_right = 50 + 9.15 * np.sin(theta_right)
-    ax.plot(arc_x_right, arc_y_right, color=line_color, linewidth=1.5, zorder=10)
+    # Líneas, áreas, círculo, arcos y puntos en una sola capa precalculada
+    stamp_pitch(ax, 'standard', line_color=line_color, zorder=10, spot_zorder=11)
     
     ax.axis('off')
 
-def generate_player_heatmaps(home_df, pdf_pages, home_team_name):
-    """Genera heatmaps individuales para cada jugador"""
-    player_counts = home_df['player'].value_counts()
-    # Limitar a top 12 jugadores para optimizar velocidad
-    players_sorted = player_counts.head(12).index.tolist()
+# Jugadores por página en la rejilla de mapas individuales
+PLAYERS_PER_PAGE = 12
+
+def generate_player_heatmaps(home_df, pdf_pages, home_team_name, grids=None, scheduler=None,
+                             raster_dpi=None):
+    """Genera heatmaps individuales para cada jugador (12 por página, sin descartar ninguno)"""
+    from heatmap_density import player_density_grids
+    from match_frame import partition
+    from render_scheduler import RenderScheduler
+    
+    if grids is None:
+        grids = player_density_grids(home_df)
+    players_sorted = grids.labels
+    if scheduler is None:
+        scheduler = RenderScheduler([((home_team_name, p), grids.count(p)) for p in players_sorted])
+    
+    # Acciones de cada jugador como tramos contiguos (una sola ordenación)
+    players = partition(home_df, 'player')
+    
+    n_pages = -(-len(players_sorted) // PLAYERS_PER_PAGE)
+    for page in range(n_pages):
+        page_players = players_sorted[page * PLAYERS_PER_PAGE:(page + 1) * PLAYERS_PER_PAGE]
+        suffix = f" ({page + 1}/{n_pages})" if n_pages > 1 else ""
+        generate_player_heatmaps_page(players, pdf_pages, home_team_name + suffix,
+                                      page_players, grids, scheduler, home_team_name, raster_dpi)
+
+def generate_player_heatmaps_page(players, pdf_pages, title_name, players_sorted, grids,
+                                  scheduler, team_key, raster_dpi=None):
+    """Dibuja una página de la rejilla de mapas individuales"""
+    import numpy as np
+    from render_scheduler import draw_tier
+    
+    plt = load_pyplot()
+    started = time.perf_counter()
     n_players = len(players_sorted)
     
-    if n_players == 0:
-        return
-    
     cols = 4
     rows = (n_players // cols) + (1 if n_players % cols > 0 else 0)
     
     fig, axes = plt.subplots(rows, cols, figsize=(20, 5 * rows))
-    if rows == 1 and cols == 1:
-        axes = np.array([axes])
-    axes = axes.flatten() if n_players > 1 else [axes]
+    # Con un solo jugador en la página subplots sigue devolviendo la fila de 4 ejes
+    axes = np.atleast_1d(axes).flatten()
     
-    fig.suptitle(f'Mapas de Calor Individuales - {home_team_name}', 
+    fig.suptitle(f'Mapas de Calor Individuales - {title_name}', 
                  fontsize=24, fontweight='bold', y=0.995)
     
+    drawn = []
     for i, player in enumerate(players_sorted):
         ax = axes[i]
-        player_data = home_df[home_df['player'] == player]
+        player_data = players.group(player)
         
         draw_pitch(ax)
         
         if not player_data.empty and len(player_data) > 3:
-            try:
-                sns.kdeplot(
-                    x=player_data['x'],
-                    y=player_data['y'],
-                    ax=ax,
-                    fill=True,
-                    cmap='Reds',
-                    alpha=0.6,
-                    levels=10,
-                    thresh=0.05,
-                    zorder=2
-                )
-            except:
-                # Si falla el KDE, mostrar scatter
-                ax.scatter(player_data['x'], player_data['y'], 
-                          color='red', s=30, alpha=0.6, zorder=2)
+            # Nivel de calidad según el presupuesto de tiempo restante
+            tier = scheduler.tier_for((team_key, player))
+            tier = draw_tier(ax, tier, player_data['x'], player_data['y'], grids.group(player),
+                             cmap='Reds', alpha=0.6, levels=10, thresh=0.05, zorder=2,
+                             raster_dpi=raster_dpi)
+            drawn.append(((team_key, player), tier))
         
         ax.set_title(f"{player} ({len(player_data)} acciones)", 
                     fontsize=14, fontweight='bold', pad=10)
@@ -146,27 +136,24 @@ def generate_player_heatmaps(home_df, pdf_pages, home_team_name):
     plt.tight_layout()
     pdf_pages.savefig(fig, dpi=100, bbox_inches='tight')
     plt.close(fig)
+    
+    scheduler.record_batch(drawn, time.perf_counter() - started)
 
-def generate_team_heatmap(home_df, pdf_pages, home_team_name):
+def generate_team_heatmap(home_df, pdf_pages, home_team_name, grids=None, raster_dpi=None):
     """Genera mapa de calor del equipo completo"""
+    from heatmap_density import player_density_grids, plot_density
+    
+    plt = load_pyplot()
+    if grids is None:
+        grids = player_density_grids(home_df)
+    
     fig, ax = plt.subplots(figsize=(14, 10))
     
     draw_pitch(ax)
     
     if not home_df.empty and len(home_df) > 10:
-        try:
-            sns.kdeplot(
-                x=home_df['x'],
-                y=home_df['y'],
-                ax=ax,
-                fill=True,
-                cmap='Reds',
-                alpha=0.6,
-                levels=15,
-                thresh=0.05,
-                zorder=2
-            )
-        except:
+        if not plot_density(ax, grids.total, cmap='Reds', alpha=0.6,
+                            levels=15, thresh=0.05, zorder=2, raster_dpi=raster_dpi):
             ax.scatter(home_df['x'], home_df['y'], 
                       color='red', s=20, alpha=0.4, zorder=2)
     
@@ -177,8 +164,13 @@ def generate_team_heatmap(home_df, pdf_pages, home_team_name):
     pdf_pages.savefig(fig, dpi=100, bbox_inches='tight')
     plt.close(fig)
 
-def generate_recoveries_map(home_df, pdf_pages, home_team_name):
+def generate_recoveries_map(home_df, pdf_pages, home_team_name, raster_dpi=None):
     """Genera mapa de recuperaciones por tercios"""
+    from heatmap_density import plot_density, single_density
+    from match_frame import partition
+    from pitch_zones import frame_zone_table
+    
+    plt = load_pyplot()
     rec_types = ['Recup', 'Intercep', 'Recuperación', 'Interceptación']
     recoveries = home_df[home_df['type'].isin(rec_types)].copy()
     
@@ -186,16 +178,7 @@ def generate_recoveries_map(home_df, pdf_pages, home_team_name):
         print("No hay recuperaciones para mostrar")
         return
     
-    def get_third(x):
-        if x < 100/3:
-            return 'Defensivo'
-        elif x < 200/3:
-            return 'Medio'
-        else:
-            return 'Ofensivo'
-    
-    recoveries['third'] = recoveries['x'].apply(get_third)
-    counts = recoveries['third'].value_counts()
+    counts = frame_zone_table(recoveries, 'thirds', metrics=()).series()
     total = len(recoveries)
     
     fig, ax = plt.subplots(figsize=(14, 10))
@@ -209,26 +192,15 @@ def generate_recoveries_map(home_df, pdf_pages, home_team_name):
     
     # KDE de recuperaciones
     if len(recoveries) > 5:
-        try:
-            sns.kdeplot(
-                x=recoveries['x'],
-                y=recoveries['y'],
-                ax=ax,
-                fill=True,
-                cmap='Greens',
-                alpha=0.4,
-                levels=10,
-                thresh=0.05,
-                zorder=2
-            )
-        except:
-            pass
+        density = single_density(recoveries['x'].to_numpy(), recoveries['y'].to_numpy())
+        plot_density(ax, density, cmap='Greens', alpha=0.4, levels=10, thresh=0.05, zorder=2,
+                     raster_dpi=raster_dpi)
     
     # Scatter de recuperaciones
     colors = {'Recup': 'blue', 'Intercep': 'darkgreen', 
               'Recuperación': 'blue', 'Interceptación': 'darkgreen'}
-    for rec_type in recoveries['type'].unique():
-        type_data = recoveries[recoveries['type'] == rec_type]
+    by_type = partition(recoveries, 'type')
+    for rec_type, type_data in by_type:
         ax.scatter(
             type_data['x'], 
             type_data['y'],
@@ -255,17 +227,162 @@ def generate_recoveries_map(home_df, pdf_pages, home_team_name):
     ax.set_title(f"Mapa de Recuperaciones - {home_team_name} (Total: {total})", 
                 fontsize=18, fontweight='bold', pad=20)
     
-    if len(recoveries['type'].unique()) > 1:
+    if len(by_type) > 1:
         ax.legend(loc='lower center', bbox_to_anchor=(0.5, -0.05), 
-                 ncol=len(recoveries['type'].unique()), fontsize=11, 
+                 ncol=len(by_type), fontsize=11, 
                  frameon=True, fancybox=True)
     
     plt.tight_layout()
     pdf_pages.savefig(fig, dpi=100, bbox_inches='tight')
     plt.close(fig)
 
+def generate_pass_network(home_df, pdf_pages, home_team_name, min_passes=2):
+    """Genera la red de pases (posición media y conexiones más repetidas)"""
+    from pass_network import draw_network, match_network
+    
+    network = match_network(home_df)
+    if network.total == 0:
+        print("No hay pases encadenados para la red")
+        return
+    
+    plt = load_pyplot()
+    fig, ax = plt.subplots(figsize=(14, 10))
+    draw_pitch(ax)
+    draw_network(ax, network, min_passes=min_passes)
+    
+    # Conexiones más repetidas
+    top = network.edges(min_passes)[:5]
+    if top:
+        lines = [f"{a} → {b}: {n}" for a, b, n in top]
+        ax.text(1, 1, "Conexiones más repetidas\n" + "\n".join(lines), fontsize=10,
+                va='bottom', ha='left', zorder=20,
+                bbox=dict(boxstyle='round', facecolor='white', alpha=0.85))
+    
+    ax.set_title(f"Red de Pases - {home_team_name} ({network.total} pases, "
+                 f"conexiones de {min_passes} o más)", fontsize=18, fontweight='bold', pad=15)
+    
+    plt.tight_layout()
+    pdf_pages.savefig(fig, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+
+def generate_flow_field(home_df, pdf_pages, home_team_name):
+    """Genera el campo de flujo del equipo (dirección de pases, conducciones y centros)
+    
+    Los campos de cada jugador salen de la misma pasada y van en una rejilla aparte.
+    """
+    from flow_field import FLOW_TYPES, draw_flow, flow_fields
+    
+    fields = flow_fields(home_df, by='player')
+    if fields.count() == 0:
+        print("No hay acciones con destino para el campo de flujo")
+        return
+    
+    plt = load_pyplot()
+    fig, ax = plt.subplots(figsize=(14, 10))
+    draw_pitch(ax)
+    quiver = draw_flow(ax, fields, cmap='Reds')
+    if quiver is not None:
+        colorbar = fig.colorbar(quiver, ax=ax, fraction=0.03, pad=0.01)
+        colorbar.set_label('Acciones por zona', fontsize=11)
+    
+    ax.set_title(f"Campo de Flujo - {home_team_name} ({fields.count()} acciones: "
+                 f"{', '.join(FLOW_TYPES)})", fontsize=18, fontweight='bold', pad=15)
+    
+    plt.tight_layout()
+    pdf_pages.savefig(fig, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+    
+    generate_player_flow_fields(fields, pdf_pages, home_team_name)
+
+def generate_player_flow_fields(fields, pdf_pages, home_team_name):
+    """Campos de flujo individuales (12 por página, de más a menos acciones)"""
+    import numpy as np
+    from flow_field import draw_flow
+    
+    plt = load_pyplot()
+    players = sorted((player for player in fields.labels if fields.count(player) > 0),
+                     key=lambda player: (-fields.count(player), str(player)))
+    n_pages = -(-len(players) // PLAYERS_PER_PAGE)
+    for page in range(n_pages):
+        page_players = players[page * PLAYERS_PER_PAGE:(page + 1) * PLAYERS_PER_PAGE]
+        suffix = f" ({page + 1}/{n_pages})" if n_pages > 1 else ""
+        cols = 4
+        rows = -(-len(page_players) // cols)
+        fig, axes = plt.subplots(rows, cols, figsize=(20, 5 * rows))
+        axes = np.atleast_1d(axes).flatten()
+        fig.suptitle(f'Campos de Flujo Individuales - {home_team_name}{suffix}',
+                     fontsize=24, fontweight='bold', y=0.995)
+        
+        for ax, player in zip(axes, page_players):
+            draw_pitch(ax)
+            # Pocas acciones por jugador: se muestra también la celda con una sola
+            draw_flow(ax, fields, player, min_count=1, cmap='Reds')
+            ax.set_title(f"{player} ({fields.count(player)} acciones)",
+                         fontsize=14, fontweight='bold', pad=10)
+        for ax in axes[len(page_players):]:
+            ax.axis('off')
+        
+        plt.tight_layout()
+        pdf_pages.savefig(fig, dpi=100, bbox_inches='tight')
+        plt.close(fig)
+
+def generate_shot_map(home_df, pdf_pages, home_team_name):
+    """Genera el mapa de disparos (tamaño según el xG; goles rellenos)"""
+    from xg_model import draw_shot_map, shot_table, xg_summary
+    
+    shots = shot_table(home_df)
+    if shots.empty:
+        print("No hay disparos para el mapa")
+        return
+    summary = xg_summary(shots)
+    
+    plt = load_pyplot()
+    fig, ax = plt.subplots(figsize=(14, 10))
+    draw_pitch(ax)
+    draw_shot_map(ax, shots)
+    
+    lines = [f"Disparos: {summary['shots']}   Goles: {summary['goals']}",
+             f"xG del modelo: {summary['xg_model']:.2f}"]
+    if summary['compared']:
+        lines.append(f"xG del export: {summary['xg']:.2f} "
+                     f"(diferencia media {summary['mean_abs_diff']:.2f})")
+    ax.text(1, 1, "\n".join(lines), fontsize=10, va='bottom', ha='left', zorder=20,
+            bbox=dict(boxstyle='round', facecolor='white', alpha=0.85))
+    
+    ax.set_title(f"Mapa de Disparos - {home_team_name} (tamaño según xG)", fontsize=18,
+                 fontweight='bold', pad=15)
+    
+    plt.tight_layout()
+    pdf_pages.savefig(fig, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+
+def draw_metrics_table(ax, team_df, top=6):
+    """Tabla de métricas de posesión: total del equipo y jugadores con más xGChain"""
+    from possession_metrics import metrics_table, rank
+    
+    ax.axis('off')
+    players = rank(metrics_table(team_df, 'player'), 'xg_chain', top)
+    totals = metrics_table(team_df, 'team').iloc[0]
+    columns = ('xt', 'xg', 'xg_chain', 'xg_buildup')
+    rows = [[f"{row[c]:.2f}" for c in columns] for _, row in players.iterrows()]
+    rows.append([f"{totals[c]:.2f}" for c in columns])
+    table = ax.table(cellText=rows, rowLabels=[str(p) for p in players.index] + ['EQUIPO'],
+                     colLabels=['xT', 'xG', 'xGChain', 'xGBuild.'],
+                     loc='upper center', cellLoc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(9)
+    table.scale(1, 1.3)
+    for (row, _), cell in table.get_celld().items():
+        if row == 0 or row == len(rows):
+            cell.set_text_props(fontweight='bold')
+    ax.set_title('Amenaza por posesiones', fontsize=13, fontweight='bold', pad=10)
+
 def generate_statistics_page(home_df, pdf_pages, home_team_name, config):
     """Genera página con estadísticas del partido"""
+    import numpy as np
+    from pitch_zones import frame_zone_table
+    
+    plt = load_pyplot()
     fig = plt.figure(figsize=(11, 14))
     fig.suptitle(f'Estadísticas del Partido', 
                  fontsize=22, fontweight='bold', y=0.98)
@@ -281,7 +398,7 @@ def generate_statistics_page(home_df, pdf_pages, home_team_name, config):
                 fontsize=16, fontweight='bold')
     
     # Estadísticas generales
-    ax_stats = plt.subplot2grid((10, 2), (1, 0), colspan=2, rowspan=3)
+    ax_stats = plt.subplot2grid((10, 2), (1, 0), colspan=1, rowspan=3)
     ax_stats.axis('off')
     
     stats_text = f"Estadísticas de {home_team_name}\n\n"
@@ -297,6 +414,10 @@ def generate_statistics_page(home_df, pdf_pages, home_team_name, config):
     ax_stats.text(0.1, 0.9, stats_text, ha='left', va='top', 
                  fontsize=12, family='monospace')
     
+    # xT añadido, xG, xGChain y xGBuildup (equipo y jugadores con más xGChain)
+    ax_metrics = plt.subplot2grid((10, 2), (1, 1), colspan=1, rowspan=3)
+    draw_metrics_table(ax_metrics, home_df)
+    
     # Top 5 jugadores más activos
     ax_players = plt.subplot2grid((10, 2), (4, 0), colspan=1, rowspan=3)
     player_counts = home_df['player'].value_counts().head(5)
@@ -332,37 +453,8 @@ def generate_statistics_page(home_df, pdf_pages, home_team_name, config):
     # Distribución espacial (zonas del campo)
     ax_zones = plt.subplot2grid((10, 2), (7, 0), colspan=2, rowspan=3)
     
-    def get_zone(row):
-        x, y = row['x'], row['y']
-        if x < 33.3:
-            zone_h = 'Defensivo'
-        elif x < 66.6:
-            zone_h = 'Medio'
-        else:
-            zone_h = 'Ofensivo'
-        
-        if y < 33.3:
-            zone_v = 'Izquierda'
-        elif y < 66.6:
-            zone_v = 'Centro'
-        else:
-            zone_v = 'Derecha'
-        
-        return f"{zone_h} - {zone_v}"
-    
-    home_df_zones = home_df.copy()
-    home_df_zones['zone'] = home_df_zones.apply(get_zone, axis=1)
-    zone_counts = home_df_zones['zone'].value_counts()
-    
-    # Ordenar por zona
-    zone_order = []
-    for h in ['Defensivo', 'Medio', 'Ofensivo']:
-        for v in ['Izquierda', 'Centro', 'Derecha']:
-            zone_name = f"{h} - {v}"
-            if zone_name in zone_counts.index:
-                zone_order.append(zone_name)
-    
-    zone_counts = zone_counts.reindex(zone_order)
+    # Conteo por zonas 3x3 en una pasada, en orden de zona y sin zonas vacías
+    zone_counts = frame_zone_table(home_df, '3x3', metrics=()).series(drop_empty=True)
     
     colors_zones = plt.cm.viridis(np.linspace(0.2, 0.9, len(zone_counts)))
     bars_zones = ax_zones.barh(range(len(zone_counts)), zone_counts.values, color=colors_zones)
@@ -380,8 +472,257 @@ def generate_statistics_page(home_df, pdf_pages, home_team_name, config):
     pdf_pages.savefig(fig, dpi=100, bbox_inches='tight')
     plt.close(fig)
 
-def generate_pdf_report(json_path, pdf_path):
-    """Función principal que genera el informe PDF completo para ambos equipos"""
+# Páginas de cada equipo, en el orden del informe
+PAGE_SEQUENCE = (
+    ('statistics', "Generando página de estadísticas {side}..."),
+    ('team_heatmap', "Generando mapa de calor del equipo {side}..."),
+    ('player_heatmaps', "Generando mapas de calor individuales {side}..."),
+    ('recoveries', "Generando mapa de recuperaciones {side}..."),
+    ('pass_network', "Generando red de pases {side}..."),
+    ('flow_field', "Generando campos de flujo {side}..."),
+    ('shot_map', "Generando mapa de disparos {side}..."),
+)
+
+def split_teams(data):
+    """Separa las acciones por equipo (Y invertida); devuelve [(lado, nombre, df)]"""
+    from match_frame import match_frame, select_team
+    from possession_metrics import assign_possessions
+    from xg_model import fill_xg
+    
+    with stage('frame', rows=len(data['actions'])):
+        df = match_frame(data['actions'])
+        # Posesiones con el partido completo: las acciones del rival las cortan
+        assign_possessions(df)
+        # xG del modelo donde el export no lo trae
+        fill_xg(df)
+    config = data.get('config', {})
+    
+    teams = []
+    for team, side, name_key, default_name in (('HOME', 'LOCAL', 'homeTeam', 'LOCAL'),
+                                               ('AWAY', 'VISITANTE', 'awayTeam', 'VISITANTE')):
+        with stage('filter', team=team) as info:
+            team_df = select_team(df, team, flip_y=True)
+            info['rows'] = len(team_df)
+        if team_df.empty:
+            continue
+        teams.append((side, config.get(name_key, default_name), team_df))
+    return teams
+
+def report_metadata(config):
+    """Metadatos del PDF (los mismos en modo secuencial y paralelo)"""
+    home_team_name = config.get('homeTeam', 'LOCAL')
+    away_team_name = config.get('awayTeam', 'VISITANTE')
+    return {
+        'Title': f'Informe Completo: {home_team_name} vs {away_team_name}',
+        'Author': 'Attack Metrics Suite',
+        'Subject': 'Análisis de Partido',
+        'Keywords': 'Fútbol, Análisis, Heatmap',
+        'CreationDate': datetime.now(),
+    }
+
+def render_team_page(kind, team_df, pdf_pages, team_name, config, grids=None, scheduler=None,
+                     raster_dpi=None):
+    """Dibuja una página de un equipo en pdf_pages (densidades como imagen si hay raster_dpi)"""
+    pdf_pages = timed_pages(pdf_pages, kind)
+    with stage('draw', page=kind, team=team_name, rows=len(team_df)):
+        if kind == 'statistics':
+            generate_statistics_page(team_df, pdf_pages, team_name, config)
+        elif kind == 'team_heatmap':
+            generate_team_heatmap(team_df, pdf_pages, team_name, grids, raster_dpi)
+        elif kind == 'player_heatmaps':
+            generate_player_heatmaps(team_df, pdf_pages, team_name, grids, scheduler, raster_dpi)
+        elif kind == 'recoveries':
+            generate_recoveries_map(team_df, pdf_pages, team_name, raster_dpi)
+        elif kind == 'pass_network':
+            generate_pass_network(team_df, pdf_pages, team_name)
+        elif kind == 'flow_field':
+            generate_flow_field(team_df, pdf_pages, team_name)
+        elif kind == 'shot_map':
+            generate_shot_map(team_df, pdf_pages, team_name)
+
+def render_page_bytes(task):
+    """Worker del pool: renderiza una página en un PDF en memoria y devuelve sus bytes
+
+    Devuelve también los tiempos de los jugadores dibujados con el plan recibido.
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+    from render_scheduler import RenderScheduler
+    
+    load_pyplot()
+    kind, team_df, team_name, config, tiers, raster_dpi = task
+    scheduler = RenderScheduler(player_artifacts([(None, team_name, team_df)]), tiers=tiers)
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        render_team_page(kind, team_df, pdf, team_name, config, scheduler=scheduler,
+                         raster_dpi=raster_dpi)
+    # Sin páginas (p. ej. equipo sin recuperaciones) PdfPages no escribe nada
+    return buffer.getvalue(), scheduler.report
+
+def report_page_tasks(teams, config, plan=None, raster_dpi=None):
+    """Tareas de render_page_bytes en el orden del informe: [(clave, tarea)]"""
+    tasks = []
+    for side, team_name, team_df in teams:
+        team_plan = {name: tier for name, tier in (plan or {}).items() if name[0] == team_name}
+        for kind, _ in PAGE_SEQUENCE:
+            tasks.append((f"{side}-{kind}", (kind, team_df, team_name, config, team_plan, raster_dpi)))
+    return tasks
+
+def render_page_pdf(task):
+    """Bytes PDF de una tarea de página (sin el informe de niveles)"""
+    return render_page_bytes(task)[0]
+
+def job_pages(json_path, raster_dpi=None):
+    """Páginas del informe para el modo trabajo: ([(clave, render() -> bytes)], metadatos)"""
+    from functools import partial
+    
+    data = load_match_data(json_path)
+    if not data.get('actions'):
+        raise ValueError("No hay acciones en los datos")
+    config = data.get('config', {})
+    tasks = report_page_tasks(split_teams(data), config, raster_dpi=raster_dpi)
+    pages = [(key, partial(render_page_pdf, task)) for key, task in tasks]
+    return pages, report_metadata(config)
+
+def job_done(json_path):
+    """Al terminar un trabajo, como al final de generate_pdf_report"""
+    record_in_season_store(json_path, None)
+
+def merge_pdf_pages(pages, pdf_path, metadata):
+    """Une los PDFs de cada página en orden y escribe los metadatos del informe"""
+    from pypdf import PdfReader, PdfWriter
+    
+    writer = PdfWriter()
+    info = {}
+    for page_bytes in pages:
+        if page_bytes:
+            reader = PdfReader(io.BytesIO(page_bytes))
+            if not info and reader.metadata:
+                # Creator/Producer de matplotlib, como en el modo secuencial
+                info.update(reader.metadata)
+            writer.append(reader)
+    
+    for key, value in metadata.items():
+        if isinstance(value, datetime):
+            value = value.strftime("D:%Y%m%d%H%M%S")
+        info[f'/{key}'] = value
+    writer.add_metadata(info)
+    
+    with stage('pdf_write', pages=len(pages)) as stats:
+        with open(pdf_path, 'wb') as f:
+            writer.write(f)
+            stats['bytes'] = f.tell()
+    return stats['bytes']
+
+def parallel_available():
+    """El modo paralelo necesita pypdf para unir las páginas"""
+    try:
+        import pypdf  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def player_artifacts(teams):
+    """(equipo, jugador) y nº de acciones de cada mapa individual del informe"""
+    return [((team_name, player), int(count))
+            for _, team_name, team_df in teams
+            for player, count in team_df['player'].value_counts().items()]
+
+def print_render_plan(summary):
+    """Resumen de niveles de calidad y tiempos por jugador"""
+    tiers = {}
+    for entry in summary['artifacts']:
+        tiers[entry['tier']] = tiers.get(entry['tier'], 0) + 1
+    resumen = ', '.join(f"{tier}: {n}" for tier, n in tiers.items())
+    print(f"\nPlan de render ({'degradado' if summary['degraded'] else 'completo'}): {resumen}")
+    for entry in summary['artifacts']:
+        print(f"  {entry['artifact']:<40} {entry['actions']:>6} acciones  {entry['tier']:<8} "
+              f"{entry['elapsed_ms']:>8.1f} ms (estimado {entry['estimated_ms']:.1f} ms)")
+
+def record_in_season_store(json_path, data):
+    """Guarda las rejillas del partido en el almacén de temporada (si SEASON_STORE_DIR está definido)"""
+    from season_store import SeasonStore, store_dir
+    
+    if not store_dir():
+        return
+    try:
+        entry = SeasonStore(store_dir()).add_match(json_path, data)
+        print(f"Partido guardado en el almacén de temporada: {entry['match_id']}")
+    except Exception as e:
+        # El informe ya está generado: un fallo del almacén no lo invalida
+        print(f"[AVISO] No se pudo guardar en el almacén de temporada: {e}")
+
+def write_report_pdf(teams, config, pdf_path, workers=None, deadline=None, raster_dpi=None,
+                     team_grids=None):
+    """Escribe las páginas de ambos equipos en pdf_path; devuelve (bytes, scheduler)
+
+    team_grids guarda las densidades de cada equipo entre intentos del mismo informe.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from matplotlib.backends.backend_pdf import PdfPages
+    from heatmap_density import player_density_grids
+    from render_scheduler import RENDER_TIERS, RenderScheduler, plan_tiers
+    
+    metadata = report_metadata(config)
+    scheduler = RenderScheduler(player_artifacts(teams), deadline)
+    if team_grids is None:
+        team_grids = {}
+    
+    if workers and workers > 1:
+        # ========== MODO PARALELO: una página por tarea ==========
+        # Plan estático: el presupuesto se reparte entre los procesos del pool
+        budget = None if deadline is None else deadline * workers
+        plan = plan_tiers(scheduler.artifacts, budget)
+        scheduler.degraded = any(tier != RENDER_TIERS[0] for tier in plan.values())
+        
+        for side, team_name, _ in teams:
+            print(f"Encolando páginas de {team_name} ({side})...")
+        tasks = [task for _, task in report_page_tasks(teams, config, plan, raster_dpi)]
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map conserva el orden de las tareas
+            results = list(pool.map(render_page_bytes, tasks))
+        
+        for _, report in results:
+            scheduler.report.extend(report)
+        size = merge_pdf_pages([page for page, _ in results], pdf_path, metadata)
+    else:
+        # Crear PDF con ambos equipos
+        pdf = PdfPages(pdf_path)
+        try:
+            for side, team_name, team_df in teams:
+                print(f"\nGenerando informe para {team_name}...")
+                
+                # Densidades del equipo y jugadores (una sola pasada)
+                if side not in team_grids:
+                    with stage('density', team=team_name, rows=len(team_df)):
+                        team_grids[side] = player_density_grids(team_df)
+                
+                for kind, message in PAGE_SEQUENCE:
+                    print(message.format(side=side))
+                    render_team_page(kind, team_df, pdf, team_name, config, team_grids[side],
+                                     scheduler, raster_dpi)
+            
+            # Metadata del PDF
+            d = pdf.infodict()
+            d.update(metadata)
+        finally:
+            # Las páginas ya se escribieron en cada savefig; al cerrar se
+            # escriben fuentes, tabla de objetos y trailer
+            with stage('pdf_write', pages=pdf.get_pagecount()) as info:
+                pdf.close()
+                info['bytes'] = size = os.path.getsize(pdf_path)
+    
+    return size, scheduler
+
+def generate_pdf_report(json_path, pdf_path, workers=None, deadline=None, raster_dpi=None,
+                        max_bytes=None):
+    """Función principal que genera el informe PDF completo para ambos equipos
+    
+    workers > 1 renderiza las páginas en un pool de procesos y las une en orden.
+    deadline (segundos) degrada la calidad de los mapas individuales para cumplir el plazo.
+    raster_dpi dibuja las densidades como imagen (campo y texto siguen vectoriales);
+    max_bytes vuelve a escribir el informe con menos DPI hasta no superar ese tamaño.
+    """
     try:
         # Cargar datos
         data = load_match_data(json_path)
@@ -391,72 +732,36 @@ def generate_pdf_report(json_path, pdf_path):
             print("Error: No hay acciones en los datos")
             return False
         
-        df = pd.DataFrame(data['actions'])
-        
-        # Obtener configuración
+        # Obtener configuración y filtrar equipos
         config = data.get('config', {})
-        home_team_name = config.get('homeTeam', 'LOCAL')
-        away_team_name = config.get('awayTeam', 'VISITANTE')
+        teams = split_teams(data)
         
-        # Filtrar equipos
-        home_df = df[df['team'] == 'HOME'].copy()
-        away_df = df[df['team'] == 'AWAY'].copy()
+        if workers and workers > 1 and not parallel_available():
+            print("[AVISO] pypdf no está instalado: se genera el informe en modo secuencial")
+            workers = None
         
-        # Invertir eje Y (según requerimiento del usuario)
-        if not home_df.empty:
-            home_df['y'] = 100 - home_df['y']
-        if not away_df.empty:
-            away_df['y'] = 100 - away_df['y']
+        team_grids = {}
+        schedulers = []
         
-        # Crear PDF con ambos equipos
-        with PdfPages(pdf_path) as pdf:
-            # ========== EQUIPO LOCAL (HOME) ==========
-            if not home_df.empty:
-                print(f"Generando informe para {home_team_name}...")
-                
-                # Página 1: Estadísticas generales
-                print("Generando página de estadísticas LOCAL...")
-                generate_statistics_page(home_df, pdf, home_team_name, config)
-                
-                # Página 2: Mapa de calor del equipo
-                print("Generando mapa de calor del equipo LOCAL...")
-                generate_team_heatmap(home_df, pdf, home_team_name)
-                
-                # Página 3+: Mapas de calor individuales
-                print("Generando mapas de calor individuales LOCAL...")
-                generate_player_heatmaps(home_df, pdf, home_team_name)
-                
-                # Última página: Mapa de recuperaciones
-                print("Generando mapa de recuperaciones LOCAL...")
-                generate_recoveries_map(home_df, pdf, home_team_name)
-            
-            # ========== EQUIPO VISITANTE (AWAY) ==========
-            if not away_df.empty:
-                print(f"\nGenerando informe para {away_team_name}...")
-                
-                # Página 1: Estadísticas generales
-                print("Generando página de estadísticas VISITANTE...")
-                generate_statistics_page(away_df, pdf, away_team_name, config)
-                
-                # Página 2: Mapa de calor del equipo
-                print("Generando mapa de calor del equipo VISITANTE...")
-                generate_team_heatmap(away_df, pdf, away_team_name)
-                
-                # Página 3+: Mapas de calor individuales
-                print("Generando mapas de calor individuales VISITANTE...")
-                generate_player_heatmaps(away_df, pdf, away_team_name)
-                
-                # Última página: Mapa de recuperaciones
-                print("Generando mapa de recuperaciones VISITANTE...")
-                generate_recoveries_map(away_df, pdf, away_team_name)
-            
-            # Metadata del PDF
-            d = pdf.infodict()
-            d['Title'] = f'Informe Completo: {home_team_name} vs {away_team_name}'
-            d['Author'] = 'Attack Metrics Suite'
-            d['Subject'] = 'Análisis de Partido'
-            d['Keywords'] = 'Fútbol, Análisis, Heatmap'
-            d['CreationDate'] = datetime.now()
+        def write(dpi):
+            size, scheduler = write_report_pdf(teams, config, pdf_path, workers, deadline, dpi,
+                                               team_grids)
+            schedulers.append(scheduler)
+            if max_bytes is not None:
+                print(f"Informe a {dpi} DPI: {size / 1024:.0f} KB")
+            return size
+        
+        raster_dpi, size, attempts = fit_pdf_size(write, max_bytes, raster_dpi)
+        
+        if deadline is not None:
+            print_render_plan(schedulers[-1].summary())
+        
+        if max_bytes is not None:
+            fits = "dentro del" if size <= max_bytes else "por encima del"
+            print(f"\nTamaño final: {size / 1024:.0f} KB a {raster_dpi} DPI, {fits} límite de "
+                  f"{max_bytes / 1024:.0f} KB ({attempts} intento{'s' if attempts > 1 else ''})")
+        
+        record_in_season_store(json_path, data)
         
         print(f"\n[OK] Informe PDF generado exitosamente: {pdf_path}")
         return True
@@ -468,12 +773,26 @@ def generate_pdf_report(json_path, pdf_path):
         return False
 
 if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print("Uso: python generate-heatmap-report.py <json_path> <pdf_output_path>")
-        sys.exit(1)
-    
-    json_path = sys.argv[1]
-    pdf_path = sys.argv[2]
-    
-    success = generate_pdf_report(json_path, pdf_path)
+    set_context(script='generate-heatmap-report')
+    parser = argparse.ArgumentParser(
+        description="Genera el informe PDF con mapas de calor de ambos equipos")
+    parser.add_argument('json_path')
+    parser.add_argument('pdf_output_path')
+    parser.add_argument('--workers', type=int, default=None,
+                        help="procesos para renderizar páginas en paralelo (0 = todos los núcleos)")
+    parser.add_argument('--deadline', type=float, default=None,
+                        help="plazo en segundos; los mapas individuales bajan de calidad para cumplirlo")
+    parser.add_argument('--raster-dpi', type=int, default=None,
+                        help="dibuja las densidades como imagen a este DPI (por defecto, vectoriales)")
+    parser.add_argument('--max-size', type=megabytes, default=None, dest='max_bytes',
+                        help=f"tamaño máximo del PDF en MB; rasteriza (desde {DEFAULT_RASTER_DPI} "
+                             "DPI si no se indica) y baja el DPI hasta cumplirlo")
+    args = parser.parse_args()
+    
+    workers = args.workers
+    if workers == 0:
+        workers = os.cpu_count()
+    
+    success = generate_pdf_report(args.json_path, args.pdf_output_path, workers, args.deadline,
+                                  args.raster_dpi, args.max_bytes)
     sys.exit(0 if success else 1)
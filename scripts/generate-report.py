@@ -4,93 +4,80 @@ Generador de Informes PDF para Attack Metrics
 Genera mapas de calor y estadísticas de un partido
 """
 
+import os
 import sys
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
-from matplotlib.backends.backend_pdf import PdfPages
-from matplotlib.patches import Rectangle, Circle, FancyBboxPatch
 from datetime import datetime
+from functools import lru_cache
 
-# Configuración de estilo
-plt.rcParams['font.family'] = 'sans-serif'
-plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans']
+from csv_ingest import is_csv, load_csv_match
+from pdf_output import DEFAULT_RASTER_DPI, fit_pdf_size, megabytes
+from stage_timing import set_context, stage, timed_pages
+
+# numpy, pandas, matplotlib y seaborn se importan al generar el informe:
+# un error de uso responde sin pagar su importación
+
+@lru_cache(maxsize=None)
+def load_pyplot():
+    """matplotlib.pyplot con el estilo del informe (se configura una sola vez)"""
+    import matplotlib.pyplot as plt
+    
+    # Configuración de estilo
+    plt.rcParams['font.family'] = 'sans-serif'
+    plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans']
+    return plt
 
 def load_match_data(json_path):
-    """Carga datos del partido desde JSON"""
-    with open(json_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Carga datos del partido desde JSON (o CSV de AnalistaPro / DataHub / Portero)"""
+    if is_csv(json_path):
+        with stage('csv_load', bytes=os.path.getsize(json_path)) as info:
+            data = load_csv_match(json_path)
+            info['rows'] = len(data['actions'])
+        return data
+    with stage('json_load', bytes=os.path.getsize(json_path)) as info:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        info['rows'] = len(data.get('actions', []))
+    return data
 
 def draw_pitch(ax, line_color='white', pitch_color='#2d5016'):
     """Dibuja un campo de fútbol en el eje proporcionado con mejor estilo"""
+    from pitch_layer import stamp_pitch
+    
     ax.set_facecolor(pitch_color)
     
-    # Contorno del campo con sombra
-    ax.plot([0, 0, 100, 100, 0], [0, 100, 100, 0, 0], 
-            color=line_color, linewidth=3, zorder=1)
-    
-    # Línea de medio campo
-    ax.plot([50, 50], [0, 100], color=line_color, linewidth=2.5, zorder=1)
-    
-    # Áreas grandes (penalty area)
-    ax.add_patch(Rectangle((0, 21.1), 17, 57.8, 
-                           fill=False, edgecolor=line_color, linewidth=2, zorder=1))
-    ax.add_patch(Rectangle((83, 21.1), 17, 57.8, 
-                           fill=False, edgecolor=line_color, linewidth=2, zorder=1))
-    
-    # Áreas pequeñas (goal area)
-    ax.add_patch(Rectangle((0, 36.8), 5.8, 26.4, 
-                           fill=False, edgecolor=line_color, linewidth=2, zorder=1))
-    ax.add_patch(Rectangle((94.2, 36.8), 5.8, 26.4, 
-                           fill=False, edgecolor=line_color, linewidth=2, zorder=1))
-    
-    # Círculo central con gradiente
-    circle = Circle((50, 50), 8.7, fill=False, edgecolor=line_color, linewidth=2, zorder=1)
-    ax.add_patch(circle)
-    
-    # Punto central
-    ax.plot(50, 50, 'o', color=line_color, markersize=6, zorder=2)
-    
-    # Puntos de penalti
-    ax.plot(11, 50, 'o', color=line_color, markersize=5, zorder=2)
-    ax.plot(89, 50, 'o', color=line_color, markersize=5, zorder=2)
-    
-    # Arcos del área (semicírculos)
-    arc_theta = np.linspace(-np.pi/2, np.pi/2, 50)
-    arc_x1 = 17 + 9.15 * np.cos(arc_theta)
-    arc_y1 = 50 + 9.15 * np.sin(arc_theta)
-    ax.plot(arc_x1, arc_y1, color=line_color, linewidth=2, zorder=1)
-    
-    arc_x2 = 83 - 9.15 * np.cos(arc_theta)
-    arc_y2 = 50 + 9.15 * np.sin(arc_theta)
-    ax.plot(arc_x2, arc_y2, color=line_color, linewidth=2, zorder=1)
-    
-    # Esquinas
-    corner_radius = 1
-    for x, y in [(0, 0), (0, 100), (100, 0), (100, 100)]:
-        if x == 0:
-            theta = np.linspace(0, np.pi/2, 20)
-            cx = x + corner_radius * np.cos(theta)
-            cy = y + corner_radius * np.sin(theta) * (-1 if y == 0 else 1)
-        else:
-            theta = np.linspace(np.pi/2, np.pi, 20)
-            cx = x + corner_radius * np.cos(theta)
-            cy = y + corner_radius * np.sin(theta) * (-1 if y == 0 else 1)
-        ax.plot(cx, cy, color=line_color, linewidth=1.5, zorder=1)
+    # Contorno, áreas, círculo, arcos y esquinas en una sola capa precalculada
+    stamp_pitch(ax, 'full', line_color=line_color, zorder=1, spot_zorder=2)
     
     ax.set_xlim(-5, 105)
     ax.set_ylim(-5, 105)
     ax.set_aspect('equal')
     ax.axis('off')
 
-def generate_player_heatmaps(df, team_name, pdf):
+def draw_density(ax, x, y, raster_dpi=None, **style):
+    """KDE de seaborn (contornos vectoriales) o, con raster_dpi, la rejilla de densidad
+    como imagen; los contornos sin relleno siguen siendo vectoriales"""
+    if not raster_dpi:
+        import seaborn as sns
+        sns.kdeplot(x=x, y=y, ax=ax, **style)
+        return
+    from heatmap_density import plot_density, single_density
+    
+    density = single_density(x.to_numpy(dtype=float), y.to_numpy(dtype=float))
+    if not plot_density(ax, density, raster_dpi=raster_dpi, **style):
+        raise ValueError("densidad degenerada")
+
+def generate_player_heatmaps(df, team_name, pdf, raster_dpi=None):
     """Genera heatmaps individuales para cada jugador con diseño mejorado"""
+    from matplotlib.patches import FancyBboxPatch
+    from match_frame import partition
+    
+    plt = load_pyplot()
     df = df.copy()
     df['y'] = 100 - df['y']
     
-    players = df['player'].value_counts().index.tolist()
+    by_player = partition(df, 'player')
+    players = by_player.by_count()
     n_players = len(players)
     cols = 3
     rows = (n_players // cols) + (1 if n_players % cols > 0 else 0)
@@ -113,17 +100,18 @@ def generate_player_heatmaps(df, team_name, pdf):
         row, col = divmod(i, cols)
         ax = fig.add_subplot(gs[row, col])
         
-        player_data = df[df['player'] == player]
+        player_data = by_player.group(player)
         
         draw_pitch(ax, line_color='#4CAF50', pitch_color='#1a3a0f')
         
         if len(player_data) >= 3:
             try:
                 # Heatmap con colores más vibrantes
-                sns.kdeplot(
-                    x=player_data['x'],
-                    y=player_data['y'],
-                    ax=ax,
+                draw_density(
+                    ax,
+                    player_data['x'],
+                    player_data['y'],
+                    raster_dpi,
                     fill=True,
                     cmap='hot',
                     alpha=0.8,
@@ -156,8 +144,11 @@ def generate_player_heatmaps(df, team_name, pdf):
     pdf.savefig(fig, facecolor='#0a0a0a', dpi=150)
     plt.close()
 
-def generate_team_heatmap(df, team_name, pdf):
+def generate_team_heatmap(df, team_name, pdf, raster_dpi=None):
     """Genera heatmap del equipo completo con visualización mejorada"""
+    from matplotlib.patches import FancyBboxPatch
+    
+    plt = load_pyplot()
     df = df.copy()
     df['y'] = 100 - df['y']
     
@@ -170,10 +161,11 @@ def generate_team_heatmap(df, team_name, pdf):
     
     if len(df) >= 3:
         # Heatmap con colores más intensos
-        sns.kdeplot(
-            x=df['x'],
-            y=df['y'],
-            ax=ax,
+        draw_density(
+            ax,
+            df['x'],
+            df['y'],
+            raster_dpi,
             fill=True,
             cmap='plasma',
             alpha=0.85,
@@ -182,10 +174,11 @@ def generate_team_heatmap(df, team_name, pdf):
         )
         
         # Agregar contornos
-        sns.kdeplot(
-            x=df['x'],
-            y=df['y'],
-            ax=ax,
+        draw_density(
+            ax,
+            df['x'],
+            df['y'],
+            raster_dpi,
             fill=False,
             cmap='viridis',
             levels=5,
@@ -213,6 +206,10 @@ def generate_team_heatmap(df, team_name, pdf):
 
 def generate_statistics_page(df, team_name, config, pdf):
     """Genera página con estadísticas del equipo con diseño moderno"""
+    import numpy as np
+    from matplotlib.patches import FancyBboxPatch
+    
+    plt = load_pyplot()
     fig = plt.figure(figsize=(14, 11))
     fig.patch.set_facecolor('#0a0a0a')
     
@@ -366,42 +363,118 @@ def generate_statistics_page(df, team_name, config, pdf):
     pdf.savefig(fig, facecolor='#0a0a0a', dpi=150)
     plt.close()
 
-def generate_report(json_path, pdf_path):
-    """Función principal que genera el informe completo"""
+def report_metadata(config):
+    """Metadatos del PDF"""
+    return {
+        'Title': f'Informe - {config["homeName"]} vs {config["awayName"]}',
+        'Author': 'Attack Metrics Suite',
+        'Subject': 'Análisis de Partido de Fútbol',
+        'Keywords': 'Football, Analytics, Heatmap, Performance',
+        'CreationDate': datetime.now(),
+    }
+
+def load_home_actions(data):
+    """DataFrame de las acciones del equipo local"""
+    from match_frame import match_frame, select_team
+    
+    with stage('frame', rows=len(data['actions'])):
+        df = match_frame(data['actions'])
+    with stage('filter', team='HOME') as info:
+        home_df = select_team(df, 'HOME')
+        info['rows'] = len(home_df)
+    return df, home_df
+
+def render_page_bytes(kind, home_df, config, raster_dpi=None):
+    """Renderiza una página del informe en un PDF en memoria y devuelve sus bytes"""
+    import io
+    from matplotlib.backends.backend_pdf import PdfPages
+    
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        pages = timed_pages(pdf, kind)
+        with stage('draw', page=kind, rows=len(home_df)):
+            if kind == 'statistics':
+                generate_statistics_page(home_df, config['homeName'], config, pages)
+            elif kind == 'team_heatmap':
+                generate_team_heatmap(home_df, config['homeName'], pages, raster_dpi)
+            elif kind == 'player_heatmaps':
+                generate_player_heatmaps(home_df, config['homeName'], pages, raster_dpi)
+    return buffer.getvalue()
+
+# Páginas del informe, en orden
+PAGE_KINDS = ('statistics', 'team_heatmap', 'player_heatmaps')
+
+def job_pages(json_path, raster_dpi=None):
+    """Páginas del informe para el modo trabajo: ([(clave, render() -> bytes)], metadatos)"""
+    from functools import partial
+    
+    data = load_match_data(json_path)
+    config = data['config']
+    _, home_df = load_home_actions(data)
+    pages = [(kind, partial(render_page_bytes, kind, home_df, config, raster_dpi))
+             for kind in PAGE_KINDS]
+    return pages, report_metadata(config)
+
+def write_report_pdf(home_df, config, pdf_path, raster_dpi=None):
+    """Escribe las páginas del informe en pdf_path; devuelve los bytes del PDF"""
+    from matplotlib.backends.backend_pdf import PdfPages
+    
+    pdf = PdfPages(pdf_path)
+    try:
+        # Página 1: Portada con estadísticas
+        print("  → Página 1: Estadísticas generales")
+        with stage('draw', page='statistics', rows=len(home_df)):
+            generate_statistics_page(home_df, config['homeName'], config,
+                                     timed_pages(pdf, 'statistics'))
+        
+        # Página 2: Heatmap del equipo
+        print("  → Página 2: Mapa de calor del equipo")
+        with stage('draw', page='team_heatmap', rows=len(home_df)):
+            generate_team_heatmap(home_df, config['homeName'], timed_pages(pdf, 'team_heatmap'),
+                                  raster_dpi)
+        
+        # Páginas siguientes: Heatmaps individuales
+        print("  → Páginas siguientes: Mapas individuales de jugadores")
+        with stage('draw', page='player_heatmaps', rows=len(home_df)):
+            generate_player_heatmaps(home_df, config['homeName'],
+                                     timed_pages(pdf, 'player_heatmaps'), raster_dpi)
+        
+        # Metadatos del PDF
+        pdf.infodict().update(report_metadata(config))
+    finally:
+        with stage('pdf_write', pages=pdf.get_pagecount()) as info:
+            pdf.close()
+            info['bytes'] = size = os.path.getsize(pdf_path)
+    return size
+
+def generate_report(json_path, pdf_path, raster_dpi=None, max_bytes=None):
+    """Función principal que genera el informe completo
+    
+    raster_dpi dibuja las densidades como imagen (campo y texto siguen vectoriales);
+    max_bytes vuelve a escribir el informe con menos DPI hasta no superar ese tamaño.
+    """
     try:
         print("📄 Cargando datos del partido...")
         data = load_match_data(json_path)
         config = data['config']
-        df = pd.DataFrame(data['actions'])
+        df, home_df = load_home_actions(data)
         
         print(f"✓ Datos cargados: {len(df)} acciones")
-        
-        # Filtrar equipo HOME
-        home_df = df[df['team'] == 'HOME'].copy()
         print(f"✓ Acciones del equipo local: {len(home_df)}")
         
         # Crear PDF con múltiples páginas
         print("📊 Generando informe PDF...")
-        with PdfPages(pdf_path) as pdf:
-            # Página 1: Portada con estadísticas
-            print("  → Página 1: Estadísticas generales")
-            generate_statistics_page(home_df, config['homeName'], config, pdf)
-            
-            # Página 2: Heatmap del equipo
-            print("  → Página 2: Mapa de calor del equipo")
-            generate_team_heatmap(home_df, config['homeName'], pdf)
-            
-            # Páginas siguientes: Heatmaps individuales
-            print("  → Páginas siguientes: Mapas individuales de jugadores")
-            generate_player_heatmaps(home_df, config['homeName'], pdf)
-            
-            # Metadatos del PDF
-            d = pdf.infodict()
-            d['Title'] = f'Informe - {config["homeName"]} vs {config["awayName"]}'
-            d['Author'] = 'Attack Metrics Suite'
-            d['Subject'] = 'Análisis de Partido de Fútbol'
-            d['Keywords'] = 'Football, Analytics, Heatmap, Performance'
-            d['CreationDate'] = datetime.now()
+        
+        def write(dpi):
+            size = write_report_pdf(home_df, config, pdf_path, dpi)
+            if max_bytes is not None:
+                print(f"  · {dpi} DPI: {size / 1024:.0f} KB")
+            return size
+        
+        raster_dpi, size, attempts = fit_pdf_size(write, max_bytes, raster_dpi)
+        if max_bytes is not None and size > max_bytes:
+            print(f"⚠️ El PDF ocupa {size / 1024:.0f} KB a {raster_dpi} DPI, "
+                  f"por encima del límite de {max_bytes / 1024:.0f} KB")
         
         print(f"✅ PDF generado exitosamente: {pdf_path}")
         return 0
@@ -413,12 +486,18 @@ def generate_report(json_path, pdf_path):
         return 1
 
 if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print("Uso: python generate-report.py <json_path> <pdf_path>", file=sys.stderr)
-        sys.exit(1)
-    
-    json_path = sys.argv[1]
-    pdf_path = sys.argv[2]
-    
-    exit_code = generate_report(json_path, pdf_path)
+    import argparse
+    
+    set_context(script='generate-report')
+    parser = argparse.ArgumentParser(description="Genera el informe PDF del equipo local")
+    parser.add_argument('json_path')
+    parser.add_argument('pdf_path')
+    parser.add_argument('--raster-dpi', type=int, default=None,
+                        help="dibuja las densidades como imagen a este DPI (por defecto, vectoriales)")
+    parser.add_argument('--max-size', type=megabytes, default=None, dest='max_bytes',
+                        help=f"tamaño máximo del PDF en MB; rasteriza (desde {DEFAULT_RASTER_DPI} "
+                             "DPI si no se indica) y baja el DPI hasta cumplirlo")
+    args = parser.parse_args()
+    
+    exit_code = generate_report(args.json_path, args.pdf_path, args.raster_dpi, args.max_bytes)
     sys.exit(exit_code)
@@ -1,44 +1,44 @@
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
 import base64
 import io
+import os
 import sys
+import time
 
-def img_to_base64(fig):
+import heatmap_cache
+from csv_ingest import is_csv, load_csv_match
+from stage_timing import set_context, stage
+
+# Parámetros de render (forman parte de la clave de caché)
+DPI = 100
+STYLE = 'reds'
+
+# pandas, numpy y matplotlib se importan dentro de las funciones de render:
+# un acierto de caché no paga su coste de importación
+
+def img_to_base64(fig, dpi=DPI, tight=True):
     """Convierte una figura matplotlib a base64"""
+    import matplotlib.pyplot as plt
+    
     buffer = io.BytesIO()
-    fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-    buffer.seek(0)
-    img_base64 = base64.b64encode(buffer.read()).decode()
+    with stage('savefig') as info:
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight' if tight else None)
+        info['bytes'] = buffer.tell()
+    with stage('encode') as info:
+        img_base64 = base64.b64encode(buffer.getvalue()).decode()
+        info['bytes'] = len(img_base64)
     plt.close(fig)
     return img_base64
 
 def draw_pitch():
     """Retorna axes con el campo dibujado"""
-    fig, ax = plt.subplots(figsize=(12, 8))
+    import matplotlib.pyplot as plt
+    from pitch_layer import stamp_pitch
     
-    # Pitch outline
-    ax.plot([0, 0, 100, 100, 0], [0, 100, 100, 0, 0], color="black", linewidth=2)
-    
-    # Center line
-    ax.plot([50, 50], [0, 100], color="black", linewidth=1)
-    
-    # Penalty Areas
-    ax.plot([0, 17, 17, 0], [21.1, 21.1, 78.9, 78.9], color="black", linewidth=1)
-    ax.plot([100, 83, 83, 100], [21.1, 21.1, 78.9, 78.9], color="black", linewidth=1)
-    
-    # Goal Areas
-    ax.plot([0, 5.8, 5.8, 0], [36.8, 36.8, 63.2, 63.2], color="black", linewidth=1)
-    ax.plot([100, 94.2, 94.2, 100], [36.8, 36.8, 63.2, 63.2], color="black", linewidth=1)
+    fig, ax = plt.subplots(figsize=(12, 8))
     
-    # Center Circle
-    theta = np.linspace(0, 2*np.pi, 100)
-    x_circle = 50 + 8.7 * np.cos(theta)
-    y_circle = 50 + 13.4 * np.sin(theta)
-    ax.plot(x_circle, y_circle, color="black", linewidth=1)
+    # Líneas del campo en una sola colección (geometría precalculada)
+    stamp_pitch(ax, 'basic', line_color="black")
     
     ax.set_xlim(-5, 105)
     ax.set_ylim(-5, 105)
@@ -46,90 +46,377 @@ def draw_pitch():
     
     return fig, ax
 
-def generate_heatmaps(file_path, team='HOME'):
-    """Genera los mapas de calor y retorna como base64"""
+def render_team_image(team, density):
+    """Mapa del equipo como PNG en base64 (None si falla)"""
+    from heatmap_density import plot_density
     
-    # Cargar datos
-    with open(file_path, 'r') as f:
-        data = json.load(f)
-    
-    df = pd.DataFrame(data['actions'])
-    home_df = df[df['team'] == team].copy()
+    try:
+        with stage('draw', artifact='team'):
+            fig, ax = draw_pitch()
+            plot_density(ax, density, cmap='Reds', alpha=0.6, levels=15, thresh=0.05)
+            ax.set_title(f"Mapa de Calor - {team} (Eje Y Invertido)")
+        return img_to_base64(fig)
+    except Exception as e:
+        print(f"Error en mapa de equipo: {e}", file=sys.stderr)
+        return None
+
+def render_player_image(player, x, y, density, n_actions, tier='kde'):
+    """Mapa de un jugador como PNG en base64; devuelve (imagen, nivel usado)"""
+    import matplotlib.pyplot as plt
+    from render_scheduler import draw_tier, tier_dpi
     
-    # Invertir eje Y
-    home_df['y'] = 100 - home_df['y']
+    with stage('draw', artifact=str(player), rows=n_actions) as info:
+        fig, ax = draw_pitch()
+        try:
+            tier = draw_tier(ax, tier, x, y, density, cmap='Reds', alpha=0.6, levels=10,
+                             thresh=0.05)
+            if tier == 'kde':
+                # Puntos de detalle solo en calidad completa (coste por acción)
+                ax.scatter(x, y, color='black', s=3, alpha=0.3)
+            ax.set_title(f"{player} ({n_actions} actions)")
+        except Exception:
+            plt.close(fig)
+            raise
+        info['tier'] = tier
+    # Los niveles degradados se guardan con menos píxeles y sin recorte ajustado
+    return img_to_base64(fig, tier_dpi(tier, DPI), tight=tier == 'kde'), tier
+
+def _coordinate(value):
+    """Coordenada como float o None si falta o no es numérica"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value == value else None
+
+def heatmap_stats(actions, team='HOME'):
+    """Solo player_stats (mismos valores que el render), sin imágenes ni numpy/pandas"""
+    totals = {}
+    for action in actions:
+        if action.get('team') != team or action.get('player') is None:
+            continue
+        # acciones, n_x, Σx, n_y, Σy (eje Y invertido, como los mapas)
+        entry = totals.setdefault(str(action['player']), [0, 0, 0.0, 0, 0.0])
+        entry[0] += 1
+        x, y = _coordinate(action.get('x')), _coordinate(action.get('y'))
+        if x is not None:
+            entry[1] += 1
+            entry[2] += x
+        if y is not None:
+            entry[3] += 1
+            entry[4] += 100 - y
     
+    # De más a menos acciones, empates por nombre
+    players = sorted(totals, key=lambda p: (-totals[p][0], p))
+    return {
+        'team_heatmap': None,
+        'player_heatmaps': {},
+        'player_stats': {
+            p: {
+                'actions': totals[p][0],
+                'avg_x': round(totals[p][2] / totals[p][1], 3) if totals[p][1] else None,
+                'avg_y': round(totals[p][4] / totals[p][3], 3) if totals[p][3] else None,
+            }
+            for p in players
+        },
+        'render_plan': {'cached': False, 'degraded': False, 'stats_only': True, 'artifacts': []},
+    }
+
+def load_match_data(file_path):
+    """Datos del partido desde el JSON (o un CSV de AnalistaPro / DataHub / Portero)"""
+    if is_csv(file_path):
+        with stage('csv_load', bytes=os.path.getsize(file_path)) as info:
+            data = load_csv_match(file_path)
+            info['rows'] = len(data['actions'])
+        return data
+    with stage('json_load', bytes=os.path.getsize(file_path)) as info:
+        with open(file_path, 'r') as f:
+            data = json.load(f)
+        info['rows'] = len(data.get('actions', []))
+    return data
+
+def generate_stats(file_path, team='HOME'):
+    """Estadísticas por jugador de un fichero, sin renderizar"""
+    data = load_match_data(file_path)
+    return heatmap_stats(data['actions'], team)
+
+def generate_heatmaps(file_path, team='HOME', use_cache=True, deadline=None, started=None):
+    """Genera los mapas de calor y retorna como base64 (con caché en disco)"""
+    return collect_records(iter_heatmaps(file_path, team, use_cache, deadline, started))
+
+def collect_records(records):
+    """Agrupa los registros del modo streaming en el JSON clásico de resultados"""
     results = {
         'team_heatmap': None,
         'player_heatmaps': {},
         'player_stats': {}
     }
+    for record in records:
+        if record['type'] == 'team_heatmap':
+            results['team_heatmap'] = record['image']
+        elif record['type'] == 'player':
+            results['player_heatmaps'][record['player']] = record['image']
+            results['player_stats'][record['player']] = record['stats']
+        elif record['type'] == 'metrics':
+            results['metrics'] = {k: v for k, v in record.items() if k != 'type'}
+        elif record['type'] == 'render_plan':
+            results['render_plan'] = {k: v for k, v in record.items() if k != 'type'}
+    return results
+
+def iter_heatmaps(file_path, team='HOME', use_cache=True, deadline=None, started=None):
+    """Genera los mapas de calor como registros, cada uno en cuanto está listo
     
-    # 1. Mapa de calor del equipo
-    print("Generando mapa de calor del equipo...", file=sys.stderr)
-    fig, ax = draw_pitch()
+    Primero {'type': 'team_heatmap', 'image'}, después un
+    {'type': 'player', 'player', 'image', 'stats'} por jugador, las métricas de
+    posesión {'type': 'metrics', 'team', 'players'} y por último
+    {'type': 'render_plan'} con los niveles de calidad y tiempos. El deadline
+    cuenta desde started (time.perf_counter() del inicio de la petición; por
+    defecto, ahora), así que incluye la lectura del JSON y las densidades.
+    """
+    if started is None:
+        started = time.perf_counter()
+    # Cargar datos
+    data = load_match_data(file_path)
     
+    use_cache = use_cache and heatmap_cache.cache_enabled()
+    if not use_cache:
+        yield from render_heatmaps(data['actions'], team, deadline, started)
+        return
+    
+    with stage('cache_lookup') as info:
+        key = heatmap_cache.cache_key(data['actions'], team, STYLE, DPI)
+        meta = heatmap_cache.lookup(key)
+        # Entrada expulsada entre lookup() y la lectura: se trata como fallo
+        records = heatmap_cache.load_records(key, meta) if meta is not None else None
+        info['hit'] = records is not None
+    if records is not None:
+        print("Mapas de calor servidos desde caché", file=sys.stderr)
+        yield from records
+        yield {'type': 'render_plan', 'cached': True, 'degraded': False, 'artifacts': []}
+        return
+    
+    # Fallo de caché: cada registro se escribe en disco a medida que se emite
     try:
-        sns.kdeplot(
-            x=home_df['x'],
-            y=home_df['y'],
-            ax=ax,
-            fill=True,
-            cmap='Reds',
-            alpha=0.6,
-            levels=15,
-            thresh=0.05
-        )
-        ax.set_title(f"Mapa de Calor - {team} (Eje Y Invertido)")
-        results['team_heatmap'] = img_to_base64(fig)
-    except Exception as e:
-        print(f"Error en mapa de equipo: {e}", file=sys.stderr)
+        writer = heatmap_cache.CacheWriter(key)
+    except OSError as e:
+        print(f"No se pudo guardar en caché: {e}", file=sys.stderr)
+        writer = None
+    
+    completed = False
+    try:
+        for record in render_heatmaps(data['actions'], team, deadline, started):
+            if writer is not None:
+                try:
+                    writer.add(record)
+                except OSError as e:
+                    print(f"No se pudo guardar en caché: {e}", file=sys.stderr)
+                    writer.abort()
+                    writer = None
+            if record['type'] == 'render_plan':
+                # Un render degradado por el plazo no se guarda en caché
+                completed = not record['degraded']
+            yield record
+    finally:
+        if writer is not None:
+            # Solo se publican entradas completas
+            if completed:
+                writer.commit()
+            else:
+                writer.abort()
+
+def team_metric_records(frame, team):
+    """xT, xG, xGChain y xGBuildup del equipo y de sus jugadores, listos para el JSON"""
+    from possession_metrics import assign_possessions, metrics_records, metrics_table, team_metrics
+    from xg_model import fill_xg
+    
+    assign_possessions(frame)
+    # xG del modelo en los disparos sin xG del export
+    fill_xg(frame)
+    players = metrics_table(frame[frame['team'] == team], 'player')
+    teams = metrics_records(team_metrics(frame))
+    return {'team': teams.get(team), 'players': metrics_records(players)}
+
+def render_heatmaps(actions, team='HOME', deadline=None, started=None):
+    """Renderiza los mapas de calor del equipo y de cada jugador (generador de registros)
+    
+    Con deadline (segundos) cada jugador se dibuja con el nivel de calidad que
+    permita terminarlos todos a tiempo; el último registro ('render_plan')
+    informa de los niveles elegidos y los tiempos (y de si se cumplió el plazo).
+    """
+    from heatmap_density import player_density_grids
+    from match_frame import match_frame, partition, select_team
+    from render_scheduler import RenderScheduler
+    
+    # Columnas tipadas (float32, categorías); eje Y invertido
+    with stage('frame', rows=len(actions)):
+        frame = match_frame(actions)
+    # Métricas de posesión con el partido completo (el rival corta las posesiones)
+    with stage('metrics', rows=len(frame)):
+        metrics = team_metric_records(frame, team)
+    with stage('filter') as info:
+        home_df = select_team(frame, team, flip_y=True)
+        # Acciones de cada jugador como tramos contiguos (una sola ordenación)
+        players = partition(home_df, 'player')
+        info['rows'] = len(home_df)
+    
+    # Densidades del equipo y de todos los jugadores en una sola pasada
+    with stage('density', rows=len(home_df)) as info:
+        grids = player_density_grids(home_df)
+        info['groups'] = len(grids.labels)
+    players_sorted = grids.labels
+    scheduler = RenderScheduler(
+        [(player, grids.count(player)) for player in players_sorted], deadline, DPI,
+        started=started)
+    
+    # 1. Mapa de calor del equipo
+    print("Generando mapa de calor del equipo...", file=sys.stderr)
+    team_image = render_team_image(team, grids.total)
+    if team_image is not None:
+        yield {'type': 'team_heatmap', 'image': team_image}
     
     # 2. Mapas de calor por jugador
     print("Generando mapas de calor por jugador...", file=sys.stderr)
-    players_sorted = home_df['player'].value_counts().index.tolist()
     
     for player in players_sorted:
-        player_data = home_df[home_df['player'] == player]
-        
-        fig, ax = draw_pitch()
+        player_data = players.group(player)
+        player_started = time.perf_counter()
+        tier = scheduler.tier_for(player)
         
         try:
-            sns.kdeplot(
-                x=player_data['x'],
-                y=player_data['y'],
-                ax=ax,
-                fill=True,
-                cmap='Reds',
-                alpha=0.6,
-                levels=10,
-                thresh=0.05
-            )
-            ax.scatter(player_data['x'], player_data['y'], color='black', s=3, alpha=0.3)
-            ax.set_title(f"{player} ({len(player_data)} actions)")
-            
-            results['player_heatmaps'][player] = img_to_base64(fig)
-            results['player_stats'][player] = {
-                'actions': len(player_data),
-                'avg_x': float(player_data['x'].mean()),
-                'avg_y': float(player_data['y'].mean()),
+            image, tier = render_player_image(player, player_data['x'], player_data['y'],
+                                              grids.group(player), len(player_data), tier)
+            record = {
+                'type': 'player',
+                'player': player,
+                'image': image,
+                'stats': {
+                    'actions': len(player_data),
+                    # Coordenadas en float32: más decimales serían ruido
+                    'avg_x': round(float(player_data['x'].mean()), 3),
+                    'avg_y': round(float(player_data['y'].mean()), 3),
+                },
             }
         except Exception as e:
             print(f"Error en jugador {player}: {e}", file=sys.stderr)
+            continue
+        finally:
+            scheduler.record(player, tier, time.perf_counter() - player_started)
+        
+        yield record
     
-    return results
+    yield {'type': 'metrics', **metrics}
+    yield {'type': 'render_plan', **scheduler.summary()}
+
+def write_records(records, stream_out=None, request_id=None):
+    """Escribe cada registro como una línea NDJSON en cuanto llega"""
+    stream_out = stream_out or sys.stdout
+    for record in records:
+        if request_id is not None:
+            record = {'id': request_id, 'record': record}
+        stream_out.write(json.dumps(record) + '\n')
+        stream_out.flush()
+
+def warm_up():
+    """Precarga pandas, matplotlib y la caché de fuentes dibujando una figura de prueba"""
+    import pandas  # noqa: F401
+    import heatmap_density  # noqa: F401
+    
+    fig, ax = draw_pitch()
+    ax.set_title("warm-up")
+    img_to_base64(fig)
+
+def serve(max_jobs=None, stream_in=None, stream_out=None):
+    """Modo worker: una petición JSON por línea en stdin, una respuesta JSON por línea en stdout"""
+    stream_in = stream_in or sys.stdin
+    stream_out = stream_out or sys.stdout
+    
+    warm_up()
+    stream_out.write(json.dumps({'ready': True}) + '\n')
+    stream_out.flush()
+    
+    jobs = 0
+    for line in stream_in:
+        line = line.strip()
+        if not line:
+            continue
+        
+        request_id = None
+        started = time.perf_counter()
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            set_context(job=request_id, team=request.get('team', 'HOME'))
+            with stage('request', live=bool(request.get('live'))):
+                if request.get('live'):
+                    # Modo directo: estado incremental en memoria de este worker
+                    from live_heatmaps import live_update
+                    response = {'id': request_id, 'ok': True, 'result': live_update(request)}
+                elif request.get('statsOnly'):
+                    result = generate_stats(request['jsonFile'], request.get('team', 'HOME'))
+                    response = {'id': request_id, 'ok': True, 'result': result}
+                else:
+                    records = iter_heatmaps(request['jsonFile'], request.get('team', 'HOME'),
+                                            deadline=request.get('deadline'), started=started)
+                    if request.get('stream'):
+                        # Un frame {'id', 'record'} por artefacto y el frame final sin resultado
+                        write_records(records, stream_out, request_id)
+                        response = {'id': request_id, 'ok': True, 'result': None}
+                    else:
+                        response = {'id': request_id, 'ok': True, 'result': collect_records(records)}
+        except Exception as e:
+            response = {'id': request_id, 'ok': False, 'error': str(e)}
+        
+        # json.dumps escapa los saltos de línea: una línea = una respuesta completa
+        stream_out.write(json.dumps(response) + '\n')
+        stream_out.flush()
+        
+        jobs += 1
+        if max_jobs and jobs >= max_jobs:
+            # Reciclado: el supervisor arranca un worker nuevo
+            break
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print(json.dumps({'error': 'Usage: python script.py <json_file> [team]'}))
+    started = time.perf_counter()
+    set_context(script='generate_heatmap')
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        max_jobs = None
+        if '--max-jobs' in sys.argv:
+            max_jobs = int(sys.argv[sys.argv.index('--max-jobs') + 1])
+        serve(max_jobs)
+        sys.exit(0)
+    
+    stream = '--stream' in sys.argv
+    stats_only = '--stats-only' in sys.argv
+    deadline = None
+    args = []
+    argv = iter(sys.argv[1:])
+    for arg in argv:
+        if arg == '--deadline':
+            deadline = float(next(argv))
+        elif arg not in ('--stream', '--stats-only'):
+            args.append(arg)
+    
+    if len(args) < 1:
+        print(json.dumps({'error': 'Usage: python script.py <json_file> [team] [--stream] [--deadline S] [--stats-only] | --worker [--max-jobs N]'}))
         sys.exit(1)
     
-    json_file = sys.argv[1]
-    team = sys.argv[2] if len(sys.argv) > 2 else 'HOME'
+    json_file = args[0]
+    team = args[1] if len(args) > 1 else 'HOME'
+    set_context(team=team)
     
     try:
-        results = generate_heatmaps(json_file, team)
-        print(json.dumps(results))
+        with stage('request'):
+            if stats_only:
+                print(json.dumps(generate_stats(json_file, team)))
+            elif stream:
+                # NDJSON: un registro por línea en cuanto se genera
+                write_records(iter_heatmaps(json_file, team, deadline=deadline, started=started))
+            else:
+                results = generate_heatmaps(json_file, team, deadline=deadline, started=started)
+                print(json.dumps(results))
     except Exception as e:
-        print(json.dumps({'error': str(e)}))
+        if stream:
+            print(json.dumps({'type': 'error', 'error': str(e)}))
+        else:
+            print(json.dumps({'error': str(e)}))
         sys.exit(1)
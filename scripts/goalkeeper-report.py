@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Informe de porteros a partir de los CSV de la app Portero
+Lee todos los exports indicados (o los de los directorios, una carpeta por
+temporada) en una sola tabla y genera una página PDF que compara porteros y
+temporadas: xG recibido frente a goles encajados, % de paradas por jornada,
+resumen y acciones por zona. Con --json escribe además los datos del informe.
+
+Uso:
+    python goalkeeper-report.py <csv|directorio>... [--output informe.pdf] [--json datos.json]
+                                [--player NOMBRE]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from stage_timing import set_context, stage
+
+
+def load_pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.rcParams['font.family'] = 'sans-serif'
+    plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans']
+    return plt
+
+
+def draw_xg_bars(ax, summary):
+    """xG recibido frente a goles encajados por temporada y portero"""
+    import numpy as np
+
+    labels = [f"{player}\n{season}" for season, player in summary.index]
+    x = np.arange(len(labels))
+    ax.bar(x - 0.2, summary['xg_faced'], width=0.4, color='#3498db', label='xG recibido')
+    ax.bar(x + 0.2, summary['conceded'], width=0.4, color='#e74c3c', label='Goles encajados')
+    for i, rate in enumerate(summary['save_rate']):
+        if rate == rate:
+            ax.annotate(f"{rate:.0%}", (x[i], max(summary['xg_faced'].iloc[i],
+                                                  summary['conceded'].iloc[i])),
+                        ha='center', va='bottom', fontsize=8, fontweight='bold')
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels, fontsize=8)
+    ax.set_title('xG recibido vs goles encajados (% paradas)', fontsize=12, fontweight='bold')
+    ax.legend(fontsize=8)
+    ax.grid(axis='y', alpha=0.3)
+
+
+def draw_save_rate(ax, by_matchday):
+    """% de paradas acumulado por jornada, una línea por temporada y portero"""
+    for (season, player), group in by_matchday.groupby(level=['season', 'player'],
+                                                       observed=True, sort=True):
+        matchdays = group.index.get_level_values('matchday')
+        saves = group['saves'].cumsum()
+        faced = (saves + group['conceded'].cumsum()).where(lambda s: s > 0)
+        ax.plot(matchdays, saves / faced, marker='o', markersize=3, linewidth=1.5,
+                label=f"{player} ({season})")
+    ax.set_ylim(0, 1.05)
+    ax.set_xlabel('Jornada')
+    ax.set_title('% de paradas acumulado', fontsize=12, fontweight='bold')
+    ax.legend(fontsize=7, ncol=2)
+    ax.grid(alpha=0.3)
+
+
+def draw_summary_table(ax, summary):
+    """Tabla con el resumen por temporada y portero"""
+    header = ['Portero', 'Temp.', 'J', 'Acc.', 'Par.', 'GC', '% Par.', 'xG rec.', 'Evitados']
+    rows = []
+    for (season, player), row in summary.iterrows():
+        rate = row['save_rate']
+        rows.append([player, season, int(row['matchdays']), int(row['actions']),
+                     int(row['saves']), int(row['conceded']),
+                     f"{rate:.0%}" if rate == rate else '-', f"{row['xg_faced']:.2f}",
+                     f"{row['goals_prevented']:+.2f}"])
+    ax.axis('off')
+    table = ax.table(cellText=rows, colLabels=header, loc='upper center', cellLoc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(8)
+    table.scale(1, 1.4)
+    ax.set_title('Resumen por temporada', fontsize=12, fontweight='bold')
+
+
+def draw_zone_mix(ax, mix):
+    """Acciones por zona (filas) y categoría (columnas)"""
+    image = ax.imshow(mix.to_numpy(), cmap='Blues', aspect='auto')
+    ax.set_xticks(range(len(mix.columns)))
+    ax.set_xticklabels([str(c) for c in mix.columns], fontsize=8)
+    ax.set_yticks(range(len(mix.index)))
+    ax.set_yticklabels([str(i) for i in mix.index], fontsize=8)
+    limit = mix.to_numpy().max() / 2 if mix.size else 0
+    for (i, j), n in zip(((i, j) for i in range(mix.shape[0]) for j in range(mix.shape[1])),
+                         mix.to_numpy().ravel()):
+        ax.text(j, i, int(n), ha='center', va='center', fontsize=7,
+                color='white' if n > limit else 'black')
+    ax.set_title('Acciones por zona', fontsize=12, fontweight='bold')
+    return image
+
+
+def generate_goalkeeper_page(table, pdf_pages, title='Informe de Porteros'):
+    """Página de comparación de porteros y temporadas"""
+    from goalkeeper_metrics import action_mix, goalkeeper_summary, matchday_summary
+
+    summary = goalkeeper_summary(table)
+    plt = load_pyplot()
+    fig, axes = plt.subplots(2, 2, figsize=(16, 11))
+    draw_xg_bars(axes[0, 0], summary)
+    draw_save_rate(axes[0, 1], matchday_summary(table))
+    draw_summary_table(axes[1, 0], summary)
+    draw_zone_mix(axes[1, 1], action_mix(table, 'zone', 'cat', by=None))
+    seasons = sorted(str(s) for s in table['season'].unique())
+    fig.suptitle(f"{title} ({', '.join(seasons)})", fontsize=18, fontweight='bold')
+    plt.tight_layout(rect=(0, 0, 1, 0.96))
+    pdf_pages.savefig(fig, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Informe de porteros (CSV de la app Portero)")
+    parser.add_argument('paths', nargs='+', help="CSV de Portero o directorios (uno por temporada)")
+    parser.add_argument('--output', default='informe_porteros.pdf', help="PDF del informe")
+    parser.add_argument('--json', default=None, help="escribe también los datos en este JSON")
+    parser.add_argument('--player', default=None, help="solo este portero")
+    args = parser.parse_args()
+    set_context(script='goalkeeper-report')
+
+    from goalkeeper_metrics import goalkeeper_report, load_goalkeeper_table, write_report_json
+
+    try:
+        with stage('csv_load') as info:
+            table = load_goalkeeper_table(args.paths)
+            info['rows'] = len(table)
+        if args.player:
+            table = table[table['player'] == args.player]
+        if table.empty:
+            print("[ERROR] No hay acciones de porteros en los ficheros indicados", file=sys.stderr)
+            return 1
+        with stage('metrics', rows=len(table)):
+            report = goalkeeper_report(table)
+        if args.json:
+            write_report_json(args.json, report)
+            print(f"[OK] Datos: {args.json}")
+
+        from matplotlib.backends.backend_pdf import PdfPages
+
+        with stage('draw', page='goalkeepers', rows=len(table)):
+            tmp = f"{args.output}.{os.getpid()}.tmp"
+            with PdfPages(tmp) as pdf:
+                generate_goalkeeper_page(table, pdf)
+            os.replace(tmp, args.output)
+        print(f"[OK] Informe PDF: {args.output}")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(report['summary'], ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Métricas de porteros a partir de los CSV de la app Portero
+Cada export (Jornada, Min, Portero, Cat, Accion, Var, Zona, Res, xG) se lee con
+el esquema 'portero' de csv_ingest y todos se unen en una tabla compacta
+(categorías, jornada int16, xG float32) con una columna 'season': la carpeta
+de primer nivel bajo el directorio indicado (una carpeta por temporada), o la
+carpeta del fichero si se pasa suelto.
+
+Las cuentas siguen a la app (Portero.html): 'GOL' es gol encajado, 'OK' en
+Defensa, Blocaje o Duelo es parada ('KO' es un fallo que no acabó en gol), el
+% de paradas es paradas / (paradas + goles) y el xG recibido suma el xG de
+todas las acciones. Resúmenes, evolución por jornada y mezcla de acciones por
+zona salen de groupby / pivot_table sobre esa tabla, sin recorrer filas en
+Python.
+"""
+
+import json
+import os
+import tempfile
+
+# Categorías de la app en las que un 'OK' es una parada y resultados de cada caso
+SAVE_CATEGORIES = ('Defensa', 'Blocaje', 'Duelo')
+SAVE_RESULTS = ('OK',)
+CONCEDED_RESULTS = ('GOL',)
+
+# Columnas de la tabla de resumen (mismo orden en JSON y en la página)
+SUMMARY_FIELDS = ('matchdays', 'actions', 'saves', 'conceded', 'save_rate', 'xg_faced',
+                  'xg_conceded', 'goals_prevented')
+COUNT_FIELDS = ('matchdays', 'actions', 'saves', 'conceded')
+
+TABLE_COLUMNS = ('season', 'matchday', 'seconds', 'player', 'cat', 'type', 'variant', 'zone',
+                 'res', 'xg')
+
+
+def goalkeeper_files(paths):
+    """(ruta, temporada) de cada CSV de Portero indicado o encontrado en los directorios"""
+    from csv_ingest import CsvSchemaError, csv_schema, iter_archive
+
+    for path in paths:
+        if os.path.isdir(path):
+            root = os.path.abspath(path)
+            for found, _ in iter_archive(path, 'portero'):
+                relative = os.path.relpath(os.path.abspath(found), root).split(os.sep)
+                yield found, relative[0] if len(relative) > 1 else os.path.basename(root)
+            continue
+        if csv_schema(path) != 'portero':
+            raise CsvSchemaError(f"{path}: no es un export de Portero")
+        yield path, os.path.basename(os.path.dirname(os.path.abspath(path)))
+
+
+def load_goalkeeper_table(paths):
+    """Tabla tipada con las acciones de todos los exports (columna 'season')"""
+    import numpy as np
+    import pandas as pd
+    from csv_ingest import concat_chunks, read_csv_frame
+
+    frames = []
+    for path, season in goalkeeper_files(paths):
+        frame = read_csv_frame(path, 'portero')
+        frame['season'] = pd.Categorical([season] * len(frame))
+        frames.append(frame)
+    table = concat_chunks(frames)
+    for name in TABLE_COLUMNS:
+        if name not in table:
+            table[name] = pd.Series(dtype='category') if name != 'xg' else np.float32(np.nan)
+    table = table[list(TABLE_COLUMNS)]
+    # Jornada como entero pequeño (-1 si falta) y xG en float32
+    return table.assign(
+        matchday=table['matchday'].fillna(-1).astype(np.int16),
+        xg=table['xg'].astype(np.float32),
+    )
+
+
+def _flags(table):
+    """Columnas auxiliares: parada, gol encajado y xG de cada acción"""
+    import numpy as np
+    from match_frame import category_codes
+
+    saved = ((category_codes(table['cat'], SAVE_CATEGORIES) >= 0)
+             & (category_codes(table['res'], SAVE_RESULTS) >= 0))
+    conceded = category_codes(table['res'], CONCEDED_RESULTS) >= 0
+    xg = np.nan_to_num(table['xg'].to_numpy(dtype=np.float64, na_value=np.nan))
+    return table.assign(saves=saved, conceded=conceded, xg_faced=xg,
+                        xg_conceded=np.where(conceded, xg, 0.0))
+
+
+def goalkeeper_summary(table, by=('season', 'player')):
+    """Resumen por grupo (por defecto temporada y portero): paradas, % de paradas y xG
+
+    goals_prevented = xG recibido - goles encajados (positivo: el portero evitó goles).
+    """
+    import numpy as np
+    import pandas as pd
+
+    by = [by] if isinstance(by, str) else list(by)
+    if table.empty:
+        return pd.DataFrame(columns=list(SUMMARY_FIELDS))
+    grouped = _flags(table).groupby(by, observed=True, sort=True)
+    summary = grouped.agg(
+        matchdays=('matchday', 'nunique'),
+        actions=('matchday', 'size'),
+        saves=('saves', 'sum'),
+        conceded=('conceded', 'sum'),
+        xg_faced=('xg_faced', 'sum'),
+        xg_conceded=('xg_conceded', 'sum'),
+    )
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shots = summary['saves'] + summary['conceded']
+        summary['save_rate'] = summary['saves'] / shots.where(shots > 0)
+    summary['goals_prevented'] = summary['xg_faced'] - summary['conceded']
+    for field in COUNT_FIELDS:
+        summary[field] = summary[field].astype('int64')
+    return summary[list(SUMMARY_FIELDS)]
+
+
+def matchday_summary(table):
+    """Resumen por temporada, portero y jornada (evolución a lo largo de la temporada)"""
+    summary = goalkeeper_summary(table, ('season', 'player', 'matchday'))
+    return summary.drop(columns='matchdays')
+
+
+def action_mix(table, index='zone', columns='type', by=('player',)):
+    """Nº de acciones por (by..., index) x columns: tabla dinámica con ceros donde no hay"""
+    import pandas as pd
+
+    by = [by] if isinstance(by, str) else list(by or ())
+    if table.empty:
+        return pd.DataFrame()
+    return table.pivot_table(index=by + [index], columns=columns, values='matchday',
+                             aggfunc='size', fill_value=0, observed=True).astype('int64')
+
+
+def summary_records(summary, digits=3):
+    """Tabla -> {etiqueta: {campo: valor}} (etiquetas de varias columnas con '|'; NaN -> None)"""
+    import math
+
+    records = {}
+    for label, row in zip(summary.index, summary.to_numpy(dtype=float).tolist()):
+        key = '|'.join(str(part) for part in label) if isinstance(label, tuple) else str(label)
+        records[key] = {
+            field: None if math.isnan(value)
+            else int(value) if field in COUNT_FIELDS else round(value, digits)
+            for field, value in zip(summary.columns, row)}
+    return records
+
+
+def mix_records(mix):
+    """Tabla dinámica -> {etiqueta de fila: {columna: nº}} sin las celdas vacías"""
+    records = {}
+    for label, row in zip(mix.index, mix.to_numpy().tolist()):
+        key = '|'.join(str(part) for part in label) if isinstance(label, tuple) else str(label)
+        records[key] = {str(column): int(n) for column, n in zip(mix.columns, row) if n}
+    return records
+
+
+def goalkeeper_report(table):
+    """JSON del informe: resumen por temporada y portero, por jornada y mezcla por zona"""
+    return {
+        'rows': int(len(table)),
+        'seasons': sorted(str(s) for s in table['season'].unique()) if len(table) else [],
+        'summary': summary_records(goalkeeper_summary(table)),
+        'career': summary_records(goalkeeper_summary(table, 'player')),
+        'matchdays': summary_records(matchday_summary(table)),
+        'zones': mix_records(action_mix(table, 'zone', 'cat', ('season', 'player'))),
+        'actions': mix_records(action_mix(table, 'type', 'res', ('season', 'player'))),
+    }
+
+
+def write_report_json(path, report):
+    """Escritura atómica del JSON del informe"""
+    fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path) or '.')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
@@ -0,0 +1,156 @@
+"""
+Archivo en disco de rejillas de conteo y densidad por partido
+Cada partido se guarda como dos .npy (conteos uint16 y densidades float32, con
+forma (filas, bins, bins)) más un índice JSON con la fila de cada
+(equipo, jugador, parte). Se abren con np.load(mmap_mode='r'): leer la rejilla
+de un jugador no carga el partido entero ni vuelve a parsear el JSON.
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+ARCHIVE_VERSION = 1
+
+COUNTS_SUFFIX = '.counts.npy'
+DENSITY_SUFFIX = '.density.npy'
+INDEX_SUFFIX = '.index.json'
+
+# Jugador / parte de las filas agregadas (todo el equipo, todo el partido)
+ALL = None
+
+
+def _atomic_save(path, array):
+    fd, tmp = tempfile.mkstemp(prefix='.tmp-', suffix='.npy', dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _grid_rows(team_df, side, team_name):
+    """Filas (metadatos, conteos, densidades) de un equipo: total y jugadores, partido y cada parte"""
+    from heatmap_density import player_density_grids
+
+    subsets = [(ALL, team_df)]
+    if 'period' in team_df:
+        periods = team_df['period'].astype(str)
+        for period in sorted(set(team_df['period'].dropna().astype(str))):
+            subsets.append((period, team_df[periods == period]))
+
+    for period, subset in subsets:
+        grids = player_density_grids(subset)
+        for i, player in enumerate([ALL] + [str(p) for p in grids.labels]):
+            yield {
+                'side': side,
+                'team': team_name,
+                'player': player,
+                'period': period,
+                'actions': int(grids.moments[i, 0]),
+                'moments': [float(v) for v in grids.moments[i]],
+            }, grids.counts[i], grids.density[i]
+
+
+def write_match_archive(prefix, frame, teams):
+    """Escribe el archivo de un partido; prefix = ruta sin sufijo, teams = {lado: nombre}
+
+    El índice se escribe el último: un archivo sin índice no existe para los lectores.
+    """
+    from match_frame import select_team
+
+    rows, counts, densities = [], [], []
+    for side, team_name in teams.items():
+        team_df = select_team(frame, side, flip_y=True)
+        if team_df.empty:
+            continue
+        for meta, count_grid, density_grid in _grid_rows(team_df, side, team_name):
+            meta['row'] = len(rows)
+            rows.append(meta)
+            counts.append(count_grid)
+            densities.append(density_grid)
+
+    if rows:
+        counts = np.clip(np.array(counts), 0, np.iinfo(np.uint16).max).astype(np.uint16)
+        densities = np.array(densities, dtype=np.float32)
+    else:
+        counts = np.zeros((0, 0, 0), dtype=np.uint16)
+        densities = np.zeros((0, 0, 0), dtype=np.float32)
+
+    os.makedirs(os.path.dirname(prefix) or '.', exist_ok=True)
+    _atomic_save(prefix + COUNTS_SUFFIX, counts)
+    _atomic_save(prefix + DENSITY_SUFFIX, densities)
+
+    index = {
+        'version': ARCHIVE_VERSION,
+        'bins': int(counts.shape[-1]) if rows else 0,
+        'counts_file': os.path.basename(prefix + COUNTS_SUFFIX),
+        'density_file': os.path.basename(prefix + DENSITY_SUFFIX),
+        'rows': rows,
+    }
+    fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(prefix) or '.')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, prefix + INDEX_SUFFIX)
+    return index
+
+
+class MatchArchive:
+    """Lector de un partido archivado; las rejillas son vistas de solo lectura sobre el disco"""
+
+    def __init__(self, prefix):
+        with open(prefix + INDEX_SUFFIX, 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        if self.index.get('version') != ARCHIVE_VERSION:
+            raise ValueError(f"Versión de archivo no soportada: {prefix}")
+        directory = os.path.dirname(prefix)
+        self._counts_path = os.path.join(directory, self.index['counts_file'])
+        self._density_path = os.path.join(directory, self.index['density_file'])
+        self._counts = None
+        self._density = None
+        self._rows = {(r['side'], r['player'], r['period']): r for r in self.index['rows']}
+        self._sides = {}
+        for r in self.index['rows']:
+            self._sides.setdefault(r['team'], r['side'])
+
+    @property
+    def rows(self):
+        return self.index['rows']
+
+    def row(self, team, player=ALL, period=ALL):
+        """Metadatos de la fila (equipo por lado 'HOME'/'AWAY' o por nombre); None si no existe"""
+        side = self._sides.get(team, team)
+        return self._rows.get((side, player, period))
+
+    def _row_index(self, team, player, period):
+        row = self.row(team, player, period)
+        if row is None:
+            raise KeyError((team, player, period))
+        return row['row']
+
+    def counts(self, team, player=ALL, period=ALL):
+        """Rejilla de conteos [fila_y, col_x] (memmap)"""
+        if self._counts is None:
+            self._counts = np.load(self._counts_path, mmap_mode='r')
+        return self._counts[self._row_index(team, player, period)]
+
+    def density(self, team, player=ALL, period=ALL):
+        """Densidad suavizada (masa 1) [fila_y, col_x] (memmap)"""
+        if self._density is None:
+            self._density = np.load(self._density_path, mmap_mode='r')
+        return self._density[self._row_index(team, player, period)]
+
+    def moments(self, team, player=ALL, period=ALL):
+        """Momentos (n, Σx, Σy, Σx², Σy²) de la fila"""
+        row = self.row(team, player, period)
+        return np.array(row['moments']) if row is not None else np.zeros(5)
+
+    def players(self, team, period=ALL):
+        """Jugadores del equipo con fila en el archivo (en el orden de la rejilla)"""
+        side = self._sides.get(team, team)
+        return [r['player'] for r in self.rows
+                if r['side'] == side and r['period'] == period and r['player'] is not None]
+
+    def periods(self):
+        """Partes con filas propias en el archivo"""
+        return sorted({r['period'] for r in self.rows if r['period'] is not None})
@@ -0,0 +1,204 @@
+"""
+Caché en disco de mapas de calor renderizados
+Direccionada por contenido (hash de las acciones normalizadas + equipo, estilo y DPI),
+con límite de tamaño, expulsión LRU y escrituras atómicas entre procesos.
+Solo usa la librería estándar: un acierto no importa numpy ni matplotlib.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+CACHE_VERSION = 3
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'attack-metrics-heatmap-cache')
+DEFAULT_MAX_MB = 512
+
+META_FILE = 'meta.json'
+
+# Directorios temporales abandonados (proceso caído) se limpian pasado este tiempo
+STALE_TMP_SECONDS = 3600
+
+
+def cache_enabled():
+    """La caché se desactiva con HEATMAP_CACHE=0"""
+    return os.environ.get('HEATMAP_CACHE', '1') != '0'
+
+
+def cache_dir():
+    """Directorio raíz de la caché (HEATMAP_CACHE_DIR)"""
+    return os.environ.get('HEATMAP_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+
+def max_cache_bytes():
+    """Tamaño máximo de la caché en bytes (HEATMAP_CACHE_MAX_MB)"""
+    return int(float(os.environ.get('HEATMAP_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+
+
+def cache_key(actions, team, style, dpi):
+    """Hash SHA-256 de las acciones normalizadas y los parámetros de render
+
+    Entran también las acciones del rival: cortan las posesiones de las métricas,
+    y la versión del modelo de xG que rellena el xG que falta.
+    """
+    from xg_model import load_model
+
+    payload = {
+        'version': CACHE_VERSION,
+        'xg_model': load_model()['version'],
+        'team': team,
+        'style': style,
+        'dpi': dpi,
+        # Claves ordenadas y sin 'id': el mismo contenido da la misma clave
+        'actions': [{k: v for k, v in a.items() if k != 'id'} for a in actions],
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _entry_path(key, root=None):
+    root = root or cache_dir()
+    return os.path.join(root, key[:2], key)
+
+
+def lookup(key, root=None):
+    """Metadatos de una entrada completa (y marca de acceso LRU) o None si no está"""
+    meta_path = os.path.join(_entry_path(key, root), META_FILE)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # Marca de acceso para la expulsión LRU
+    try:
+        os.utime(meta_path)
+    except OSError:
+        pass
+    return meta
+
+
+def load_records(key, meta, root=None):
+    """Registros de una entrada (mismo formato que el modo streaming) o None si ya no está
+
+    Se leen todos los ficheros antes de devolver nada: si otro proceso expulsa la
+    entrada entre lookup() y la lectura, es un fallo de caché y no un error a
+    mitad de la respuesta.
+    """
+    entry = _entry_path(key, root)
+    records = []
+    try:
+        if meta.get('team_file'):
+            with open(os.path.join(entry, meta['team_file']), 'rb') as f:
+                image = base64.b64encode(f.read()).decode()
+            records.append({'type': 'team_heatmap', 'image': image})
+        for player, file_name in meta['player_files']:
+            with open(os.path.join(entry, file_name), 'rb') as f:
+                image = base64.b64encode(f.read()).decode()
+            records.append({'type': 'player', 'player': player, 'image': image,
+                            'stats': meta['player_stats'].get(player)})
+    except OSError:
+        return None
+    if meta.get('metrics') is not None:
+        records.append({'type': 'metrics', **meta['metrics']})
+    return records
+
+
+class CacheWriter:
+    """Escribe una entrada registro a registro en un directorio temporal y la publica con commit()"""
+
+    def __init__(self, key, root=None):
+        self.root = root or cache_dir()
+        self.entry = _entry_path(key, self.root)
+        os.makedirs(os.path.dirname(self.entry), exist_ok=True)
+        # Mismo sistema de ficheros que la entrada final: el rename es atómico
+        self.tmp = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(self.entry))
+        self.meta = {'player_stats': {}, 'team_file': None, 'player_files': [], 'metrics': None}
+
+    def add(self, record):
+        """Guarda la imagen (y estadísticas) de un registro; las métricas van en meta.json"""
+        if record['type'] == 'team_heatmap':
+            file_name = 'team.png'
+            self.meta['team_file'] = file_name
+        elif record['type'] == 'player':
+            file_name = f"player_{len(self.meta['player_files']):03d}.png"
+            self.meta['player_files'].append([record['player'], file_name])
+            self.meta['player_stats'][record['player']] = record['stats']
+        elif record['type'] == 'metrics':
+            self.meta['metrics'] = {k: v for k, v in record.items() if k != 'type'}
+            return
+        else:
+            return
+        with open(os.path.join(self.tmp, file_name), 'wb') as f:
+            f.write(base64.b64decode(record['image']))
+
+    def commit(self):
+        """Publica la entrada de forma atómica y aplica el límite de tamaño"""
+        try:
+            # meta.json se escribe el último: una entrada sin él no es válida
+            with open(os.path.join(self.tmp, META_FILE), 'w', encoding='utf-8') as f:
+                json.dump(self.meta, f, ensure_ascii=False)
+            os.rename(self.tmp, self.entry)
+        except OSError:
+            # Otro proceso guardó la misma entrada antes: la suya es equivalente
+            self.abort()
+            return
+        evict(self.root)
+
+    def abort(self):
+        """Descarta la entrada a medio escribir"""
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+def _entries(root):
+    """(último acceso, tamaño, ruta) de cada entrada completa de la caché"""
+    entries = []
+    for shard in os.scandir(root):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            if entry.name.startswith('.tmp-'):
+                _remove_if_stale(entry)
+                continue
+            if not entry.is_dir():
+                continue
+            try:
+                accessed = os.stat(os.path.join(entry.path, META_FILE)).st_mtime
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+            except OSError:
+                continue
+            entries.append((accessed, size, entry.path))
+    return entries
+
+
+def _remove_if_stale(entry):
+    try:
+        if time.time() - entry.stat().st_mtime > STALE_TMP_SECONDS:
+            shutil.rmtree(entry.path, ignore_errors=True)
+    except OSError:
+        pass
+
+
+def evict(root=None, max_bytes=None):
+    """Elimina las entradas menos usadas recientemente hasta respetar el límite"""
+    root = root or cache_dir()
+    max_bytes = max_cache_bytes() if max_bytes is None else max_bytes
+    if not os.path.isdir(root):
+        return
+
+    entries = sorted(_entries(root))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        # Renombrar antes de borrar: los lectores ven la entrada entera o ninguna
+        doomed = os.path.join(os.path.dirname(path), f'.tmp-evict-{os.getpid()}-{time.time_ns()}')
+        try:
+            os.rename(path, doomed)
+        except OSError:
+            continue
+        shutil.rmtree(doomed, ignore_errors=True)
+        total -= size
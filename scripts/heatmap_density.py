@@ -0,0 +1,265 @@
+"""
+Motor de densidad por rejilla para los mapas de calor
+Agrupa todas las acciones en una rejilla fija del campo una sola vez y la
+suaviza con un núcleo gaussiano separable, para el equipo y cada jugador
+"""
+
+import numpy as np
+
+# Rejilla fija del campo (coordenadas normalizadas 0-100)
+GRID_SIZE = 100
+PITCH_EXTENT = (0.0, 100.0)
+
+# Ancho de banda mínimo en celdas (evita núcleos degenerados con 1-2 acciones)
+MIN_SIGMA = 1.0
+
+
+def grid_edges(bins=GRID_SIZE):
+    """Bordes de las celdas de la rejilla sobre un eje"""
+    return np.linspace(PITCH_EXTENT[0], PITCH_EXTENT[1], bins + 1)
+
+
+def grid_centers(bins=GRID_SIZE):
+    """Centros de las celdas de la rejilla sobre un eje"""
+    edges = grid_edges(bins)
+    return (edges[:-1] + edges[1:]) / 2
+
+
+def cell_indices(x, y, bins=GRID_SIZE):
+    """Índices de columna (x) y fila (y) de cada acción; -1 si no tiene coordenadas"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lo, hi = PITCH_EXTENT
+    scale = bins / (hi - lo)
+    valid = np.isfinite(x) & np.isfinite(y)
+    ix = np.clip(np.floor((np.where(valid, x, lo) - lo) * scale), 0, bins - 1).astype(np.intp)
+    iy = np.clip(np.floor((np.where(valid, y, lo) - lo) * scale), 0, bins - 1).astype(np.intp)
+    ix[~valid] = -1
+    iy[~valid] = -1
+    return ix, iy
+
+
+def bin_actions(x, y, codes, n_groups, bins=GRID_SIZE):
+    """Cuenta acciones por celda y grupo; devuelve (n_groups, bins, bins) indexado [g, fila_y, col_x]"""
+    ix, iy = cell_indices(x, y, bins)
+    codes = np.asarray(codes, dtype=np.intp)
+    valid = (ix >= 0) & (codes >= 0)
+    flat = (codes[valid] * bins + iy[valid]) * bins + ix[valid]
+    counts = np.bincount(flat, minlength=n_groups * bins * bins)
+    return counts.reshape(n_groups, bins, bins).astype(np.float64)
+
+
+def group_moments(x, y, codes, n_groups):
+    """Momentos por grupo: columnas (n, Σx, Σy, Σx², Σy²)"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.intp)
+    valid = np.isfinite(x) & np.isfinite(y) & (codes >= 0)
+    x, y, codes = x[valid], y[valid], codes[valid]
+    moments = np.empty((n_groups, 5))
+    moments[:, 0] = np.bincount(codes, minlength=n_groups)
+    moments[:, 1] = np.bincount(codes, weights=x, minlength=n_groups)
+    moments[:, 2] = np.bincount(codes, weights=y, minlength=n_groups)
+    moments[:, 3] = np.bincount(codes, weights=x * x, minlength=n_groups)
+    moments[:, 4] = np.bincount(codes, weights=y * y, minlength=n_groups)
+    return moments
+
+
+def moment_means(moments):
+    """Posición media (avg_x, avg_y) de cada grupo a partir de sus momentos"""
+    n = moments[:, 0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return moments[:, 1] / n, moments[:, 2] / n
+
+
+def scott_bandwidth(moments, bins=GRID_SIZE):
+    """Ancho de banda de Scott (igual que gaussian_kde) en celdas, por grupo y eje"""
+    n = moments[:, 0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x, mean_y = moment_means(moments)
+        # Varianza muestral (ddof=1), como la covarianza de gaussian_kde
+        var_x = (moments[:, 3] - n * mean_x ** 2) / (n - 1)
+        var_y = (moments[:, 4] - n * mean_y ** 2) / (n - 1)
+        factor = n ** (-1.0 / 6.0)  # factor de Scott en 2 dimensiones
+    cells_per_unit = bins / (PITCH_EXTENT[1] - PITCH_EXTENT[0])
+    sigma_x = np.sqrt(np.clip(np.nan_to_num(var_x), 0, None)) * factor * cells_per_unit
+    sigma_y = np.sqrt(np.clip(np.nan_to_num(var_y), 0, None)) * factor * cells_per_unit
+    sigma_x = np.maximum(np.nan_to_num(sigma_x), MIN_SIGMA)
+    sigma_y = np.maximum(np.nan_to_num(sigma_y), MIN_SIGMA)
+    return sigma_x, sigma_y
+
+
+def gaussian_kernels(sigmas, bins=GRID_SIZE):
+    """Matrices de convolución gaussiana (G, bins, bins), una por ancho de banda"""
+    sigmas = np.asarray(sigmas, dtype=np.float64).reshape(-1, 1, 1)
+    offsets = np.arange(bins)
+    diff = offsets[None, :, None] - offsets[None, None, :]
+    kernels = np.exp(-0.5 * (diff / sigmas) ** 2)
+    return kernels / (np.sqrt(2 * np.pi) * sigmas)
+
+
+def smooth_counts(counts, sigma_x, sigma_y):
+    """Suaviza cada rejilla de conteos con su núcleo separable y normaliza a masa 1"""
+    counts = np.asarray(counts, dtype=np.float64)
+    single = counts.ndim == 2
+    if single:
+        counts = counts[None]
+    bins = counts.shape[-1]
+    ky = gaussian_kernels(sigma_y, bins)
+    kx = gaussian_kernels(sigma_x, bins)
+    # K_y · C · K_xᵀ convoluciona filas y columnas en todas las rejillas a la vez
+    density = np.matmul(np.matmul(ky, counts), kx.transpose(0, 2, 1))
+    total = density.sum(axis=(1, 2), keepdims=True)
+    density = np.divide(density, total, out=np.zeros_like(density), where=total > 0)
+    return density[0] if single else density
+
+
+class DensityGrids:
+    """Rejillas de conteo, momentos y densidad del total (índice 0) y cada grupo (g + 1)"""
+
+    def __init__(self, counts, moments, labels, bins=GRID_SIZE):
+        self.counts = counts
+        self.moments = moments
+        self.labels = list(labels)
+        self.bins = bins
+        self._density = None
+
+    @property
+    def density(self):
+        """Densidades suavizadas; se calculan todas juntas la primera vez"""
+        if self._density is None:
+            sigma_x, sigma_y = scott_bandwidth(self.moments, self.bins)
+            self._density = smooth_counts(self.counts, sigma_x, sigma_y)
+        return self._density
+
+    @property
+    def total(self):
+        """Densidad del conjunto completo"""
+        return self.density[0]
+
+    def index(self, label):
+        """Posición en las rejillas del grupo indicado"""
+        return self.labels.index(label) + 1
+
+    def group(self, label):
+        """Densidad de un grupo (p. ej. un jugador)"""
+        return self.density[self.index(label)]
+
+    def count(self, label=None):
+        """Número de acciones con coordenadas del total o de un grupo"""
+        idx = 0 if label is None else self.index(label)
+        return int(self.moments[idx, 0])
+
+
+def compute_density_grids(x, y, codes, labels, bins=GRID_SIZE):
+    """Calcula en una pasada las rejillas del total y de cada grupo (codes indexa labels)"""
+    codes = np.asarray(codes, dtype=np.intp)
+    n_groups = len(labels)
+    # El total se trata como un grupo más: código 0, grupos desplazados a g + 1
+    all_codes = np.concatenate([np.zeros(len(codes), dtype=np.intp),
+                                np.where(codes >= 0, codes + 1, -1)])
+    all_x = np.concatenate([np.asarray(x, dtype=np.float64)] * 2)
+    all_y = np.concatenate([np.asarray(y, dtype=np.float64)] * 2)
+    counts = bin_actions(all_x, all_y, all_codes, n_groups + 1, bins)
+    moments = group_moments(all_x, all_y, all_codes, n_groups + 1)
+    return DensityGrids(counts, moments, labels, bins)
+
+
+def single_density(x, y, bins=GRID_SIZE):
+    """Densidad de un único conjunto de acciones"""
+    codes = np.full(len(x), -1, dtype=np.intp)
+    return compute_density_grids(x, y, codes, [], bins).total
+
+
+def player_density_grids(df, bins=GRID_SIZE):
+    """Rejillas del equipo y de cada jugador de un DataFrame, jugadores por nº de acciones"""
+    from match_frame import category_codes
+
+    counts = df['player'].value_counts()
+    # Con columnas categóricas value_counts incluye categorías sin acciones
+    players = counts[counts > 0].index.tolist()
+    codes = category_codes(df['player'], players)
+    return compute_density_grids(df['x'].to_numpy(), df['y'].to_numpy(), codes, players, bins)
+
+
+def iso_levels(density, levels=10, thresh=0.05):
+    """Niveles de iso-proporción como seaborn: cada nivel encierra una fracción de la masa"""
+    props = np.linspace(thresh, 1, levels)
+    values = np.ravel(density)
+    total = values.sum()
+    if total <= 0:
+        return np.array([])
+    sorted_values = np.sort(values)[::-1]
+    normalized = np.cumsum(sorted_values) / total
+    idx = np.searchsorted(normalized, 1 - props)
+    return np.unique(np.take(sorted_values, idx, mode='clip'))
+
+
+def resample_grid(density, width, height):
+    """Interpola bilinealmente la rejilla a width x height píxeles (extremos en los centros)"""
+    def axis_weights(n_cells, n_pixels):
+        position = np.linspace(0, n_cells - 1, n_pixels)
+        low = np.minimum(position.astype(np.intp), n_cells - 2)
+        return low, position - low
+
+    rows, row_frac = axis_weights(density.shape[0], height)
+    cols, col_frac = axis_weights(density.shape[1], width)
+    by_row = density[rows] * (1 - row_frac)[:, None] + density[rows + 1] * row_frac[:, None]
+    return by_row[:, cols] * (1 - col_frac) + by_row[:, cols + 1] * col_frac
+
+
+def raster_density(ax, density, level_values, dpi, cmap='Reds', alpha=0.6, zorder=None):
+    """Dibuja los niveles rellenos como una imagen a dpi (mismos colores que contourf)
+
+    Cada píxel toma el color de su franja de nivel; en PDF la imagen se incrusta a
+    su resolución nativa, sin rasterizar la figura entera.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import Normalize
+    from matplotlib.image import AxesImage
+
+    centers = grid_centers(density.shape[-1])
+    extent = (centers[0], centers[-1], centers[0], centers[-1])
+    # Tamaño en píxeles de la zona de la rejilla dentro del eje
+    fig = ax.get_figure()
+    box = ax.get_window_extent()
+    (x0, x1), (y0, y1) = ax.get_xlim(), ax.get_ylim()
+    span = centers[-1] - centers[0]
+    width = max(2, int(round(box.width / fig.dpi * dpi * span / abs(x1 - x0))))
+    height = max(2, int(round(box.height / fig.dpi * dpi * span / abs(y1 - y0))))
+
+    values = resample_grid(density, width, height)
+    # Franja i = [level_i, level_i+1] -> color i + 1; por debajo del primer nivel, 0 (transparente)
+    band = np.searchsorted(level_values, values, side='right')
+    np.minimum(band, len(level_values) - 1, out=band)
+    middles = (level_values[:-1] + level_values[1:]) / 2
+    palette = np.zeros((len(level_values), 4), dtype=np.uint8)
+    palette[1:] = plt.get_cmap(cmap)(Normalize()(middles), bytes=True)
+    palette[1:, 3] = round(alpha * 255)
+
+    # 'none': en PDF la imagen se escribe tal cual, sin remuestrear a la figura
+    image = AxesImage(ax, interpolation='none', origin='lower', extent=extent)
+    image.set_data(palette[band])
+    # Sin zorder, el de contourf (las imágenes van por defecto debajo de todo)
+    image.set_zorder(1 if zorder is None else zorder)
+    ax.add_image(image)
+    return image
+
+
+def plot_density(ax, density, cmap='Reds', alpha=0.6, levels=10, thresh=0.05,
+                 fill=True, raster_dpi=None, **kwargs):
+    """Dibuja una densidad precalculada como contornos; devuelve False si es degenerada
+
+    Con raster_dpi los niveles rellenos se dibujan como imagen (salida PDF ligera).
+    """
+    level_values = iso_levels(density, levels, thresh)
+    if len(level_values) < 2:
+        return False
+    if fill and raster_dpi:
+        raster_density(ax, density, level_values, raster_dpi, cmap=cmap, alpha=alpha,
+                       zorder=kwargs.get('zorder'))
+        return True
+    centers = grid_centers(density.shape[-1])
+    contour = ax.contourf if fill else ax.contour
+    contour(centers, centers, density, levels=level_values, cmap=cmap, alpha=alpha, **kwargs)
+    return True
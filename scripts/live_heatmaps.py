@@ -0,0 +1,234 @@
+"""
+Mapas de calor en directo, actualizados de forma incremental
+Mientras se etiqueta un partido, cada acción nueva suma una celda a la rejilla
+de su jugador y a la del equipo y actualiza sus momentos (n, Σx, Σy, Σx², Σy²).
+Al refrescar solo se suavizan y codifican de nuevo los jugadores modificados;
+el resto reutiliza su imagen anterior.
+"""
+
+import json
+import math
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from heatmap_density import GRID_SIZE, PITCH_EXTENT, scott_bandwidth, smooth_counts
+
+# Sesiones en memoria por worker (las menos usadas se descartan)
+MAX_LIVE_SESSIONS = 8
+
+_sessions = OrderedDict()
+
+
+class GridState:
+    """Rejilla de conteos, momentos y puntos de un jugador (o del equipo)"""
+
+    def __init__(self, bins=GRID_SIZE):
+        self.counts = np.zeros((bins, bins))
+        self.moments = np.zeros(5)
+        # Todas las acciones, con o sin coordenadas (estadística 'actions')
+        self.actions = 0
+        # Puntos con coordenadas, para el scatter de detalle
+        self.points = {}
+        # (n_x, Σx, n_y, Σy) por eje: la media de x no exige que y exista
+        self.axis_sums = np.zeros(4)
+
+    def add(self, key, cell, x, y, sign=1):
+        self.actions += sign
+        if math.isfinite(x):
+            self.axis_sums[0:2] += sign * np.array([1.0, x])
+        if math.isfinite(y):
+            self.axis_sums[2:4] += sign * np.array([1.0, y])
+        if cell is None:
+            return
+        self.counts[cell] += sign
+        self.moments += sign * np.array([1.0, x, y, x * x, y * y])
+        if sign > 0:
+            self.points[key] = (x, y)
+        else:
+            self.points.pop(key, None)
+
+    def stats(self):
+        n_x, sum_x, n_y, sum_y = self.axis_sums
+        return {
+            'actions': self.actions,
+            'avg_x': round(float(sum_x / n_x), 3) if n_x else None,
+            'avg_y': round(float(sum_y / n_y), 3) if n_y else None,
+        }
+
+
+def _coordinate(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _same_entry(a, b):
+    """Misma acción: jugador, celda y coordenadas (NaN == NaN)"""
+    return a[:2] == b[:2] and all(u == v or (u != u and v != v) for u, v in zip(a[2:], b[2:]))
+
+
+class LiveSession:
+    """Estado acumulado de un equipo durante un partido en curso"""
+
+    def __init__(self, team='HOME', bins=GRID_SIZE):
+        self.team = team
+        self.bins = bins
+        self.team_grid = GridState(bins)
+        self.players = {}
+        # id de acción -> (jugador, celda, x, y) ya contabilizada
+        self.seen = {}
+        self.dirty = set()
+        self.team_dirty = False
+        self.images = {}
+        self.team_image = None
+        self._auto_key = 0
+
+    def _cell(self, x, y):
+        lo, hi = PITCH_EXTENT
+        scale = self.bins / (hi - lo)
+        ix = min(max(int(math.floor((x - lo) * scale)), 0), self.bins - 1)
+        iy = min(max(int(math.floor((y - lo) * scale)), 0), self.bins - 1)
+        return iy, ix
+
+    def _entry(self, action):
+        """(jugador, celda, x, y) de una acción con el eje Y invertido"""
+        x, y = action.get('x'), action.get('y')
+        x, y = _coordinate(x), 100.0 - _coordinate(y)
+        cell = self._cell(x, y) if math.isfinite(x) and math.isfinite(y) else None
+        return action.get('player'), cell, x, y
+
+    def _apply(self, key, entry, sign):
+        player, cell, x, y = entry
+        grid = self.players.get(player)
+        if grid is None:
+            grid = self.players[player] = GridState(self.bins)
+        grid.add(key, cell, x, y, sign)
+        self.team_grid.add(key, cell, x, y, sign)
+        self.dirty.add(player)
+        self.team_dirty = True
+
+    def append(self, actions):
+        """Añade acciones nuevas (las ya vistas con los mismos datos se ignoran)"""
+        for action in actions:
+            if action.get('team') != self.team:
+                continue
+            key = action.get('id')
+            if key is None:
+                self._auto_key += 1
+                key = ('auto', self._auto_key)
+            entry = self._entry(action)
+            previous = self.seen.get(key)
+            if previous is not None:
+                if _same_entry(previous, entry):
+                    continue
+                # Acción editada: se resta la versión anterior
+                self._apply(key, previous, -1)
+            self.seen[key] = entry
+            self._apply(key, entry, +1)
+
+    def sync(self, actions):
+        """Iguala el estado a la lista completa de acciones (altas, ediciones y bajas por id)"""
+        current = {action.get('id') for action in actions if action.get('team') == self.team}
+        for key in [k for k in self.seen if k not in current]:
+            self._apply(key, self.seen.pop(key), -1)
+        self.append(actions)
+
+    def ordered_players(self):
+        """Jugadores con acciones, de más a menos y empates por nombre (como value_counts)"""
+        players = [p for p, grid in self.players.items() if grid.actions > 0]
+        return sorted(players, key=lambda p: (-self.players[p].actions, str(p)))
+
+    def render(self):
+        """Suaviza y codifica solo lo modificado; devuelve el JSON de generate_heatmaps"""
+        from generate_heatmap import render_player_image, render_team_image
+
+        started = time.perf_counter()
+        if self.team_dirty:
+            self.team_image = None
+            if self.team_grid.moments[0] > 0:
+                self.team_image = render_team_image(self.team, self._smooth([self.team_grid])[0])
+            self.team_dirty = False
+
+        updated = [p for p in self.ordered_players() if p in self.dirty]
+        for player in self.dirty:
+            self.images.pop(player, None)
+        densities = self._smooth([self.players[p] for p in updated])
+        for player, density in zip(updated, densities):
+            grid = self.players[player]
+            points = np.array(list(grid.points.values()), dtype=np.float64).reshape(-1, 2)
+            try:
+                self.images[player], _ = render_player_image(
+                    player, points[:, 0], points[:, 1], density, grid.actions)
+            except Exception as e:
+                print(f"Error en jugador {player}: {e}", file=sys.stderr)
+        self.dirty.clear()
+
+        players = [p for p in self.ordered_players() if p in self.images]
+        return {
+            'team_heatmap': self.team_image,
+            'player_heatmaps': {p: self.images[p] for p in players},
+            'player_stats': {p: self.players[p].stats() for p in players},
+            'render_plan': {
+                'cached': False,
+                'degraded': False,
+                'live': True,
+                'updated': updated,
+                'elapsed_s': round(time.perf_counter() - started, 3),
+                'artifacts': [],
+            },
+        }
+
+    def _smooth(self, grids):
+        if not grids:
+            return []
+        moments = np.array([grid.moments for grid in grids])
+        sigma_x, sigma_y = scott_bandwidth(moments, self.bins)
+        return smooth_counts(np.array([grid.counts for grid in grids]), sigma_x, sigma_y)
+
+
+def live_session(key, team='HOME'):
+    """Sesión en memoria de un partido y equipo y si se acaba de crear"""
+    session_key = (key, team)
+    session = _sessions.pop(session_key, None)
+    created = session is None
+    if created:
+        session = LiveSession(team)
+    _sessions[session_key] = session
+    while len(_sessions) > MAX_LIVE_SESSIONS:
+        _sessions.popitem(last=False)
+    return session, created
+
+
+def live_update(request):
+    """Petición del worker en modo directo
+
+    Con 'actions' se añaden solo esas acciones nuevas; con 'jsonFile' se
+    sincroniza con la lista completa del fichero. 'session' identifica el
+    partido (por defecto, el propio jsonFile). Si la sesión se perdió (worker
+    reciclado, caída o expulsión) y solo llegan acciones nuevas, no se puede
+    reconstruir: se responde {'resync_required': True} para que el cliente
+    vuelva a enviar el jsonFile.
+    """
+    team = request.get('team', 'HOME')
+    key = request.get('session') or request.get('jsonFile')
+    if not key:
+        raise ValueError("El modo directo necesita 'session' o 'jsonFile'")
+    session, created = live_session(key, team)
+
+    if created and not request.get('jsonFile'):
+        # Sin el fichero la sesión nueva solo tendría el último lote
+        _sessions.pop((key, team), None)
+        return {'resync_required': True, 'session': key,
+                'error': "Sesión en directo perdida: reenvía la petición con jsonFile"}
+
+    # Una sesión nueva (worker reciclado) parte del fichero completo si lo hay
+    if request.get('actions') is not None and not (created and request.get('jsonFile')):
+        session.append(request['actions'])
+    else:
+        with open(request['jsonFile'], 'r') as f:
+            session.sync(json.load(f)['actions'])
+    return session.render()
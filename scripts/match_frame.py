@@ -0,0 +1,204 @@
+"""
+Carga tipada y columnar de las acciones del JSON de Attack Metrics
+En lugar de pd.DataFrame(lista de dicts), que deja columnas object, construye
+cada columna con su tipo: coordenadas en float32 con NaN, textos como
+categorías (códigos enteros) y 'min' ('MM:SS') convertido a segundos enteros.
+"""
+
+import json
+
+import numpy as np
+
+# Coordenadas y métricas numéricas (None / ausentes -> NaN)
+COORD_COLUMNS = ('x', 'y', 'endX', 'endY')
+METRIC_COLUMNS = ('xg', 'xt', 'xbuild', 'xgot')
+
+# Columnas de texto con pocos valores distintos
+CATEGORY_COLUMNS = ('team', 'player', 'type', 'res', 'period', 'phase', 'lane', 'zone',
+                    'shotDetail', 'body', 'height')
+
+# 'min' se sustituye por 'seconds' (int32); -1 si falta o no se puede leer
+MISSING_SECONDS = -1
+
+
+def parse_clock(value):
+    """Segundos de un tiempo 'MM:SS' (o 'HH:MM:SS'); MISSING_SECONDS si no es válido"""
+    if value is None:
+        return MISSING_SECONDS
+    if isinstance(value, (int, float)):
+        return int(value * 60) if value == value else MISSING_SECONDS
+    seconds = 0
+    try:
+        for part in str(value).strip().split(':'):
+            seconds = seconds * 60 + int(part)
+    except ValueError:
+        return MISSING_SECONDS
+    return seconds
+
+
+def clock_seconds(values):
+    """Columna 'min' a segundos enteros (cada texto distinto se convierte una sola vez)"""
+    import pandas as pd
+
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    # Última posición = código -1 (valor ausente)
+    lookup = np.array([parse_clock(value) for value in uniques] + [MISSING_SECONDS],
+                      dtype=np.int32)
+    return lookup[codes]
+
+
+def match_frame(actions):
+    """DataFrame tipado a partir de la lista de acciones del JSON"""
+    import pandas as pd
+
+    # pandas recorre los dicts en C; después cada columna pasa a su tipo compacto
+    frame = pd.DataFrame(actions)
+    columns = {}
+    for name in frame.columns:
+        series = frame[name]
+        if name in COORD_COLUMNS or name in METRIC_COLUMNS:
+            columns[name] = pd.to_numeric(series, errors='coerce').astype(np.float32)
+        elif name == 'min':
+            columns['seconds'] = pd.Series(clock_seconds(series), index=series.index)
+        elif name in CATEGORY_COLUMNS:
+            columns[name] = series.astype('category')
+        elif series.dtype == object and series.nunique(dropna=True) <= len(series) // 2:
+            # Texto desconocido: categoría si se repite, si no se deja tal cual
+            columns[name] = series.astype('category')
+        else:
+            columns[name] = series
+
+    # Columnas fijas aunque el JSON no las traiga (p. ej. partido sin acciones)
+    for name in COORD_COLUMNS:
+        columns.setdefault(name, pd.Series(np.nan, index=frame.index, dtype=np.float32))
+    for name in ('team', 'player', 'type'):
+        columns.setdefault(name, pd.Series(None, index=frame.index, dtype='category'))
+
+    return pd.DataFrame(columns)
+
+
+def load_match(json_path):
+    """Configuración y DataFrame tipado de un partido"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('config', {}), match_frame(data.get('actions', []))
+
+
+def select_team(frame, team, flip_y=False):
+    """Acciones de un equipo, sin categorías vacías (value_counts / groupby solo ven sus valores)"""
+    import pandas as pd
+
+    team_df = frame[frame['team'] == team].copy()
+    for name, dtype in team_df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            team_df[name] = team_df[name].cat.remove_unused_categories()
+    if flip_y:
+        # Invertir eje Y (según requerimiento del usuario); también el destino
+        team_df['y'] = np.float32(100) - team_df['y']
+        if 'endY' in team_df:
+            team_df['endY'] = np.float32(100) - team_df['endY']
+    return team_df
+
+
+def category_codes(series, labels):
+    """Índice de cada fila en labels (-1 si no está), sin comparar textos fila a fila"""
+    import pandas as pd
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        lookup = {label: i for i, label in enumerate(labels)}
+        # Última posición = código -1 (valor ausente)
+        remap = np.full(len(series.cat.categories) + 1, -1, dtype=np.intp)
+        for code, category in enumerate(series.cat.categories):
+            remap[code] = lookup.get(category, -1)
+        return remap[series.cat.codes.to_numpy()]
+    codes = series.map({label: i for i, label in enumerate(labels)})
+    return codes.fillna(-1).to_numpy(dtype=np.intp)
+
+
+def group_codes(frame, by):
+    """Código entero por fila de la combinación de columnas `by` (-1 si falta alguna) y sus etiquetas"""
+    import pandas as pd
+
+    by = (by,) if isinstance(by, str) else tuple(by)
+    codes = np.zeros(len(frame), dtype=np.int64)
+    missing = np.zeros(len(frame), dtype=bool)
+    values = []
+    for name in by:
+        series = frame[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            column_codes = series.cat.codes.to_numpy()
+            column_values = series.cat.categories
+        else:
+            column_codes, column_values = pd.factorize(series, sort=True)
+        missing |= column_codes < 0
+        codes = codes * max(len(column_values), 1) + column_codes
+        values.append(list(column_values))
+
+    codes[missing] = -1
+    space = int(np.prod([max(len(v), 1) for v in values]))
+    if space <= 4 * len(codes) + 1024:
+        # Espacio de códigos pequeño (lo normal): presentes con bincount, sin ordenar
+        present = np.flatnonzero(np.bincount(codes[~missing], minlength=space))
+        remap = np.full(space, -1, dtype=np.int64)
+        remap[present] = np.arange(len(present))
+        codes[~missing] = remap[codes[~missing]]
+    else:
+        present, codes[~missing] = np.unique(codes[~missing], return_inverse=True)
+    # Etiqueta de cada grupo presente: valor (una columna) o tupla (varias)
+    sizes = [max(len(v), 1) for v in values]
+    labels = []
+    for code in present:
+        parts = np.unravel_index(code, sizes)
+        label = tuple(v[int(p)] for v, p in zip(values, parts))
+        labels.append(label[0] if len(by) == 1 else label)
+    return codes, labels
+
+
+class FramePartition:
+    """Filas ordenadas de forma estable por una o varias columnas, con offsets por grupo
+
+    Cada grupo es un tramo contiguo del DataFrame ordenado: group() devuelve una
+    vista (iloc sobre un rango) sin volver a recorrer todas las filas.
+    """
+
+    def __init__(self, frame, by):
+        self.by = (by,) if isinstance(by, str) else tuple(by)
+        codes, self.labels = group_codes(frame, self.by)
+        # Filas sin grupo (-1) al principio; se saltan con offsets[0]
+        order = np.argsort(codes, kind='stable')
+        self.frame = frame.iloc[order]
+        self.counts = np.bincount(codes[codes >= 0], minlength=len(self.labels))
+        start = int(np.count_nonzero(codes < 0))
+        self.offsets = start + np.concatenate([[0], np.cumsum(self.counts)])
+        self._index = {label: i for i, label in enumerate(self.labels)}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self._index
+
+    def __iter__(self):
+        for i, label in enumerate(self.labels):
+            yield label, self.frame.iloc[self.offsets[i]:self.offsets[i + 1]]
+
+    def group(self, label):
+        """Filas de un grupo (vacío si no existe)"""
+        i = self._index.get(label)
+        if i is None:
+            return self.frame.iloc[0:0]
+        return self.frame.iloc[self.offsets[i]:self.offsets[i + 1]]
+
+    def count(self, label):
+        i = self._index.get(label)
+        return 0 if i is None else int(self.counts[i])
+
+    def by_count(self):
+        """Etiquetas de mayor a menor nº de filas (empates en orden de etiqueta)"""
+        order = np.argsort(-self.counts, kind='stable')
+        return [self.labels[i] for i in order]
+
+
+def partition(frame, by):
+    """Índice de partición de frame por una columna o una tupla de columnas"""
+    return FramePartition(frame, by)
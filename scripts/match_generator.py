@@ -0,0 +1,143 @@
+"""
+Generador de partidos sintéticos con el esquema de acciones de AttackMetrics
+Misma semilla, mismo partido: sirve para medir el rendimiento de los generadores
+de mapas e informes con partidos de 500 a 1M de acciones y de 11 a 40
+jugadores por equipo.
+"""
+
+import json
+
+import numpy as np
+
+# Tipos de acción y su peso relativo en un partido típico
+ACTION_TYPES = ('Pase', 'Conducción', 'Regate', 'Centro', 'Disparo', 'Recup', 'Intercep',
+                'Duelo', 'Falta')
+TYPE_WEIGHTS = (0.42, 0.15, 0.06, 0.05, 0.03, 0.1, 0.06, 0.09, 0.04)
+
+# Tipos con destino (endX, endY)
+MOVING_TYPES = ('Pase', 'Conducción', 'Regate', 'Centro')
+
+SHOT_RESULTS = ('Gol', 'Parada', 'Fuera', 'Bloqueado')
+SHOT_RESULT_WEIGHTS = (0.1, 0.35, 0.4, 0.15)
+
+PERIODS = ('1T', '2T')
+PERIOD_SECONDS = 45 * 60
+
+
+def _player_names(prefix, n_players):
+    return np.array([f'{prefix}{dorsal:02d}' for dorsal in range(1, n_players + 1)])
+
+
+def _team_columns(rng, n, prefix, n_players):
+    """Jugador, tipo y coordenadas de las n acciones de un equipo"""
+    # Reparto desigual de acciones entre jugadores y una posición media por jugador
+    share = rng.dirichlet(np.full(n_players, 2.0))
+    player = rng.choice(n_players, size=n, p=share)
+    home_x = rng.uniform(15, 85, n_players)
+    home_y = rng.uniform(10, 90, n_players)
+
+    kind = rng.choice(len(ACTION_TYPES), size=n, p=np.array(TYPE_WEIGHTS) / sum(TYPE_WEIGHTS))
+    x = np.clip(rng.normal(home_x[player], 14), 0, 100)
+    y = np.clip(rng.normal(home_y[player], 14), 0, 100)
+
+    # Los disparos, cerca del área rival
+    shots = kind == ACTION_TYPES.index('Disparo')
+    x[shots] = rng.uniform(72, 98, shots.sum())
+    y[shots] = np.clip(rng.normal(50, 12, shots.sum()), 15, 85)
+    return _player_names(prefix, n_players)[player], kind, x, y
+
+
+def _shot_xg(x, y):
+    """xG aproximado por distancia a portería (campo 100x100)"""
+    distance = np.hypot((100 - x) * 1.05, (50 - y) * 0.68)
+    return np.clip(0.9 * np.exp(-distance / 7.5), 0.01, 0.95)
+
+
+def _threat(x):
+    """Amenaza de una posición (xT simplificado, crece hacia la portería rival)"""
+    return 0.002 + 0.25 * (np.clip(x, 0, 100) / 100) ** 4
+
+
+def synthetic_actions(n_actions=3000, n_players=18, seed=0):
+    """Lista de acciones sintéticas de ambos equipos ordenadas por tiempo"""
+    rng = np.random.default_rng(seed)
+    n_home = int(rng.binomial(n_actions, 0.5))
+
+    columns = [_team_columns(rng, n_home, 'L', n_players),
+               _team_columns(rng, n_actions - n_home, 'V', n_players)]
+    team = np.repeat(np.array(['HOME', 'AWAY']), [n_home, n_actions - n_home])
+    player, kind, x, y = (np.concatenate(parts) for parts in zip(*columns))
+
+    # Tiempo: mitad de las acciones en cada parte, en orden
+    seconds = np.sort(rng.uniform(0, 2 * PERIOD_SECONDS, n_actions))
+    order = rng.permutation(n_actions)
+    team, player, kind, x, y = team[order], player[order], kind[order], x[order], y[order]
+    period = (seconds >= PERIOD_SECONDS).astype(int)
+    clock = seconds - period * PERIOD_SECONDS
+
+    moving = np.isin(kind, [ACTION_TYPES.index(t) for t in MOVING_TYPES])
+    shots = kind == ACTION_TYPES.index('Disparo')
+    end_x = np.clip(x + rng.normal(8, 12, n_actions), 0, 100)
+    end_y = np.clip(y + rng.normal(0, 12, n_actions), 0, 100)
+    end_x[shots] = 100
+    end_y[shots] = np.clip(rng.normal(50, 4, shots.sum()), 40, 60)
+
+    completed = rng.random(n_actions) < 0.78
+    shot_result = rng.choice(len(SHOT_RESULTS), size=n_actions,
+                             p=np.array(SHOT_RESULT_WEIGHTS) / sum(SHOT_RESULT_WEIGHTS))
+    xg = np.where(shots, _shot_xg(x, y), 0.0)
+    xt = np.where(moving & completed, np.clip(_threat(end_x) - _threat(x), 0, None), 0.0)
+
+    # Listas de Python: el bucle no toca escalares de numpy
+    results = np.where(
+        shots, np.array(SHOT_RESULTS)[shot_result],
+        np.where(np.isin(kind, [ACTION_TYPES.index('Duelo'), ACTION_TYPES.index('Falta')]),
+                 'Neutro', np.where(completed, 'Completado', 'Fallado'))).tolist()
+    has_end = (moving | shots).tolist()
+    minutes, secs = np.divmod(clock.astype(int), 60)
+    columns = zip(team.tolist(), player.tolist(), np.array(ACTION_TYPES)[kind].tolist(), results,
+                  np.round(x, 1).tolist(), np.round(y, 1).tolist(),
+                  np.round(end_x, 1).tolist(), np.round(end_y, 1).tolist(), has_end,
+                  np.round(xg, 3).tolist(), np.round(xt, 4).tolist(),
+                  minutes.tolist(), secs.tolist(), period.tolist())
+
+    actions = []
+    for i, (team_i, player_i, type_i, res_i, x_i, y_i, end_x_i, end_y_i, end_i, xg_i, xt_i,
+            minute, second, period_i) in enumerate(columns):
+        actions.append({
+            'id': i + 1,
+            'min': f'{minute:02d}:{second:02d}',
+            'period': PERIODS[period_i],
+            'team': team_i,
+            'player': player_i,
+            'type': type_i,
+            'res': res_i,
+            'x': x_i,
+            'y': y_i,
+            'endX': end_x_i if end_i else None,
+            'endY': end_y_i if end_i else None,
+            'xg': xg_i,
+            'xt': xt_i,
+        })
+    return actions
+
+
+def synthetic_match(n_actions=3000, n_players=18, seed=0):
+    """Export completo ({'config', 'actions'}) de un partido sintético"""
+    return {
+        'config': {
+            'homeTeam': 'LOCAL SINTETICO',
+            'awayTeam': 'VISITANTE SINTETICO',
+            'homeName': 'LOCAL SINTETICO',
+            'awayName': 'VISITANTE SINTETICO',
+            'date': '2026-01-01',
+        },
+        'actions': synthetic_actions(n_actions, n_players, seed),
+    }
+
+
+def write_synthetic_match(path, n_actions=3000, n_players=18, seed=0):
+    """Escribe el export de un partido sintético en path"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(synthetic_match(n_actions, n_players, seed), f, ensure_ascii=False)
+    return path
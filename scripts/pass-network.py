@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Red de pases de un partido en JSON
+Pasador -> receptor de los pases encadenados en la posesión, posición media de
+cada jugador y nº de pases de cada conexión, del partido completo, de cada
+parte o por tramos de minutos.
+
+Uso:
+    python pass-network.py <json|csv> [equipo] [--by match|period|window]
+                           [--minutes N] [--min-passes N]
+"""
+
+import argparse
+import json
+import sys
+
+from stage_timing import set_context, stage
+
+
+def match_networks(file_path, team='HOME', by='match', minutes=15):
+    """{clave: PassNetwork} de un equipo del partido"""
+    from generate_heatmap import load_match_data
+    from match_frame import match_frame, select_team
+    from pass_network import match_network, period_networks, window_networks
+    from possession_metrics import assign_possessions
+
+    data = load_match_data(file_path)
+    with stage('frame', rows=len(data['actions'])):
+        frame = match_frame(data['actions'])
+        # Posesiones con el partido completo: las acciones del rival las cortan
+        assign_possessions(frame)
+    team_df = select_team(frame, team)
+    with stage('pass_network', rows=len(team_df)):
+        if by == 'period':
+            return period_networks(team_df)
+        if by == 'window':
+            return {f"{start}-{end}": net
+                    for (start, end), net in window_networks(team_df, minutes).items()}
+        return {'match': match_network(team_df)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Red de pases de un partido en JSON")
+    parser.add_argument('file_path', help="JSON de Attack Metrics o CSV de AnalistaPro")
+    parser.add_argument('team', nargs='?', default='HOME')
+    parser.add_argument('--by', choices=('match', 'period', 'window'), default='match')
+    parser.add_argument('--minutes', type=int, default=15, help="minutos por tramo (--by window)")
+    parser.add_argument('--min-passes', type=int, default=1,
+                        help="conexiones con al menos N pases")
+    args = parser.parse_args()
+    set_context(script='pass-network', team=args.team)
+
+    try:
+        networks = match_networks(args.file_path, args.team, args.by, args.minutes)
+    except (OSError, ValueError, KeyError) as e:
+        print(json.dumps({'error': str(e)}))
+        return 1
+    print(json.dumps({key: net.to_json(args.min_passes) for key, net in networks.items()},
+                     ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
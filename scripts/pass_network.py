@@ -0,0 +1,268 @@
+"""
+Redes de pases como matrices dispersas pasador x receptor
+Un pase de A seguido, en la misma posesión, por una acción de B (B != A) es
+una arista A -> B. Cada red guarda la matriz en formato COO (fila, columna,
+nº de pases) sobre la lista de jugadores y los momentos (n, Σx, Σy) de sus
+acciones para la posición media; sumar redes de varios partidos es unir las
+listas de jugadores y sumar tripletes, sin volver a leer los partidos.
+
+Todas las redes de un partido (completo, por parte o por tramos de minutos)
+salen de una sola pasada: un np.unique sobre (segmento, pasador, receptor).
+"""
+
+import json
+
+PASS_TYPES = ('Pase',)
+
+# Tramos por defecto de window_networks (minutos)
+DEFAULT_WINDOW_MINUTES = 15
+
+NETWORK_SUFFIX = '.passes.npz'
+
+
+class PassNetwork:
+    """Matriz dispersa pasador x receptor (COO) y momentos de posición de cada jugador"""
+
+    def __init__(self, players, passer, receiver, passes, moments):
+        import numpy as np
+
+        self.players = [str(p) for p in players]
+        self.passer = np.asarray(passer, dtype=np.int32)
+        self.receiver = np.asarray(receiver, dtype=np.int32)
+        self.passes = np.asarray(passes, dtype=np.int32)
+        # (jugador, [n, Σx, Σy])
+        self.moments = np.asarray(moments, dtype=np.float64).reshape(len(self.players), 3)
+
+    def __len__(self):
+        return len(self.players)
+
+    @property
+    def total(self):
+        return int(self.passes.sum())
+
+    def dense(self):
+        """Matriz completa (jugadores x jugadores) con el nº de pases"""
+        import numpy as np
+
+        matrix = np.zeros((len(self.players), len(self.players)), dtype=np.int32)
+        matrix[self.passer, self.receiver] = self.passes
+        return matrix
+
+    def positions(self):
+        """Posición media (x, y) de cada jugador; NaN si no tiene acciones con coordenadas"""
+        import numpy as np
+
+        n = self.moments[:, 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.moments[:, 1:] / n[:, None]
+
+    def edges(self, min_passes=1):
+        """(pasador, receptor, pases) de mayor a menor nº de pases"""
+        import numpy as np
+
+        keep = np.flatnonzero(self.passes >= min_passes)
+        order = keep[np.argsort(-self.passes[keep], kind='stable')]
+        return [(self.players[self.passer[i]], self.players[self.receiver[i]],
+                 int(self.passes[i])) for i in order]
+
+    def to_json(self, min_passes=1, digits=2):
+        """Nodos (posición media, pases dados y recibidos) y aristas para el JSON"""
+        import numpy as np
+
+        given = np.bincount(self.passer, weights=self.passes, minlength=len(self.players))
+        received = np.bincount(self.receiver, weights=self.passes, minlength=len(self.players))
+        positions = self.positions()
+        nodes = []
+        for i, player in enumerate(self.players):
+            x, y = positions[i]
+            nodes.append({
+                'player': player,
+                'x': None if np.isnan(x) else round(float(x), digits),
+                'y': None if np.isnan(y) else round(float(y), digits),
+                'actions': int(self.moments[i, 0]),
+                'passes': int(given[i]),
+                'received': int(received[i]),
+            })
+        return {
+            'total_passes': self.total,
+            'nodes': nodes,
+            'edges': [{'from': a, 'to': b, 'passes': n} for a, b, n in self.edges(min_passes)],
+        }
+
+    def arrays(self, prefix=''):
+        """Arrays para np.savez (con un prefijo por red)"""
+        import numpy as np
+
+        return {
+            prefix + 'players': np.array(self.players, dtype=str),
+            prefix + 'coo': np.stack([self.passer, self.receiver, self.passes]),
+            prefix + 'moments': self.moments,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix=''):
+        coo = arrays[prefix + 'coo']
+        return cls(arrays[prefix + 'players'].tolist(), coo[0], coo[1], coo[2],
+                   arrays[prefix + 'moments'])
+
+
+def empty_network():
+    return PassNetwork([], [], [], [], [])
+
+
+def merge_networks(networks):
+    """Suma redes (p. ej. de varios partidos): une los jugadores y suma tripletes y momentos"""
+    import numpy as np
+
+    networks = [net for net in networks if len(net)]
+    if not networks:
+        return empty_network()
+    players = sorted({p for net in networks for p in net.players})
+    index = {p: i for i, p in enumerate(players)}
+    n = len(players)
+
+    keys, passes = [], []
+    moments = np.zeros((n, 3))
+    for net in networks:
+        remap = np.array([index[p] for p in net.players], dtype=np.int64)
+        keys.append(remap[net.passer] * n + remap[net.receiver])
+        passes.append(net.passes)
+        np.add.at(moments, remap, net.moments)
+    # Tripletes repetidos (misma pareja en varios partidos) se suman
+    unique, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    summed = np.bincount(inverse, weights=np.concatenate(passes), minlength=len(unique))
+    return PassNetwork(players, unique // n, unique % n, summed.astype(np.int32), moments)
+
+
+def build_networks(frame, segments=None):
+    """Redes de pases por segmento en una pasada: {segmento: PassNetwork}
+
+    segments: código entero por fila (-1 = fuera); None = una sola red con todo.
+    Las filas deben estar en orden cronológico y ser de un solo equipo.
+    """
+    import numpy as np
+    from match_frame import category_codes, group_codes
+    from possession_metrics import possession_ids
+
+    n_rows = len(frame)
+    segments = np.zeros(n_rows, dtype=np.int64) if segments is None \
+        else np.asarray(segments, dtype=np.int64)
+    player, labels = group_codes(frame, 'player')
+    n_players = max(len(labels), 1)
+    poss = frame['poss_id'].to_numpy() if 'poss_id' in frame else possession_ids(frame)
+
+    # Receptor: la acción siguiente en la misma posesión, de otro jugador
+    is_pass = category_codes(frame['type'], PASS_TYPES) >= 0
+    link = np.zeros(n_rows, dtype=bool)
+    link[:-1] = (is_pass[:-1] & (poss[:-1] >= 0) & (poss[:-1] == poss[1:])
+                 & (player[:-1] >= 0) & (player[1:] >= 0) & (player[:-1] != player[1:])
+                 & (segments[:-1] >= 0))
+    rows = np.flatnonzero(link)
+    keys = (segments[rows] * n_players + player[rows]) * n_players + player[rows + 1]
+    unique, counts = np.unique(keys, return_counts=True)
+    edge_segment = unique // (n_players * n_players)
+
+    # Momentos de posición por (segmento, jugador) con bincount
+    x = frame['x'].to_numpy(dtype=np.float64, na_value=np.nan)
+    y = frame['y'].to_numpy(dtype=np.float64, na_value=np.nan)
+    located = (segments >= 0) & (player >= 0) & ~np.isnan(x) & ~np.isnan(y)
+    present = np.unique(segments[segments >= 0])
+    size = (int(present.max()) + 1 if len(present) else 0) * n_players
+    cell = segments[located] * n_players + player[located]
+    moments = np.stack([np.bincount(cell, minlength=size),
+                        np.bincount(cell, weights=x[located], minlength=size),
+                        np.bincount(cell, weights=y[located], minlength=size)], axis=1)
+
+    networks = {}
+    for segment in present.tolist():
+        block = moments[segment * n_players:(segment + 1) * n_players]
+        # Jugadores del segmento: con acciones o con algún pase
+        edges = edge_segment == segment
+        passer = (unique[edges] // n_players) % n_players
+        receiver = unique[edges] % n_players
+        seen = np.zeros(n_players, dtype=bool)
+        seen[np.flatnonzero(block[:, 0])] = True
+        seen[passer] = seen[receiver] = True
+        keep = np.flatnonzero(seen)
+        remap = np.full(n_players, -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        networks[segment] = PassNetwork([labels[i] for i in keep], remap[passer],
+                                        remap[receiver], counts[edges], block[keep])
+    return networks
+
+
+def match_network(frame):
+    """Red de pases del partido completo"""
+    return build_networks(frame).get(0, empty_network())
+
+
+def period_networks(frame):
+    """Red de cada parte: {parte: PassNetwork}"""
+    from match_frame import group_codes
+
+    if 'period' not in frame:
+        return {}
+    codes, labels = group_codes(frame, 'period')
+    return {str(labels[segment]): net for segment, net in build_networks(frame, codes).items()}
+
+
+def window_networks(frame, minutes=DEFAULT_WINDOW_MINUTES):
+    """Redes por tramos de minutos del reloj: {(desde, hasta): PassNetwork}"""
+    import numpy as np
+
+    seconds = frame['seconds'].to_numpy() if 'seconds' in frame else np.full(len(frame), -1)
+    width = int(minutes * 60)
+    segments = np.where(seconds >= 0, seconds // width, -1)
+    return {(segment * minutes, (segment + 1) * minutes): net
+            for segment, net in build_networks(frame, segments).items()}
+
+
+def save_networks(path, networks):
+    """Guarda varias redes {nombre: PassNetwork} en un .npz (escritura atómica)"""
+    import os
+    import tempfile
+    import numpy as np
+
+    arrays = {'names': np.array(json.dumps(list(networks)))}
+    for i, net in enumerate(networks.values()):
+        arrays.update(net.arrays(f'n{i}_'))
+    fd, tmp = tempfile.mkstemp(prefix='.tmp-', suffix='.npz', dir=os.path.dirname(path) or '.')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_networks(path):
+    """Redes guardadas con save_networks: {nombre: PassNetwork}"""
+    import numpy as np
+
+    with np.load(path) as arrays:
+        names = json.loads(str(arrays['names']))
+        return {name: PassNetwork.from_arrays(arrays, f'n{i}_') for i, name in enumerate(names)}
+
+
+def draw_network(ax, network, min_passes=2, color='#c0392b', flip_y=False, zorder=12):
+    """Dibuja la red sobre un campo ya dibujado: aristas de ancho según los pases, nodos según las acciones"""
+    import numpy as np
+    from matplotlib.collections import LineCollection
+
+    positions = network.positions()
+    if flip_y:
+        positions = positions * [1, -1] + [0, 100]
+    edges = np.flatnonzero(network.passes >= min_passes)
+    if len(edges):
+        segments = np.stack([positions[network.passer[edges]],
+                             positions[network.receiver[edges]]], axis=1)
+        weight = network.passes[edges] / network.passes[edges].max()
+        # Todas las aristas en una sola colección
+        ax.add_collection(LineCollection(segments, linewidths=1 + 7 * weight, colors=color,
+                                         alpha=0.25 + 0.5 * weight, zorder=zorder,
+                                         capstyle='round'))
+    involvement = network.moments[:, 0]
+    valid = ~np.isnan(positions).any(axis=1)
+    sizes = 200 + 1200 * involvement / max(involvement.max(), 1)
+    ax.scatter(positions[valid, 0], positions[valid, 1], s=sizes[valid], c=color,
+               edgecolors='white', linewidths=2, zorder=zorder + 1)
+    for i in np.flatnonzero(valid):
+        ax.annotate(network.players[i], positions[i], ha='center', va='center', fontsize=8,
+                    fontweight='bold', color='white', zorder=zorder + 2)
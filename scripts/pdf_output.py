@@ -0,0 +1,64 @@
+"""
+Salida PDF ligera: densidades como imagen y tamaño máximo por informe
+Los contornos KDE rellenos (15-20 niveles) son cientos de trazados vectoriales
+por mapa. Con un DPI de raster, plot_density dibuja las franjas de nivel como
+una imagen a esa resolución, mientras que las líneas del campo, los puntos y el
+texto siguen siendo vectoriales. Con un tamaño máximo, el informe se vuelve a
+escribir con menos DPI hasta que cabe.
+"""
+
+import math
+
+DEFAULT_RASTER_DPI = 150
+MIN_RASTER_DPI = 40
+# Margen al estimar el DPI siguiente (el modelo de tamaño es aproximado)
+DPI_MARGIN = 0.9
+
+
+def next_raster_dpi(attempts, max_bytes):
+    """DPI del siguiente intento según los anteriores [(dpi, bytes)]; None si ya es el mínimo
+
+    El PDF se modela como parte fija (vectorial) + k·DPI²; con un solo intento se
+    supone todo raster.
+    """
+    dpi, size = attempts[-1]
+    if dpi <= MIN_RASTER_DPI:
+        return None
+    if len(attempts) > 1 and attempts[-2][0] != dpi:
+        prev_dpi, prev_size = attempts[-2]
+        k = max((prev_size - size) / (prev_dpi ** 2 - dpi ** 2), 1e-9)
+        fixed = size - k * dpi ** 2
+    else:
+        k, fixed = size / dpi ** 2, 0
+    if max_bytes <= fixed:
+        # Ni sin imágenes cabría: último intento con el DPI mínimo
+        return MIN_RASTER_DPI
+    target = int(math.sqrt((max_bytes - fixed) / k) * DPI_MARGIN)
+    return max(MIN_RASTER_DPI, min(target, dpi - 10))
+
+
+def fit_pdf_size(write, max_bytes=None, dpi=None):
+    """Escribe el PDF con write(dpi) -> bytes, bajando el DPI hasta no superar max_bytes
+
+    Devuelve (dpi, bytes, intentos). Sin max_bytes se escribe una vez con el DPI
+    indicado (None = vectorial); si ni con MIN_RASTER_DPI cabe, queda el último intento.
+    """
+    if max_bytes is None:
+        return dpi, write(dpi), 1
+    dpi = dpi or DEFAULT_RASTER_DPI
+    attempts = [(dpi, write(dpi))]
+    while attempts[-1][1] > max_bytes:
+        dpi = next_raster_dpi(attempts, max_bytes)
+        if dpi is None:
+            break
+        attempts.append((dpi, write(dpi)))
+    dpi, size = attempts[-1]
+    return dpi, size, len(attempts)
+
+
+def megabytes(value):
+    """Tipo de argparse para --max-size: MB a bytes"""
+    size = float(value)
+    if size <= 0:
+        raise ValueError(value)
+    return int(size * 1024 * 1024)
@@ -0,0 +1,112 @@
+"""
+Capa de campo precalculada para todas las figuras
+La geometría de las líneas se construye una sola vez por estilo y se estampa en
+cada eje como una única LineCollection (más un único scatter para los puntos),
+en lugar de 20+ llamadas a ax.plot/add_patch por subgráfico.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+def _circle(cx, cy, rx, ry=None, start=0.0, end=2 * np.pi, n=100):
+    ry = rx if ry is None else ry
+    theta = np.linspace(start, end, n)
+    return np.column_stack([cx + rx * np.cos(theta), cy + ry * np.sin(theta)])
+
+
+def _polyline(xs, ys):
+    return np.column_stack([xs, ys]).astype(float)
+
+
+def _rect(x, y, w, h):
+    return _polyline([x, x + w, x + w, x, x], [y, y, y + h, y + h, y])
+
+
+def _basic_layout():
+    """Campo sencillo de generate_heatmap.py (círculo central escalado a 105x68)"""
+    lines = [
+        (_polyline([0, 0, 100, 100, 0], [0, 100, 100, 0, 0]), 2),
+        (_polyline([50, 50], [0, 100]), 1),
+        (_polyline([0, 17, 17, 0], [21.1, 21.1, 78.9, 78.9]), 1),
+        (_polyline([100, 83, 83, 100], [21.1, 21.1, 78.9, 78.9]), 1),
+        (_polyline([0, 5.8, 5.8, 0], [36.8, 36.8, 63.2, 63.2]), 1),
+        (_polyline([100, 94.2, 94.2, 100], [36.8, 36.8, 63.2, 63.2]), 1),
+        (_circle(50, 50, 8.7, 13.4), 1),
+    ]
+    return lines, []
+
+
+def _standard_layout():
+    """Campo del informe de heatmaps: áreas, puntos de penalti y arcos"""
+    lines = [
+        (_polyline([0, 0, 100, 100, 0], [0, 100, 100, 0, 0]), 2),
+        (_polyline([50, 50], [0, 100]), 2),
+        # Áreas grandes y pequeñas (3 lados cada una)
+        (_polyline([0, 16.5, 16.5, 0], [21.1, 21.1, 78.9, 78.9]), 1.5),
+        (_polyline([100, 83.5, 83.5, 100], [21.1, 21.1, 78.9, 78.9]), 1.5),
+        (_polyline([0, 5.5, 5.5, 0], [36.8, 36.8, 63.2, 63.2]), 1.5),
+        (_polyline([100, 94.5, 94.5, 100], [36.8, 36.8, 63.2, 63.2]), 1.5),
+        (_circle(50, 50, 9.15), 1.5),
+        # Arcos de área mirando hacia el campo
+        (_circle(11, 50, 9.15, start=-0.93, end=0.93, n=50), 1.5),
+        (_circle(89, 50, 9.15, start=np.pi - 0.93, end=np.pi + 0.93, n=50), 1.5),
+    ]
+    spots = [(50, 50, 3), (11, 50, 3), (89, 50, 3)]
+    return lines, spots
+
+
+def _full_layout():
+    """Campo detallado de generate-report.py: áreas cerradas, semicírculos y esquinas"""
+    lines = [
+        (_polyline([0, 0, 100, 100, 0], [0, 100, 100, 0, 0]), 3),
+        (_polyline([50, 50], [0, 100]), 2.5),
+        (_rect(0, 21.1, 17, 57.8), 2),
+        (_rect(83, 21.1, 17, 57.8), 2),
+        (_rect(0, 36.8, 5.8, 26.4), 2),
+        (_rect(94.2, 36.8, 5.8, 26.4), 2),
+        (_circle(50, 50, 8.7), 2),
+        (_circle(17, 50, 9.15, start=-np.pi / 2, end=np.pi / 2, n=50), 2),
+        (_circle(83, 50, -9.15, 9.15, start=-np.pi / 2, end=np.pi / 2, n=50), 2),
+    ]
+    # Esquinas
+    for x, y in [(0, 0), (0, 100), (100, 0), (100, 100)]:
+        start, end = (0, np.pi / 2) if x == 0 else (np.pi / 2, np.pi)
+        sign = -1 if y == 0 else 1
+        lines.append((_circle(x, y, 1, sign, start=start, end=end, n=20), 1.5))
+    spots = [(50, 50, 6), (11, 50, 5), (89, 50, 5)]
+    return lines, spots
+
+
+PITCH_LAYOUTS = {
+    'basic': _basic_layout,
+    'standard': _standard_layout,
+    'full': _full_layout,
+}
+
+
+@lru_cache(maxsize=None)
+def pitch_geometry(layout):
+    """Segmentos, grosores y puntos de un diseño de campo (se calcula una vez)"""
+    lines, spots = PITCH_LAYOUTS[layout]()
+    segments = tuple(line for line, _ in lines)
+    linewidths = tuple(float(lw) for _, lw in lines)
+    spot_xy = np.array([(x, y) for x, y, _ in spots], dtype=float).reshape(-1, 2)
+    spot_sizes = np.array([size ** 2 for _, _, size in spots], dtype=float)
+    return segments, linewidths, spot_xy, spot_sizes
+
+
+def stamp_pitch(ax, layout, line_color='black', zorder=2, spot_zorder=None):
+    """Estampa las líneas del campo en el eje como una sola colección"""
+    from matplotlib.collections import LineCollection
+
+    segments, linewidths, spot_xy, spot_sizes = pitch_geometry(layout)
+    lines = LineCollection(segments, linewidths=linewidths, colors=line_color,
+                           capstyle='projecting', joinstyle='round', zorder=zorder)
+    ax.add_collection(lines, autolim=False)
+
+    if len(spot_xy):
+        ax.scatter(spot_xy[:, 0], spot_xy[:, 1], s=spot_sizes, color=line_color,
+                   linewidths=0, zorder=zorder if spot_zorder is None else spot_zorder)
+    return lines
@@ -0,0 +1,169 @@
+"""
+Motor de zonas vectorizado
+Asigna cada acción a una zona (digitize sobre los bordes) y acumula conteos y sumas de
+métricas (xT, xG...) con un único np.bincount, para cualquier subconjunto de
+acciones y opcionalmente por grupo (jugador, partido...). Sustituye a las
+funciones get_zone / get_third aplicadas fila a fila.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# Bordes interiores en x (largo, 0 = portería propia) e y (ancho, 0 = izquierda).
+# Un valor igual al borde cae en la zona superior salvo en los bordes de y_strict,
+# donde se queda en la inferior (comparación '>' como en la web)
+ZoneLayout = namedtuple('ZoneLayout', 'x_edges y_edges x_labels y_labels label_format y_strict',
+                        defaults=((),))
+
+THIRDS = ('Defensivo', 'Medio', 'Ofensivo')
+LANES = ('Izquierda', 'Centro', 'Derecha')
+
+# Carriles de juego de posición, separados por las líneas del área grande y pequeña
+POSITIONAL_CHANNELS = ('Banda Izq.', 'Interior Izq.', 'Central', 'Interior Der.', 'Banda Der.')
+
+ZONE_LAYOUTS = {
+    # Rejilla del informe de heatmaps (bordes 33.3 / 66.6 como hasta ahora)
+    '3x3': ZoneLayout((33.3, 66.6), (33.3, 66.6), THIRDS, LANES, '{x} - {y}'),
+    'thirds': ZoneLayout((100 / 3, 200 / 3), (), THIRDS, ('',), '{x}'),
+    # Z1-Z6 por carril, como getLaneZone() de AttackMetrics.html
+    # (y < 33 izquierdo, y > 66 derecho: 66 sigue siendo central)
+    '6x3': ZoneLayout(tuple(16.6 * i for i in range(1, 6)), (33, 66),
+                      tuple(f'Z{i}' for i in range(1, 7)), ('IZQUIERDO', 'CENTRAL', 'DERECHO'),
+                      '{x} {y}', y_strict=(66,)),
+    # 18 zonas numeradas por columnas desde la portería propia
+    '18': ZoneLayout(tuple(100 * i / 6 for i in range(1, 6)), (100 / 3, 200 / 3),
+                     tuple(range(6)), tuple(range(3)), None),
+    'positional': ZoneLayout((100 / 3, 200 / 3), (21.1, 36.8, 63.2, 78.9),
+                             THIRDS, POSITIONAL_CHANNELS, '{x} - {y}'),
+}
+
+
+def get_layout(layout):
+    """Diseño de zonas por nombre (o el propio ZoneLayout)"""
+    if isinstance(layout, ZoneLayout):
+        return layout
+    try:
+        return ZONE_LAYOUTS[layout]
+    except KeyError:
+        raise ValueError(f"Diseño de zonas desconocido: {layout!r} "
+                         f"(disponibles: {', '.join(ZONE_LAYOUTS)})") from None
+
+
+def zone_shape(layout):
+    layout = get_layout(layout)
+    return len(layout.x_labels), len(layout.y_labels)
+
+
+def zone_labels(layout):
+    """Nombre de cada zona en orden plano (x mayor, y menor)"""
+    layout = get_layout(layout)
+    labels = []
+    for i, x_label in enumerate(layout.x_labels):
+        for j, y_label in enumerate(layout.y_labels):
+            if layout.label_format is None:
+                labels.append(str(i * len(layout.y_labels) + j + 1))
+            else:
+                labels.append(layout.label_format.format(x=x_label, y=y_label))
+    return labels
+
+
+def _digitize(values, edges, strict=()):
+    """np.digitize para pocos bordes: una comparación vectorizada por borde (sin búsqueda binaria)
+
+    Los bordes de strict dejan el valor igual al borde en la zona inferior.
+    """
+    bins = np.zeros(len(values), dtype=np.intp)
+    for edge in edges:
+        bins += (values > edge) if edge in strict else (values >= edge)
+    return bins
+
+
+def zone_indices(x, y, layout):
+    """Índice plano de zona de cada acción (-1 si la coordenada falta)"""
+    layout = get_layout(layout)
+    x = np.asarray(x)
+    y = np.asarray(y)
+    flat = _digitize(x, layout.x_edges) * len(layout.y_labels) + _digitize(y, layout.y_edges, layout.y_strict)
+    flat[~(np.isfinite(x) & np.isfinite(y))] = -1
+    return flat
+
+
+class ZoneTable:
+    """Conteos y sumas de métricas por zona, con forma (grupos, zonas x, zonas y)"""
+
+    def __init__(self, layout, counts, sums, groups):
+        self.layout = get_layout(layout)
+        self.counts = counts
+        self.sums = sums
+        self.groups = groups
+
+    @property
+    def labels(self):
+        return zone_labels(self.layout)
+
+    def _index(self, group):
+        if group is None:
+            if len(self.groups) != 1:
+                raise ValueError("La tabla tiene varios grupos: indica cuál")
+            return 0
+        return self.groups.index(group)
+
+    def matrix(self, metric='count', group=None):
+        """Matriz (zonas x, zonas y) de conteos o de la suma de una métrica"""
+        values = self.counts if metric == 'count' else self.sums[metric]
+        return values[self._index(group)]
+
+    def series(self, metric='count', group=None, drop_empty=False):
+        """Valores por zona como pd.Series con los nombres de zona en orden"""
+        import pandas as pd
+
+        values = pd.Series(self.matrix(metric, group).ravel(), index=self.labels)
+        if drop_empty:
+            values = values[self.matrix('count', group).ravel() > 0]
+        return values
+
+    def to_dict(self, group=None):
+        """Conteos y sumas como listas anidadas, para la salida JSON"""
+        result = {'layout': self.labels, 'count': self.matrix('count', group).tolist()}
+        for metric in self.sums:
+            result[metric] = np.round(self.matrix(metric, group), 4).tolist()
+        return result
+
+
+def zone_table(x, y, layout='3x3', weights=None, group_codes=None, groups=None):
+    """Conteos y sumas por zona de un conjunto de acciones en una sola pasada
+
+    weights: {'xt': array, 'xg': array, ...}; los NaN no suman.
+    group_codes: grupo de cada acción (-1 = excluida) y groups sus etiquetas; sin
+    ellos todas las acciones forman un único grupo.
+    """
+    layout = get_layout(layout)
+    nx, ny = zone_shape(layout)
+    n_zones = nx * ny
+    flat = zone_indices(x, y, layout)
+
+    if group_codes is None:
+        group_codes = np.zeros(len(flat), dtype=np.intp)
+        groups = [None]
+    group_codes = np.asarray(group_codes)
+    valid = (flat >= 0) & (group_codes >= 0)
+    cells = group_codes[valid] * n_zones + flat[valid]
+    size = len(groups) * n_zones
+
+    counts = np.bincount(cells, minlength=size).reshape(len(groups), nx, ny)
+    sums = {}
+    for metric, values in (weights or {}).items():
+        values = np.asarray(values, dtype=np.float64)[valid]
+        sums[metric] = np.bincount(cells, weights=np.nan_to_num(values), minlength=size) \
+            .reshape(len(groups), nx, ny)
+    return ZoneTable(layout, counts, sums, list(groups))
+
+
+def frame_zone_table(frame, layout='3x3', metrics=('xt', 'xg'), by=None):
+    """zone_table de un DataFrame de acciones, opcionalmente por columna(s) `by`"""
+    from match_frame import group_codes
+
+    weights = {metric: frame[metric].to_numpy() for metric in metrics if metric in frame}
+    codes, groups = (None, None) if by is None else group_codes(frame, by)
+    return zone_table(frame['x'].to_numpy(), frame['y'].to_numpy(), layout, weights, codes, groups)
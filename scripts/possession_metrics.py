@@ -0,0 +1,233 @@
+"""
+Métricas de amenaza por jugador y equipo: xT añadido, xG, xGChain y xGBuildup
+Una acción del rival, una pérdida o una acción fallida (salvo duelos) cierran
+la posesión. Si el export trae 'possession' (CSV de AnalistaPro) se usa esa
+columna; en ambos casos las acciones con x < 0 quedan fuera y las posesiones se
+numeran por orden de aparición.
+
+Todo se calcula con reducciones por segmento (bincount) sobre los códigos de
+posesión y de jugador, sin recorrer acciones en Python:
+  - xT / xBuild / xG: suma de 'xt', 'xbuild' y del 'xg' de los disparos.
+  - xGChain: xG total de cada posesión en la que participa el jugador.
+  - xGBuildup: igual, sin contar el disparo ni la acción previa al disparo.
+Las filas deben estar en orden cronológico (el del JSON).
+
+No coincide con renderXgBuild de la web (AttackMetrics.html), que solo corta
+la posesión al cambiar de equipo, cuenta solo 'Disparo' con xG > 0 y deja
+fuera del xGBuildup al tirador y al autor de la acción previa solo si fue
+'Pase', 'Clave' o 'Asist' (y en toda la posesión). Aquí se descuenta la acción
+previa al disparo sea cual sea su tipo y un jugador suma xGBuildup si tiene
+alguna otra acción en la posesión.
+"""
+
+import json
+import os
+import tempfile
+
+# Acciones que son disparo y resultados que cierran la posesión
+SHOT_TYPES = ('Disparo', 'Remate', 'Tiro', 'Gol')
+LOSS_TYPES = ('Perdida',)
+BREAK_RESULTS = ('Fallado', 'Fuera', 'Bloqueado')
+GOAL_RESULTS = ('Gol',)
+
+# Columnas de las tablas de métricas (mismo orden en JSON y en el almacén)
+METRIC_FIELDS = ('actions', 'possessions', 'shots', 'goals', 'xt', 'xbuild', 'xg', 'xgot',
+                 'xg_chain', 'xg_buildup')
+COUNT_FIELDS = ('matches', 'actions', 'possessions', 'shots', 'goals')
+
+METRICS_SUFFIX = '.metrics.json'
+
+
+def _column(frame, name):
+    """Columna numérica como float64 (0 donde falta)"""
+    import numpy as np
+
+    if name not in frame:
+        return np.zeros(len(frame))
+    return np.nan_to_num(frame[name].to_numpy(dtype=np.float64, na_value=np.nan))
+
+
+def _matches(frame, name, labels):
+    """Máscara de filas cuya columna está en labels"""
+    import numpy as np
+    from match_frame import category_codes
+
+    if name not in frame:
+        return np.zeros(len(frame), dtype=bool)
+    return category_codes(frame[name], labels) >= 0
+
+
+def possession_ids(frame):
+    """Posesión de cada fila (int64 consecutivo por orden de aparición; -1 sin posesión)"""
+    import numpy as np
+    from match_frame import group_codes
+
+    n = len(frame)
+    team, _ = group_codes(frame, 'team')
+    # Acciones fuera del campo (x < 0) no forman parte de ninguna posesión
+    valid = (team >= 0) & ~(_column(frame, 'x') < 0)
+
+    if 'possession' in frame:
+        codes, _ = group_codes(frame, ('team', 'possession'))
+        return _first_appearance(np.where(valid, codes, -1))
+
+    rows = np.flatnonzero(valid)
+    if not len(rows):
+        return np.full(n, -1, dtype=np.int64)
+
+    duel = np.zeros(n, dtype=bool)
+    if 'type' in frame:
+        duel = frame['type'].astype(str).str.contains('Duelo', regex=False).to_numpy()
+    closes = _matches(frame, 'type', LOSS_TYPES) | (_matches(frame, 'res', BREAK_RESULTS) & ~duel)
+
+    # Empieza posesión: primera acción, cambio de equipo o la anterior la cerró
+    team_rows = team[rows]
+    starts = np.ones(len(rows), dtype=bool)
+    starts[1:] = (team_rows[1:] != team_rows[:-1]) | closes[rows[:-1]]
+    ids = np.full(n, -1, dtype=np.int64)
+    ids[rows] = np.cumsum(starts) - 1
+    return ids
+
+
+def _first_appearance(codes):
+    """Renumera códigos (>= 0) por orden de primera aparición; -1 se mantiene"""
+    import numpy as np
+
+    ids = np.full(len(codes), -1, dtype=np.int64)
+    keep = codes >= 0
+    _, first, inverse = np.unique(codes[keep], return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(len(first))
+    ids[keep] = rank[inverse]
+    return ids
+
+
+def assign_possessions(frame):
+    """Añade 'poss_id' al DataFrame (una sola vez, con el partido completo)"""
+    if 'poss_id' not in frame:
+        frame['poss_id'] = possession_ids(frame)
+    return frame
+
+
+def _chain_sums(groups, n_groups, poss, rows, poss_xg):
+    """xG de las posesiones distintas en que aparece cada grupo (solo las filas rows) y su número"""
+    import numpy as np
+
+    keep = rows & (groups >= 0) & (poss >= 0)
+    # Pares (posesión, grupo) únicos: cada posesión cuenta una vez por jugador
+    pairs = np.unique(poss[keep] * n_groups + groups[keep])
+    owner, chain = pairs % n_groups, pairs // n_groups
+    return (np.bincount(owner, weights=poss_xg[chain], minlength=n_groups),
+            np.bincount(owner, minlength=n_groups))
+
+
+def metrics_table(frame, by=('team', 'player')):
+    """DataFrame de METRIC_FIELDS por grupo (por defecto (equipo, jugador)) en una pasada"""
+    import numpy as np
+    import pandas as pd
+    from match_frame import group_codes
+
+    by = (by,) if isinstance(by, str) else tuple(by)
+    groups, labels = group_codes(frame, by)
+    n_groups = len(labels)
+    poss = frame['poss_id'].to_numpy() if 'poss_id' in frame else possession_ids(frame)
+
+    shot = _matches(frame, 'type', SHOT_TYPES)
+    goal = shot & (_matches(frame, 'res', GOAL_RESULTS) | _matches(frame, 'type', GOAL_RESULTS))
+    xg = np.where(shot, _column(frame, 'xg'), 0.0)
+    xgot = np.where(shot, _column(frame, 'xgot'), 0.0)
+
+    # Pase clave: la siguiente acción de la misma posesión es un disparo
+    key_pass = np.zeros(len(frame), dtype=bool)
+    key_pass[:-1] = (poss[:-1] >= 0) & (poss[:-1] == poss[1:]) & shot[1:]
+
+    in_poss = poss >= 0
+    poss_xg = np.bincount(poss[in_poss], weights=xg[in_poss],
+                          minlength=int(poss.max()) + 1 if len(poss) else 0)
+    chain, possessions = _chain_sums(groups, n_groups, poss, np.ones(len(frame), dtype=bool),
+                                     poss_xg)
+    buildup, _ = _chain_sums(groups, n_groups, poss, ~shot & ~key_pass, poss_xg)
+
+    valid = groups >= 0
+    codes = groups[valid]
+
+    def total(values):
+        return np.bincount(codes, weights=values[valid], minlength=n_groups)
+
+    columns = {
+        'actions': np.bincount(codes, minlength=n_groups),
+        'possessions': possessions,
+        'shots': np.bincount(codes, weights=shot[valid], minlength=n_groups).astype(np.int64),
+        'goals': np.bincount(codes, weights=goal[valid], minlength=n_groups).astype(np.int64),
+        'xt': total(_column(frame, 'xt')),
+        'xbuild': total(_column(frame, 'xbuild')),
+        'xg': total(xg),
+        'xgot': total(xgot),
+        'xg_chain': chain,
+        'xg_buildup': buildup,
+    }
+    index = pd.MultiIndex.from_tuples(labels, names=by) if len(by) > 1 \
+        else pd.Index(labels, name=by[0])
+    return pd.DataFrame(columns, index=index, columns=list(METRIC_FIELDS))
+
+
+def team_metrics(frame):
+    """Métricas por equipo (xGChain = xG de sus posesiones; xGBuildup, de las elaboradas)"""
+    return metrics_table(frame, 'team')
+
+
+def metrics_records(table, digits=3):
+    """Tabla -> {etiqueta: {métrica: valor}} para el JSON (etiquetas de varias columnas con '|')"""
+    records = {}
+    for label, row in zip(table.index, table.to_numpy(dtype=float).tolist()):
+        key = '|'.join(str(part) for part in label) if isinstance(label, tuple) else str(label)
+        records[key] = {field: int(value) if field in COUNT_FIELDS else round(value, digits)
+                        for field, value in zip(table.columns, row)}
+    return records
+
+
+def write_metrics(path, table):
+    """Guarda una tabla de métricas (JSON compacto, escritura atómica)"""
+    payload = {
+        'index': list(table.index.names),
+        'fields': list(table.columns),
+        'rows': [list(label) if isinstance(label, tuple) else [label] for label in table.index],
+        'values': table.to_numpy(dtype=float).tolist(),
+    }
+    fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path) or '.')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def read_metrics(path):
+    """Tabla guardada con write_metrics"""
+    import pandas as pd
+
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    index = pd.MultiIndex.from_tuples([tuple(row) for row in payload['rows']],
+                                      names=payload['index'])
+    return pd.DataFrame(payload['values'], index=index, columns=payload['fields'])
+
+
+def combine_metrics(tables):
+    """Suma tablas de varios partidos por etiqueta; añade 'matches' (partidos con la etiqueta)"""
+    import pandas as pd
+
+    tables = [table for table in tables if len(table)]
+    if not tables:
+        return pd.DataFrame(columns=['matches', *METRIC_FIELDS])
+    stacked = pd.concat(tables)
+    combined = stacked.groupby(level=list(range(stacked.index.nlevels)), sort=False).sum()
+    combined.insert(0, 'matches', stacked.groupby(
+        level=list(range(stacked.index.nlevels)), sort=False).size())
+    for field in COUNT_FIELDS:
+        combined[field] = combined[field].astype('int64')
+    return combined
+
+
+def rank(table, metric, top=None):
+    """Filas ordenadas de mayor a menor metric (empates por etiqueta)"""
+    ranked = table.sort_index().sort_values(metric, ascending=False, kind='stable')
+    return ranked if top is None else ranked.head(top)
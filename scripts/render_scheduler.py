@@ -0,0 +1,190 @@
+"""
+Planificador de render con presupuesto de tiempo
+Estima el coste de cada artefacto (nº de acciones y DPI) y elige para cada uno
+un nivel de calidad (KDE completo, densidad por celdas, hexbin o puntos) de
+forma que todos los jugadores se dibujen antes del plazo.
+"""
+
+import time
+
+import numpy as np
+
+# Niveles de calidad, de mejor a más barato
+RENDER_TIERS = ('kde', 'binned', 'hexbin', 'scatter')
+
+# Fracción del DPI pedido con la que se guarda cada nivel: codificar el PNG es
+# la mayor parte del coste fijo, así que los niveles baratos usan menos píxeles
+# (y sin bbox_inches='tight', que obliga a dibujar la figura dos veces)
+TIER_DPI = {'kde': 1.0, 'binned': 0.7, 'hexbin': 0.6, 'scatter': 0.5}
+
+# Coste estimado en ms con 100 DPI pedidos (cada nivel a su TIER_DPI): fijo por
+# figura (dibujo + PNG) + por acción. Medido en generate_heatmap.py.
+TIER_COSTS = {
+    'kde': {'base': 95.0, 'per_action': 0.0075},
+    'binned': {'base': 50.0, 'per_action': 0.001},
+    'hexbin': {'base': 40.0, 'per_action': 0.0003},
+    'scatter': {'base': 30.0, 'per_action': 0.016},
+}
+
+# Celdas por eje del nivel 'binned' y del hexbin
+BINNED_SIZE = 25
+HEXBIN_GRIDSIZE = 15
+
+
+def tier_dpi(tier, dpi=100):
+    """DPI con el que se guarda un artefacto de ese nivel"""
+    return max(int(round(dpi * TIER_DPI.get(tier, 1.0))), 1)
+
+
+def estimate_cost(tier, n_actions, dpi=100):
+    """Coste estimado en segundos de dibujar y codificar un artefacto"""
+    cost = TIER_COSTS[tier]
+    # El rasterizado y la codificación crecen con el nº de píxeles (DPI²)
+    return (cost['base'] * (dpi / 100.0) ** 2 + cost['per_action'] * n_actions) / 1000.0
+
+
+def plan_tiers(artifacts, budget, dpi=100):
+    """Elige un nivel por artefacto para que el coste total quepa en el presupuesto
+
+    artifacts: lista de (nombre, nº de acciones). Empieza con todo en 'kde' y
+    degrada primero el artefacto cuyo siguiente nivel más barato ahorra más tiempo.
+    """
+    levels = {name: 0 for name, _ in artifacts}
+    counts = dict(artifacts)
+    if budget is None:
+        return {name: RENDER_TIERS[0] for name in levels}
+
+    def cheaper_level(name):
+        # Siguiente nivel de menor calidad que además ahorre tiempo
+        current = estimate_cost(RENDER_TIERS[levels[name]], counts[name], dpi)
+        for level in range(levels[name] + 1, len(RENDER_TIERS)):
+            cost = estimate_cost(RENDER_TIERS[level], counts[name], dpi)
+            if cost < current:
+                return level, current - cost
+        return None, 0.0
+
+    total = sum(estimate_cost(RENDER_TIERS[0], n, dpi) for n in counts.values())
+    while total > budget:
+        best, best_level, best_saving = None, None, 0.0
+        for name in levels:
+            level, saving = cheaper_level(name)
+            if level is not None and saving > best_saving:
+                best, best_level, best_saving = name, level, saving
+        if best is None:
+            # Ningún artefacto puede abaratarse más
+            break
+        levels[best] = best_level
+        total -= best_saving
+    return {name: RENDER_TIERS[level] for name, level in levels.items()}
+
+
+class RenderScheduler:
+    """Asigna niveles a medida que se renderiza, corrigiendo las estimaciones con lo medido"""
+
+    def __init__(self, artifacts, deadline=None, dpi=100, clock=time.perf_counter, tiers=None,
+                 started=None):
+        self.artifacts = list(artifacts)
+        # Plan ya decidido (p. ej. en otro proceso): se respeta tal cual
+        self.tiers = dict(tiers or {})
+        self.counts = dict(self.artifacts)
+        self.dpi = dpi
+        self.clock = clock
+        # El plazo cuenta desde el inicio de la petición (lectura y densidades incluidas)
+        self.started = clock() if started is None else started
+        self.deadline = None if deadline is None else self.started + deadline
+        self.done = set()
+        self.report = []
+        # True si algún artefacto se planificó por debajo del nivel completo
+        self.degraded = False
+        # Relación tiempo real / estimado observada hasta ahora
+        self._scale = 1.0
+
+    def remaining_budget(self):
+        if self.deadline is None:
+            return None
+        return max(self.deadline - self.clock(), 0.0)
+
+    def plan(self):
+        """Plan estático de todos los artefactos pendientes"""
+        pending = [(name, n) for name, n in self.artifacts if name not in self.done]
+        budget = self.remaining_budget()
+        if budget is not None:
+            budget = budget / self._scale
+        return plan_tiers(pending, budget, self.dpi)
+
+    def tier_for(self, name):
+        """Nivel para el siguiente artefacto, replanificando con el tiempo que queda"""
+        tier = self.tiers.get(name) or self.plan()[name]
+        if tier != RENDER_TIERS[0]:
+            self.degraded = True
+        return tier
+
+    def record(self, name, tier, elapsed):
+        """Registra la duración real de un artefacto y ajusta las estimaciones"""
+        estimated = estimate_cost(tier, self.counts.get(name, 0), self.dpi)
+        if estimated > 0:
+            # Media móvil para no sobrerreaccionar a un artefacto lento
+            self._scale = 0.7 * self._scale + 0.3 * (elapsed / estimated)
+        self.done.add(name)
+        self.report.append({
+            'artifact': name if isinstance(name, str) else ' / '.join(map(str, name)),
+            'actions': int(self.counts.get(name, 0)),
+            'tier': tier,
+            'estimated_ms': round(estimated * 1000, 1),
+            'elapsed_ms': round(elapsed * 1000, 1),
+        })
+
+    def record_batch(self, entries, elapsed):
+        """Reparte el tiempo de una figura con varios artefactos según su coste estimado
+
+        entries: lista de (nombre, nivel) dibujados en la misma figura.
+        """
+        estimates = [estimate_cost(tier, self.counts.get(name, 0), self.dpi) for name, tier in entries]
+        total = sum(estimates) or 1.0
+        for (name, tier), estimated in zip(entries, estimates):
+            self.record(name, tier, elapsed * estimated / total)
+
+    def summary(self):
+        """Niveles y tiempos por artefacto, para devolver al llamador"""
+        now = self.clock()
+        summary = {
+            'deadline_s': None if self.deadline is None else round(self.deadline - self.started, 3),
+            'elapsed_s': round(now - self.started, 3),
+            'degraded': self.degraded,
+            'artifacts': self.report,
+        }
+        if self.deadline is not None:
+            summary['deadline_met'] = now <= self.deadline
+        return summary
+
+
+def draw_tier(ax, tier, x, y, density=None, cmap='Reds', alpha=0.6, levels=10,
+              thresh=0.05, zorder=2, raster_dpi=None):
+    """Dibuja las acciones de un artefacto con el nivel indicado (KDE como imagen si hay raster_dpi)"""
+    from heatmap_density import PITCH_EXTENT, plot_density
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+
+    if tier == 'kde' and density is not None:
+        if plot_density(ax, density, cmap=cmap, alpha=alpha, levels=levels,
+                        thresh=thresh, zorder=zorder, raster_dpi=raster_dpi):
+            return 'kde'
+        tier = 'scatter'
+
+    if tier in ('kde', 'binned'):
+        edges = np.linspace(PITCH_EXTENT[0], PITCH_EXTENT[1], BINNED_SIZE + 1)
+        counts, _, _ = np.histogram2d(y, x, bins=[edges, edges])
+        ax.pcolormesh(edges, edges, np.ma.masked_equal(counts, 0), cmap=cmap,
+                      alpha=alpha, shading='flat', zorder=zorder)
+        return 'binned'
+
+    if tier == 'hexbin':
+        ax.hexbin(x, y, gridsize=HEXBIN_GRIDSIZE, extent=(*PITCH_EXTENT, *PITCH_EXTENT),
+                  cmap=cmap, alpha=alpha, mincnt=1, linewidths=0, zorder=zorder)
+        return 'hexbin'
+
+    ax.scatter(x, y, color='red', s=20, alpha=0.5, zorder=zorder)
+    return 'scatter'
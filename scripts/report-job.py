@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Trabajos de informe PDF fuera de la petición, con progreso y reanudación
+Uso:
+    python report-job.py submit <json_path> [--report heatmaps|match] [--job-id ID]
+                                [--output ruta.pdf] [--raster-dpi N] [--detach]
+    python report-job.py run <job_id> [--time-budget S]
+    python report-job.py status [<job_id>]
+
+submit crea el trabajo y, con --detach, lo lanza en segundo plano; run lo ejecuta
+(o lo reanuda desde la última página guardada); status escribe el estado en JSON.
+"""
+
+import argparse
+import json
+import sys
+
+from report_jobs import REPORTS, JobError, ReportJob, list_jobs
+from stage_timing import set_context
+
+
+def print_json(payload):
+    print(json.dumps(payload, ensure_ascii=False))
+
+
+def print_progress(status, key):
+    print(f"[{status['pages_done']}/{status['pages_total']}] {key}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trabajos de informe PDF reanudables")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit_parser = commands.add_parser('submit', help="crear un trabajo")
+    submit_parser.add_argument('json_path')
+    submit_parser.add_argument('--report', choices=sorted(REPORTS), default='heatmaps')
+    submit_parser.add_argument('--job-id', default=None)
+    submit_parser.add_argument('--output', default=None, dest='output_path',
+                               help="PDF de salida (por defecto, report.pdf en el directorio del trabajo)")
+    submit_parser.add_argument('--raster-dpi', type=int, default=None)
+    submit_parser.add_argument('--detach', action='store_true',
+                               help="ejecutarlo en segundo plano y volver en seguida")
+    submit_parser.add_argument('--time-budget', type=float, default=None)
+
+    run_parser = commands.add_parser('run', help="ejecutar o reanudar un trabajo")
+    run_parser.add_argument('job_id')
+    run_parser.add_argument('--time-budget', type=float, default=None,
+                            help="segundos; se detiene antes de la página que no quepa "
+                                 "y el trabajo queda reanudable")
+
+    status_parser = commands.add_parser('status', help="estado de un trabajo (o de todos)")
+    status_parser.add_argument('job_id', nargs='?')
+
+    args = parser.parse_args()
+    set_context(script='report-job')
+
+    try:
+        if args.command == 'status':
+            print_json(ReportJob(args.job_id).status() if args.job_id else list_jobs())
+            return 0
+
+        if args.command == 'submit':
+            job = ReportJob.submit(args.json_path, args.report, args.output_path,
+                                   args.raster_dpi, args.job_id)
+            if not args.detach:
+                print_json(job.status())
+                return 0
+            if job.status()['state'] not in ('done', 'running'):
+                job.start_background(args.time_budget)
+            print_json(job.status())
+            return 0
+
+        job = ReportJob(args.job_id)
+        status = job.run(args.time_budget, progress=print_progress)
+        print_json(status)
+        return 0 if status['state'] in ('done', 'interrupted') else 1
+    except JobError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
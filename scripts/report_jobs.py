@@ -0,0 +1,314 @@
+"""
+Trabajos de informe PDF reanudables
+Un trabajo renderiza el informe página a página fuera de la petición: cada
+página terminada se guarda como PDF en el directorio del trabajo (punto de
+control) y el progreso se escribe en status.json. Si el proceso se interrumpe,
+volver a ejecutar el trabajo continúa por la primera página sin guardar; al
+final se unen las páginas en el PDF de salida (necesita pypdf).
+
+    <REPORT_JOBS_DIR>/<job_id>/job.json      parámetros del trabajo
+                              status.json   estado y progreso
+                              pages/        una página (o grupo de páginas) por fichero
+                              runner.log    salida del proceso en segundo plano
+
+Los scripts de informe exponen job_pages(json_path, raster_dpi) ->
+([(clave, render() -> bytes)], metadatos) y, opcionalmente, job_done(json_path).
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+JOBS_VERSION = 1
+DEFAULT_JOBS_DIR = os.path.join(tempfile.gettempdir(), 'attack-metrics-report-jobs')
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Tipo de informe -> script que lo genera
+REPORTS = {
+    'heatmaps': 'generate-heatmap-report.py',
+    'match': 'generate-report.py',
+}
+
+JOB_FILE = 'job.json'
+STATUS_FILE = 'status.json'
+PAGES_DIR = 'pages'
+LOG_FILE = 'runner.log'
+LOCK_FILE = 'runner.pid'
+DEFAULT_OUTPUT = 'report.pdf'
+
+JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class JobError(Exception):
+    """Trabajo inexistente, inválido o ya en ejecución"""
+
+
+class _Interrupted(Exception):
+    """SIGTERM durante la ejecución"""
+
+
+def _raise_interrupt(signum, frame):
+    raise _Interrupted()
+
+
+def jobs_dir():
+    """Directorio de los trabajos (REPORT_JOBS_DIR)"""
+    return os.environ.get('REPORT_JOBS_DIR', DEFAULT_JOBS_DIR)
+
+
+def new_job_id():
+    return datetime.now().strftime('%Y%m%d-%H%M%S-') + os.urandom(3).hex()
+
+
+def _write_json_atomic(path, payload):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def load_report_module(report):
+    """Importa el script de un tipo de informe (nombre con guiones, se carga por ruta)"""
+    file_name = REPORTS[report]
+    module_name = os.path.splitext(file_name)[0].replace('-', '_')
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(module_name,
+                                                      os.path.join(SCRIPTS_DIR, file_name))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[module_name]
+
+
+class ReportJob:
+    """Un trabajo en disco: parámetros, estado y páginas guardadas
+
+    Estados: queued -> running -> done | failed | interrupted; salvo done, volver a
+    ejecutarlo continúa desde las páginas ya guardadas.
+    """
+
+    def __init__(self, job_id, root=None):
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            raise JobError(f"Identificador de trabajo no válido: {job_id!r}")
+        self.job_id = job_id
+        self.path = os.path.join(root or jobs_dir(), job_id)
+        self.pages_dir = os.path.join(self.path, PAGES_DIR)
+
+    @classmethod
+    def submit(cls, json_path, report='heatmaps', output_path=None, raster_dpi=None,
+               job_id=None, root=None):
+        """Crea el trabajo (o devuelve el existente si los parámetros coinciden)"""
+        if report not in REPORTS:
+            raise JobError(f"Tipo de informe desconocido: {report}")
+        job = cls(job_id or new_job_id(), root)
+        params = {
+            'report': report,
+            'json_path': os.path.abspath(json_path),
+            'output_path': os.path.abspath(output_path or os.path.join(job.path, DEFAULT_OUTPUT)),
+            'raster_dpi': raster_dpi,
+        }
+        if job.exists():
+            existing = job.params()
+            if any(existing.get(key) != value for key, value in params.items()):
+                raise JobError(f"El trabajo {job.job_id} ya existe con otros parámetros")
+            return job
+        os.makedirs(job.pages_dir, exist_ok=True)
+        _write_json_atomic(os.path.join(job.path, JOB_FILE), {
+            'version': JOBS_VERSION,
+            'job_id': job.job_id,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            **params,
+        })
+        job._write_status(state='queued', pages_total=None, pages_done=0)
+        return job
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, JOB_FILE))
+
+    def params(self):
+        try:
+            return _read_json(os.path.join(self.path, JOB_FILE))
+        except FileNotFoundError:
+            raise JobError(f"No existe el trabajo {self.job_id}") from None
+
+    def status(self):
+        """Estado actual; un trabajo 'running' cuyo proceso ya no existe pasa a 'interrupted'"""
+        try:
+            status = _read_json(os.path.join(self.path, STATUS_FILE))
+        except FileNotFoundError:
+            raise JobError(f"No existe el trabajo {self.job_id}") from None
+        if status['state'] == 'running' and not _pid_alive(status.get('pid')):
+            status['state'] = 'interrupted'
+        return status
+
+    def _write_status(self, **fields):
+        path = os.path.join(self.path, STATUS_FILE)
+        status = _read_json(path) if os.path.exists(path) else {'job_id': self.job_id}
+        status.update(fields)
+        status['updated'] = datetime.now().isoformat(timespec='seconds')
+        _write_json_atomic(path, status)
+        return status
+
+    def _page_path(self, index, key):
+        return os.path.join(self.pages_dir, f"{index:03d}-{key}.pdf")
+
+    def _reset_pages(self):
+        for name in os.listdir(self.pages_dir):
+            os.remove(os.path.join(self.pages_dir, name))
+
+    def _lock(self):
+        """Marca el trabajo como propio; falla si otro proceso vivo lo está ejecutando"""
+        lock_path = os.path.join(self.path, LOCK_FILE)
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    with open(lock_path) as f:
+                        pid = int(f.read().strip() or 0)
+                except (OSError, ValueError):
+                    pid = 0
+                if _pid_alive(pid) and pid != os.getpid():
+                    raise JobError(f"El trabajo {self.job_id} ya se está ejecutando (pid {pid})")
+                # Proceso caído: el bloqueo está abandonado
+                try:
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            return lock_path
+
+    def run(self, time_budget=None, progress=None):
+        """Renderiza las páginas pendientes y une el informe; devuelve el estado final
+
+        time_budget (segundos) detiene el trabajo antes de empezar una página que no
+        cabría, dejándolo en 'interrupted' para reanudarlo en otra ejecución.
+        """
+        params = self.params()
+        if self.status()['state'] == 'done' and os.path.exists(params['output_path']):
+            return self.status()
+        if not load_report_module('heatmaps').parallel_available():
+            raise JobError("Los trabajos necesitan pypdf para unir las páginas")
+
+        lock_path = self._lock()
+        started = time.perf_counter()
+        # SIGTERM (p. ej. un timeout) cierra el trabajo como interrumpido
+        previous_handler = signal.signal(signal.SIGTERM, _raise_interrupt)
+        try:
+            # Los puntos de control solo valen para el mismo fichero de entrada
+            input_hash = _file_sha256(params['json_path'])
+            if self.status().get('input_sha256') != input_hash:
+                self._reset_pages()
+            self._write_status(state='running', pid=os.getpid(), error=None,
+                               input_sha256=input_hash)
+
+            module = load_report_module(params['report'])
+            pages, metadata = module.job_pages(params['json_path'], params['raster_dpi'])
+            paths = [self._page_path(i, key) for i, (key, _) in enumerate(pages)]
+            done = sum(os.path.exists(path) for path in paths)
+            self._write_status(pages_total=len(pages), pages_done=done, current=None)
+
+            page_times = []
+            for (key, render), path in zip(pages, paths):
+                if os.path.exists(path):
+                    continue
+                elapsed = time.perf_counter() - started
+                expected = max(page_times) if page_times else 0.0
+                if time_budget is not None and page_times and elapsed + expected > time_budget:
+                    return self._write_status(state='interrupted', pid=None, current=None)
+
+                self._write_status(current=key)
+                page_started = time.perf_counter()
+                page_bytes = render()
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(page_bytes)
+                os.replace(tmp, path)
+                page_times.append(time.perf_counter() - page_started)
+                done += 1
+                status = self._write_status(pages_done=done, current=None)
+                if progress:
+                    progress(status, key)
+
+            self._merge(paths, params['output_path'], metadata)
+            if hasattr(module, 'job_done'):
+                module.job_done(params['json_path'])
+            return self._write_status(state='done', pid=None, current=None,
+                                      output=params['output_path'],
+                                      bytes=os.path.getsize(params['output_path']))
+        except (KeyboardInterrupt, _Interrupted):
+            return self._write_status(state='interrupted', pid=None, current=None)
+        except Exception as e:
+            self._write_status(state='failed', pid=None, current=None, error=str(e))
+            raise
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+            os.remove(lock_path)
+
+    def _merge(self, paths, output_path, metadata):
+        merge_pdf_pages = load_report_module('heatmaps').merge_pdf_pages
+        pages = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        merge_pdf_pages(pages, output_path, metadata)
+
+    def start_background(self, time_budget=None):
+        """Lanza el trabajo en un proceso independiente (sobrevive a la petición)"""
+        command = [sys.executable, os.path.join(SCRIPTS_DIR, 'report-job.py'), 'run', self.job_id]
+        if time_budget is not None:
+            command += ['--time-budget', str(time_budget)]
+        env = dict(os.environ, REPORT_JOBS_DIR=os.path.dirname(self.path))
+        with open(os.path.join(self.path, LOG_FILE), 'ab') as log:
+            process = subprocess.Popen(command, stdout=log, stderr=log, stdin=subprocess.DEVNULL,
+                                       env=env, cwd=SCRIPTS_DIR, start_new_session=True)
+        return process.pid
+
+
+def list_jobs(root=None):
+    """Estado de todos los trabajos, más recientes primero"""
+    root = root or jobs_dir()
+    if not os.path.isdir(root):
+        return []
+    jobs = []
+    for name in os.listdir(root):
+        job = ReportJob(name, root) if JOB_ID_PATTERN.match(name) else None
+        if job is not None and job.exists():
+            jobs.append(job.status())
+    return sorted(jobs, key=lambda status: status.get('updated', ''), reverse=True)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Mapas de calor de temporada para Attack Metrics
+Añade partidos al almacén de temporada y dibuja el mapa de un equipo o jugador
+(temporada completa, últimos N partidos, en casa o fuera, un partido o una
+parte) sumando las rejillas guardadas de cada partido. Redibujar con otra
+paleta no vuelve a leer el JSON ni a calcular la densidad. Los rankings de
+xT, xG, xGChain o xGBuildup y las redes de pases suman las tablas y matrices
+guardadas de cada partido. Tras cambiar la versión del almacén, 'rebuild' vuelve
+a procesar los partidos indexados desde sus ficheros originales.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+from csv_ingest import iter_archive
+from possession_metrics import METRIC_FIELDS
+from season_store import SeasonStore, parse_match_filename, store_dir
+
+
+def match_files(paths, exclude=None):
+    """Ficheros de partido; un directorio aporta sus exports AttackMetrics_*_vs_*_AAAAMMDD.json
+    y sus CSV de AnalistaPro (recursivo), sin nada de dentro de exclude (el propio almacén)
+    """
+    exclude = os.path.abspath(exclude) if exclude else None
+
+    def excluded(found):
+        return exclude is not None and \
+            os.path.commonpath([exclude, os.path.abspath(found)]) == exclude
+
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        found = [os.path.join(directory, name)
+                 for directory, _, files in os.walk(path) for name in files
+                 if name.endswith('.json') and parse_match_filename(name) is not None]
+        found += [csv_path for csv_path, _ in iter_archive(path, 'analista')]
+        yield from sorted(found_path for found_path in found if not excluded(found_path))
+
+
+def add_matches(store, json_paths):
+    """Procesa cada export (uno a uno) y guarda sus rejillas; un fichero con error no para el resto"""
+    failed = 0
+    for json_path in match_files(json_paths, exclude=store.root):
+        try:
+            entry = store.add_match(json_path)
+        except (OSError, ValueError, KeyError) as e:
+            failed += 1
+            print(f"[ERROR] {json_path}: {e}", file=sys.stderr)
+            continue
+        teams = ', '.join(f"{name} ({team['venue']})" for name, team in entry['teams'].items())
+        print(f"[OK] {entry['match_id']}: {teams}")
+    return not failed
+
+
+def rebuild_store(store, everything=False):
+    """Vuelve a procesar los partidos de versiones anteriores del almacén"""
+    done, failed = store.rebuild(everything)
+    for entry in done:
+        print(f"[OK] {entry['match_id']}")
+    for match_id, error in failed:
+        print(f"[ERROR] {match_id}: {error}", file=sys.stderr)
+    print(f"{len(done)} partidos reprocesados, {len(failed)} con error")
+    return not failed
+
+
+def list_matches(store, team=None):
+    """Lista los partidos del almacén"""
+    for entry in store.matches(team):
+        print(f"{entry['date']}  {entry['home']} vs {entry['away']}  ({entry['match_id']})")
+
+
+def print_ranking(store, metric, team=None, venue=None, last_n=None, top=10, as_json=False):
+    """Ranking de jugadores por una métrica de posesión acumulada"""
+    from possession_metrics import metrics_records
+
+    ranking = store.ranking(metric, team, venue, last_n, top)
+    if as_json:
+        print(json.dumps(metrics_records(ranking), ensure_ascii=False))
+        return
+    for position, ((team_name, player), row) in enumerate(ranking.iterrows(), 1):
+        print(f"{position:3d}. {player} ({team_name})  {metric} {row[metric]:.3f}  "
+              f"[{int(row['matches'])} partidos, {int(row['actions'])} acciones]")
+
+
+def render_network(store, team, output_path=None, venue=None, last_n=None, period=None,
+                   min_passes=2):
+    """Red de pases acumulada: JSON por la salida estándar o imagen en output_path"""
+    network, n_matches = store.pass_network(team, venue, last_n, period)
+    if network.total == 0:
+        print(f"Error: no hay pases de {team} con esos filtros")
+        return False
+    if output_path is None:
+        print(json.dumps(dict(network.to_json(min_passes), team=team.upper(), matches=n_matches),
+                         ensure_ascii=False))
+        return True
+
+    import matplotlib
+    matplotlib.use('Agg')  # Backend sin GUI
+    import matplotlib.pyplot as plt
+    from pass_network import draw_network
+    from pitch_layer import stamp_pitch
+
+    fig, ax = plt.subplots(figsize=(14, 10))
+    ax.set_xlim(-2, 102)
+    ax.set_ylim(-2, 102)
+    stamp_pitch(ax, 'standard', line_color='black', zorder=10, spot_zorder=11)
+    ax.axis('off')
+    # Mismo eje Y que los mapas de calor
+    draw_network(ax, network, min_passes=min_passes, flip_y=True)
+    ax.set_title(f"Red de Pases - {team.upper()} ({n_matches} partidos, {network.total} pases)",
+                 fontsize=18, fontweight='bold', pad=15)
+    plt.tight_layout()
+    fig.savefig(output_path, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+    print(f"[OK] Red de pases de temporada generada: {output_path}")
+    return True
+
+
+def render_heatmap(store, team, output_path, player=None, venue=None, last_n=None,
+                   period=None, match_ids=None, cmap='Reds'):
+    """Dibuja la densidad acumulada en un PNG o PDF"""
+    import matplotlib
+    matplotlib.use('Agg')  # Backend sin GUI
+    import matplotlib.pyplot as plt
+    from heatmap_density import plot_density
+    from pitch_layer import stamp_pitch
+
+    _, moments, n_matches = store.grids(team, player, venue, last_n, period, match_ids)
+    density = store.density(team, player, venue, last_n, period, match_ids)
+    if density is None:
+        print(f"Error: no hay acciones para {player or team} con esos filtros")
+        return False
+
+    fig, ax = plt.subplots(figsize=(14, 10))
+    ax.set_xlim(-2, 102)
+    ax.set_ylim(-2, 102)
+    stamp_pitch(ax, 'standard', line_color='black', zorder=10, spot_zorder=11)
+    ax.axis('off')
+    plot_density(ax, density, cmap=cmap, alpha=0.6, levels=15, thresh=0.05, zorder=2)
+
+    scope = {'home': 'en casa', 'away': 'fuera'}.get(venue, 'temporada')
+    if last_n:
+        scope += f', últimos {last_n}'
+    if period:
+        scope += f', {period}'
+    ax.set_title(f"Mapa de Calor - {player or team.upper()} ({scope}: {n_matches} partidos, "
+                 f"{int(moments[0])} acciones)", fontsize=18, fontweight='bold', pad=15)
+
+    plt.tight_layout()
+    fig.savefig(output_path, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+    print(f"[OK] Mapa de temporada generado: {output_path}")
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mapas de calor de temporada")
+    parser.add_argument('--store', default=store_dir(),
+                        help="directorio del almacén (por defecto SEASON_STORE_DIR)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = commands.add_parser('add', help="añadir partidos al almacén")
+    add_parser.add_argument('json_paths', nargs='+',
+                            help="JSON, CSV de AnalistaPro o directorios (p. ej. una carpeta por temporada)")
+
+    rebuild_parser = commands.add_parser(
+        'rebuild', help="reprocesar los partidos de una versión anterior del almacén")
+    rebuild_parser.add_argument('--all', action='store_true', dest='everything',
+                                help="reprocesar también los partidos ya indexados")
+
+    list_parser = commands.add_parser('list', help="listar partidos")
+    list_parser.add_argument('--team')
+
+    rank_parser = commands.add_parser('rank', help="ranking de jugadores por xT, xG, xGChain...")
+    rank_parser.add_argument('metric', choices=METRIC_FIELDS)
+    rank_parser.add_argument('--team')
+    rank_parser.add_argument('--venue', choices=('home', 'away'))
+    rank_parser.add_argument('--last', type=int, dest='last_n')
+    rank_parser.add_argument('--top', type=int, default=10)
+    rank_parser.add_argument('--json', action='store_true', help="salida en JSON")
+
+    network_parser = commands.add_parser('network', help="red de pases acumulada (JSON o imagen)")
+    network_parser.add_argument('team')
+    network_parser.add_argument('output_path', nargs='?', help="PNG/PDF; sin él, JSON")
+    network_parser.add_argument('--venue', choices=('home', 'away'))
+    network_parser.add_argument('--last', type=int, dest='last_n')
+    network_parser.add_argument('--period', help="solo esta parte (1T, 2T...)")
+    network_parser.add_argument('--min-passes', type=int, default=2)
+
+    render_parser = commands.add_parser('render', help="dibujar un mapa de temporada")
+    render_parser.add_argument('team')
+    render_parser.add_argument('output_path')
+    render_parser.add_argument('--player')
+    render_parser.add_argument('--venue', choices=('home', 'away'))
+    render_parser.add_argument('--last', type=int, dest='last_n',
+                               help="solo los últimos N partidos")
+    render_parser.add_argument('--match', action='append', dest='match_ids',
+                               help="solo este partido (se puede repetir)")
+    render_parser.add_argument('--period', help="solo esta parte (1T, 2T...)")
+    render_parser.add_argument('--cmap', default='Reds', help="paleta de matplotlib")
+
+    args = parser.parse_args()
+    if not args.store:
+        parser.error("indica --store o define SEASON_STORE_DIR")
+
+    store = SeasonStore(args.store)
+    success = True
+    if args.command == 'add':
+        success = add_matches(store, args.json_paths)
+    elif args.command == 'rebuild':
+        success = rebuild_store(store, args.everything)
+    elif args.command == 'list':
+        list_matches(store, args.team)
+    elif args.command == 'network':
+        success = render_network(store, args.team, args.output_path, args.venue, args.last_n,
+                                 args.period, args.min_passes)
+    elif args.command == 'rank':
+        print_ranking(store, args.metric, args.team, args.venue, args.last_n, args.top, args.json)
+    else:
+        success = render_heatmap(store, args.team, args.output_path,
+                                 args.player, args.venue, args.last_n,
+                                 args.period, args.match_ids, args.cmap)
+    sys.exit(0 if success else 1)
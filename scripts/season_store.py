@@ -0,0 +1,356 @@
+"""
+Almacén de temporada con las rejillas de conteo de cada partido
+Cada export AttackMetrics_<LOCAL>_vs_<VISITANTE>_<AAAAMMDD>.json se procesa una
+vez y se guarda como archivo de rejillas (grid_archive): conteos, densidades y
+momentos del equipo y de cada jugador, por partido y por parte. Los mapas de
+temporada, últimos N partidos o casa/fuera se obtienen sumando rejillas
+guardadas y suavizando una sola vez; las métricas de posesión y las redes de
+pases, sumando las tablas y matrices guardadas de cada partido.
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+INDEX_FILE = 'index.json'
+# Bloqueo del índice entre procesos (p. ej. batch-reports.py --workers)
+INDEX_LOCK_FILE = 'index.lock'
+INDEX_LOCK_TIMEOUT_SECONDS = 60
+STORE_VERSION = 5
+
+MATCH_FILE_RE = re.compile(r'^AttackMetrics_(?P<home>.+?)_vs_(?P<away>.+)_(?P<date>\d{8})$')
+
+# Lado del JSON -> condición del equipo en el partido
+VENUES = {'HOME': 'home', 'AWAY': 'away'}
+
+
+def store_dir():
+    """Directorio del almacén (SEASON_STORE_DIR) o None si no está configurado"""
+    return os.environ.get('SEASON_STORE_DIR') or None
+
+
+def parse_match_filename(path):
+    """Local, visitante y fecha (AAAA-MM-DD) del nombre de un export; None si no sigue el patrón"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = MATCH_FILE_RE.match(stem)
+    if not match:
+        return None
+    date = match.group('date')
+    return {
+        'match_id': stem,
+        'home': match.group('home').replace('_', ' '),
+        'away': match.group('away').replace('_', ' '),
+        'date': f'{date[:4]}-{date[4:6]}-{date[6:]}',
+    }
+
+
+def match_info(path, config):
+    """Identidad del partido: nombre del fichero o, si no sigue el patrón, la configuración"""
+    info = parse_match_filename(path)
+    if info is None:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        info = {
+            'match_id': stem,
+            'home': config.get('homeName') or config.get('homeTeam') or 'LOCAL',
+            'away': config.get('awayName') or config.get('awayTeam') or 'VISITANTE',
+            'date': config.get('date', ''),
+        }
+    info['home'] = info['home'].upper()
+    info['away'] = info['away'].upper()
+    return info
+
+
+def team_key(name):
+    return str(name).strip().upper()
+
+
+def _write_json_atomic(path, payload):
+    fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path))
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _file_lock(path, timeout=INDEX_LOCK_TIMEOUT_SECONDS):
+    """Bloqueo exclusivo con un fichero O_EXCL que guarda el pid (se libera al salir)"""
+    waited = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                with open(path) as f:
+                    pid = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                # Recién creado, aún sin pid: el dueño está escribiéndolo
+                pid = None
+            if pid is not None and not _pid_alive(pid):
+                # Proceso caído: el bloqueo está abandonado
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            if time.monotonic() > waited:
+                raise TimeoutError(f"{path}: bloqueado por el proceso {pid}")
+            time.sleep(0.02)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        yield
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def write_match_metrics(prefix, frame, teams):
+    """Tabla de métricas de posesión del partido por (equipo, jugador), con el nombre del equipo"""
+    from possession_metrics import METRICS_SUFFIX, metrics_table, write_metrics
+
+    table = metrics_table(frame[frame['team'].isin(list(teams))])
+    table.index = table.index.set_levels(
+        [team_key(teams.get(side, side)) for side in table.index.levels[0]], level=0)
+    write_metrics(prefix + METRICS_SUFFIX, table)
+
+
+def write_match_networks(prefix, frame):
+    """Redes de pases de cada lado, del partido y de cada parte ('HOME', 'HOME|1T'...)"""
+    from match_frame import select_team
+    from pass_network import NETWORK_SUFFIX, match_network, period_networks, save_networks
+
+    networks = {}
+    for side in VENUES:
+        team_df = select_team(frame, side)
+        if team_df.empty:
+            continue
+        networks[side] = match_network(team_df)
+        for period, network in period_networks(team_df).items():
+            networks[f'{side}|{period}'] = network
+    save_networks(prefix + NETWORK_SUFFIX, networks)
+
+
+class SeasonStore:
+    """Rejillas por partido en disco y consultas que las suman"""
+
+    def __init__(self, root):
+        self.root = root
+        self.matches_dir = os.path.join(root, 'matches')
+        os.makedirs(self.matches_dir, exist_ok=True)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.lock_path = os.path.join(root, INDEX_LOCK_FILE)
+        self.index = self._load_index()
+        if self.index.get('stale'):
+            print(f"[AVISO] {root}: {len(self.index['stale'])} partidos de una versión anterior "
+                  f"del almacén sin indexar; ejecuta 'season-heatmap.py rebuild'", file=sys.stderr)
+
+    def _load_index(self):
+        """Índice del almacén; uno de otra versión deja sus partidos en 'stale' para rebuild()"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {'version': STORE_VERSION, 'matches': {}}
+        if index.get('version') != STORE_VERSION:
+            # Los ficheros guardados no sirven, pero 'source' permite volver a procesarlos
+            stale = dict(index.get('stale', {}))
+            stale.update(index.get('matches', {}))
+            index = {'version': STORE_VERSION, 'matches': {}, 'stale': stale}
+        return index
+
+    def add_match(self, json_path, data=None):
+        """Procesa un partido (JSON o CSV) y archiva sus rejillas (sustituye la entrada si ya estaba)"""
+        from csv_ingest import is_csv, load_csv_table
+        from grid_archive import write_match_archive
+        from match_frame import match_frame
+        from possession_metrics import assign_possessions
+        from xg_model import fill_xg
+
+        if data is None and is_csv(json_path):
+            # CSV: la tabla tipada se lee directamente, sin pasar por acciones
+            config, frame = load_csv_table(json_path)
+        else:
+            if data is None:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            config, frame = data.get('config', {}), match_frame(data.get('actions', []))
+        info = match_info(json_path, config)
+
+        # Posesiones con el partido completo (métricas y redes de pases)
+        assign_possessions(frame)
+        # xG del modelo donde el export no lo trae
+        fill_xg(frame)
+
+        # Escritura atómica: primero el archivo del partido, después el índice
+        prefix = os.path.join(self.matches_dir, info['match_id'])
+        archive = write_match_archive(prefix, frame,
+                                      {side: info[venue] for side, venue in VENUES.items()})
+        write_match_metrics(prefix, frame, {side: info[venue] for side, venue in VENUES.items()})
+        write_match_networks(prefix, frame)
+        teams = {}
+        for row in archive['rows']:
+            if row['period'] is not None:
+                continue
+            team = teams.setdefault(row['team'], {'venue': VENUES[row['side']], 'players': []})
+            if row['player'] is None:
+                team['actions'] = row['actions']
+            else:
+                team['players'].append(row['player'])
+
+        entry = dict(info, file=info['match_id'], source=os.path.abspath(json_path), teams=teams)
+        # Otros procesos pueden haber añadido partidos desde que se leyó el índice:
+        # se vuelve a leer y se fusiona bajo el bloqueo, justo antes de escribirlo
+        with _file_lock(self.lock_path):
+            self.index = self._load_index()
+            self.index['matches'][info['match_id']] = entry
+            self.index.get('stale', {}).pop(info['match_id'], None)
+            _write_json_atomic(self.index_path, self.index)
+        return entry
+
+    def rebuild(self, everything=False):
+        """Vuelve a procesar desde su 'source' los partidos de versiones anteriores
+
+        Con everything también los ya indexados. Devuelve (procesados, [(partido, error)]).
+        """
+        entries = dict(self.index.get('stale', {}))
+        if everything:
+            entries.update(self.index['matches'])
+        done, failed = [], []
+        for match_id, entry in sorted(entries.items()):
+            source = entry.get('source')
+            try:
+                if not source or not os.path.exists(source):
+                    raise FileNotFoundError(f"no existe el fichero original {source}")
+                done.append(self.add_match(source))
+            except (OSError, ValueError, KeyError) as e:
+                failed.append((match_id, str(e)))
+        return done, failed
+
+    def archive(self, match_id):
+        """Archivo de rejillas de un partido (lectura con memmap)"""
+        from grid_archive import MatchArchive
+
+        return MatchArchive(os.path.join(self.matches_dir, self.index['matches'][match_id]['file']))
+
+    def matches(self, team=None, venue=None, last_n=None, match_ids=None):
+        """Partidos (del equipo, en casa o fuera) ordenados por fecha; last_n = los más recientes"""
+        entries = sorted(self.index['matches'].values(), key=lambda e: (e['date'], e['match_id']))
+        if match_ids is not None:
+            entries = [e for e in entries if e['match_id'] in match_ids]
+        if team is not None:
+            team = team_key(team)
+            entries = [e for e in entries if team in e['teams']]
+            if venue is not None:
+                entries = [e for e in entries if e['teams'][team]['venue'] == venue]
+        if last_n:
+            entries = entries[-last_n:]
+        return entries
+
+    def teams(self):
+        """Equipos con al menos un partido en el almacén"""
+        return sorted({team for e in self.index['matches'].values() for team in e['teams']})
+
+    def players(self, team, venue=None, last_n=None):
+        """Jugadores del equipo y nº de acciones acumuladas, de más a menos"""
+        totals = {}
+        for _, archive in self._team_archives(team, venue, last_n):
+            for player in archive.players(team_key(team)):
+                totals[player] = totals.get(player, 0) + archive.row(team_key(team), player)['actions']
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def _team_archives(self, team, venue=None, last_n=None, match_ids=None):
+        for entry in self.matches(team, venue, last_n, match_ids):
+            yield entry, self.archive(entry['match_id'])
+
+    def grids(self, team, player=None, venue=None, last_n=None, period=None, match_ids=None):
+        """Rejilla de conteos y momentos sumados del equipo (o de un jugador) y nº de partidos
+
+        period limita a una parte ('1T', '2T'...) y match_ids a unos partidos concretos.
+        """
+        import numpy as np
+
+        team = team_key(team)
+        total_counts = None
+        total_moments = np.zeros(5)
+        n_matches = 0
+        for _, archive in self._team_archives(team, venue, last_n, match_ids):
+            if archive.row(team, player, period) is None:
+                continue
+            counts = archive.counts(team, player, period)
+            total_counts = counts.astype(np.float64) if total_counts is None \
+                else total_counts + counts
+            total_moments += archive.moments(team, player, period)
+            n_matches += 1
+        return total_counts, total_moments, n_matches
+
+    def metrics(self, team=None, venue=None, last_n=None, match_ids=None):
+        """Métricas de posesión (xT, xG, xGChain...) por (equipo, jugador) sumadas en los partidos"""
+        from possession_metrics import METRICS_SUFFIX, combine_metrics, read_metrics
+
+        tables = []
+        for entry in self.matches(team, venue, last_n, match_ids):
+            table = read_metrics(os.path.join(self.matches_dir, entry['file'] + METRICS_SUFFIX))
+            if team is not None:
+                table = table[table.index.get_level_values(0) == team_key(team)]
+            tables.append(table)
+        return combine_metrics(tables)
+
+    def pass_network(self, team, venue=None, last_n=None, period=None, match_ids=None):
+        """Red de pases del equipo sumando las matrices guardadas de cada partido y nº de partidos"""
+        from pass_network import NETWORK_SUFFIX, load_networks, merge_networks
+
+        networks = []
+        for entry in self.matches(team, venue, last_n, match_ids):
+            side = 'HOME' if entry['teams'][team_key(team)]['venue'] == 'home' else 'AWAY'
+            stored = load_networks(os.path.join(self.matches_dir, entry['file'] + NETWORK_SUFFIX))
+            network = stored.get(side if period is None else f'{side}|{period}')
+            if network is not None:
+                networks.append(network)
+        return merge_networks(networks), len(networks)
+
+    def ranking(self, metric, team=None, venue=None, last_n=None, top=10):
+        """Jugadores con más metric (p. ej. 'xg_chain') en los partidos seleccionados"""
+        from possession_metrics import rank
+
+        return rank(self.metrics(team, venue, last_n), metric, top)
+
+    def density(self, team, player=None, venue=None, last_n=None, period=None, match_ids=None):
+        """Densidad suavizada una sola vez sobre las rejillas sumadas (None si no hay acciones)
+
+        Con un solo partido se lee la densidad ya archivada, sin volver a suavizar.
+        """
+        import numpy as np
+        from heatmap_density import scott_bandwidth, smooth_counts
+
+        entries = self.matches(team, venue, last_n, match_ids)
+        if len(entries) == 1:
+            archive = self.archive(entries[0]['match_id'])
+            row = archive.row(team_key(team), player, period)
+            if row is None or row['actions'] == 0:
+                return None
+            return np.asarray(archive.density(team_key(team), player, period), dtype=np.float64)
+
+        counts, moments, _ = self.grids(team, player, venue, last_n, period, match_ids)
+        if counts is None or moments[0] == 0:
+            return None
+        sigma_x, sigma_y = scott_bandwidth(moments[None], counts.shape[-1])
+        return smooth_counts(counts, sigma_x[0], sigma_y[0])
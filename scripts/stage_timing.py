@@ -0,0 +1,100 @@
+"""
+Instrumentación opcional por etapas (HEATMAP_STAGE_TIMING=1)
+Cada etapa (carga del JSON, DataFrame, filtrado, densidad, dibujo, savefig,
+base64, escritura del PDF) escribe en stderr una línea JSON con su tiempo real
+y de CPU, filas y bytes del artefacto:
+
+    {"event": "stage_timing", "stage": "density", "wall_ms": 3.1, "cpu_ms": 3.0, "rows": 1520, ...}
+
+stdout no se toca (lleva el protocolo del worker y el NDJSON). Desactivada, una
+etapa solo cuesta la consulta de la variable de entorno.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+ENV_VAR = 'HEATMAP_STAGE_TIMING'
+EVENT = 'stage_timing'
+
+# Campos comunes a todas las líneas (script, id de petición, equipo...)
+_context = {}
+# Etapas abiertas, para indicar la etapa padre de las anidadas
+_open_stages = []
+
+
+def enabled():
+    return os.environ.get(ENV_VAR, '') not in ('', '0')
+
+
+def set_context(**fields):
+    """Añade (o con None quita) campos comunes a las líneas siguientes"""
+    for key, value in fields.items():
+        if value is None:
+            _context.pop(key, None)
+        else:
+            _context[key] = value
+
+
+def emit(stage_name, wall_s, cpu_s, parent=None, **fields):
+    """Escribe la línea JSON de una etapa ya medida"""
+    record = {'event': EVENT, 'stage': stage_name,
+              'wall_ms': round(wall_s * 1000, 2), 'cpu_ms': round(cpu_s * 1000, 2)}
+    if parent is not None:
+        record['parent'] = parent
+    record.update(_context)
+    record.update((key, value) for key, value in fields.items() if value is not None)
+    sys.stderr.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    sys.stderr.flush()
+
+
+@contextmanager
+def stage(name, **fields):
+    """Mide el bloque como etapa `name`; el dict devuelto admite rows, bytes... hasta el final"""
+    info = dict(fields)
+    if not enabled():
+        yield info
+        return
+    parent = _open_stages[-1] if _open_stages else None
+    _open_stages.append(name)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield info
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        _open_stages.pop()
+        emit(name, wall, cpu, parent, **info)
+
+
+class TimedPdfPages:
+    """Envuelve PdfPages: cada savefig se mide como etapa 'savefig' (bytes = crecimiento del PDF)"""
+
+    def __init__(self, pdf_pages, page=None):
+        self._pdf_pages = pdf_pages
+        self._page = page
+
+    def savefig(self, *args, **kwargs):
+        with stage('savefig', page=self._page) as info:
+            before = self._size()
+            result = self._pdf_pages.savefig(*args, **kwargs)
+            after = self._size()
+            if after is not None:
+                # Antes de la primera página el fichero aún no existe
+                info['bytes'] = after - (before or 0)
+        return result
+
+    def _size(self):
+        try:
+            return self._pdf_pages._file.fh.tell()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    def __getattr__(self, name):
+        return getattr(self._pdf_pages, name)
+
+
+def timed_pages(pdf_pages, page=None):
+    """pdf_pages con savefig medido si la instrumentación está activa"""
+    return TimedPdfPages(pdf_pages, page) if enabled() else pdf_pages
@@ -0,0 +1,20 @@
+"""
+Los scripts se importan entre sí por nombre (se ejecutan desde scripts/):
+los tests añaden scripts/ al path y exponen los CSV de ejemplo de public/.
+"""
+
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUBLIC_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), 'public')
+
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+@pytest.fixture
+def public_file():
+    """Ruta de un fichero de ejemplo de public/"""
+    return lambda name: os.path.join(PUBLIC_DIR, name)
@@ -0,0 +1,28 @@
+import importlib.util
+import os
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'batch-reports.py')
+spec = importlib.util.spec_from_file_location('batch_reports', SCRIPT)
+batch_reports = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(batch_reports)
+
+
+def test_directory_skips_derived_json(tmp_path):
+    for name in ('a.json', 'a.heatmaps.json', 'a.index.json', 'a.metrics.json', 'index.json'):
+        (tmp_path / name).write_text('{}')
+
+    entries = batch_reports.read_manifest(str(tmp_path))
+
+    assert entries == [(str(tmp_path / 'a.json'), None)]
+
+
+def test_skip_existing_needs_the_payload(tmp_path):
+    (tmp_path / 'a.json').write_text('{}')
+    (tmp_path / 'a.pdf').write_text('%PDF')
+    entry = batch_reports.plan_outputs([(str(tmp_path / 'a.json'), None)], str(tmp_path))[0]
+
+    assert batch_reports.is_up_to_date(entry)
+    assert not batch_reports.is_up_to_date(entry, payloads=True)
+    (tmp_path / 'a.heatmaps.json').write_text('{}')
+    assert batch_reports.is_up_to_date(entry, payloads=True)
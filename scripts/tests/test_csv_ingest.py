@@ -0,0 +1,110 @@
+import pytest
+
+from csv_ingest import (CsvSchemaError, csv_schema, detect_schema, iter_archive, load_csv_match,
+                        load_csv_table)
+from possession_metrics import metrics_table, possession_ids
+from xg_model import fill_xg
+
+SAMPLES = {
+    'test-analista-local.csv': ('analista', ','),
+    'test-analista-visitante.csv': ('analista', ','),
+    'test-datahub.csv': ('datahub', ';'),
+    'test-portero.csv': ('portero', ','),
+}
+
+
+@pytest.mark.parametrize('name', sorted(SAMPLES))
+def test_sample_exports_are_detected(public_file, name):
+    schema, delimiter, decimal, _ = detect_schema(public_file(name))
+
+    assert (schema, delimiter) == SAMPLES[name]
+    assert decimal == '.'
+    assert csv_schema(public_file(name)) == schema
+
+
+def test_unknown_header_is_rejected(tmp_path):
+    path = tmp_path / 'otro.csv'
+    path.write_text('Fecha,Rival,Resultado\n2025-01-01,X,1-0\n', encoding='utf-8')
+
+    with pytest.raises(CsvSchemaError):
+        detect_schema(str(path))
+    assert csv_schema(str(path)) is None
+
+
+def test_semicolon_export_with_decimal_comma(tmp_path):
+    path = tmp_path / 'datahub.csv'
+    path.write_text('Minuto;Segundo;Jugador;Equipo;Resultado;xG;xGOT\n'
+                    '2;25;MESSI;Propio;Gol;0,42;0,78\n', encoding='utf-8')
+    _, frame = load_csv_table(str(path))
+
+    assert detect_schema(str(path))[2] == ','
+    assert frame['xg'].iloc[0] == pytest.approx(0.42)
+
+
+def test_analista_clock_and_vocabulary(public_file):
+    config, frame = load_csv_table(public_file('test-analista-local.csv'))
+
+    assert config['source'] == 'analista'
+    assert len(frame) == 55
+    # Minutos decimales: 2.25 -> 135 s, 2.30 -> 138 s
+    assert frame['seconds'].tolist()[:2] == [135, 138]
+    # Conduce / Completo / Exitosa pasan al vocabulario del JSON
+    assert frame['type'].iloc[1] == 'Conducción'
+    assert set(frame['res'].iloc[:2]) == {'Completado'}
+    assert 'Conduce' not in frame['type'].cat.categories
+    assert frame['type'].value_counts()['Disparo'] == 11
+
+
+def test_datahub_clock_and_vocabulary(public_file):
+    config, frame = load_csv_table(public_file('test-datahub.csv'))
+
+    assert config['source'] == 'datahub'
+    # Minuto + Segundo: 2:25 -> 145 s
+    assert frame['seconds'].iloc[0] == 145
+    assert frame['team'].tolist()[:2] == ['HOME', 'AWAY']
+    assert set(frame['type']) == {'Disparo'}
+    assert 'Parada' in set(frame['res'])
+    assert 'Parado' not in frame['res'].cat.categories
+
+
+def test_portero_clock_and_columns(public_file):
+    _, frame = load_csv_table(public_file('test-portero.csv'))
+
+    # 'MM:SS': 8:36 -> 516 s
+    assert frame['seconds'].iloc[0] == 516
+    assert frame[['matchday', 'player', 'cat', 'zone', 'res']].iloc[0].tolist() == \
+        [1, 'TER STEGEN', 'Defensa', 'MC', 'OK']
+    assert set(frame['team']) == {'HOME'}
+
+
+def test_archive_filters_by_schema(public_file):
+    found = list(iter_archive(public_file(''), 'portero'))
+
+    assert [schema for _, schema in found] == ['portero']
+    assert found[0][0].endswith('test-portero.csv')
+
+
+def test_csv_match_has_json_actions(public_file):
+    match = load_csv_match(public_file('test-analista-local.csv'))
+
+    assert match['config']['source'] == 'analista'
+    assert match['actions'][0] == {
+        'min': '02:15', 'team': 'HOME', 'player': '10-MESSI', 'type': 'Pase',
+        'res': 'Completado', 'x': 35.0, 'y': 50.0, 'zone': 'Medio Centro',
+        'possession': 'pos_001'}
+
+
+def test_analista_metrics(public_file):
+    _, frame = load_csv_table(public_file('test-analista-local.csv'))
+    # Sin xG en el export: lo pone el modelo
+    assert fill_xg(frame) == 11
+    ids = possession_ids(frame)
+    team = metrics_table(frame, 'team').loc['HOME']
+
+    # La columna 'Posesion ID' manda sobre el corte por acciones
+    assert ids.max() + 1 == frame['possession'].nunique() == 15
+    assert team[['actions', 'possessions', 'shots', 'goals']].tolist() == [55, 15, 11, 3]
+    # Un solo equipo: todo el xG de sus disparos está en sus posesiones
+    assert team['xg'] > 0
+    assert team['xg_chain'] == pytest.approx(team['xg'])
+    assert team['xg_buildup'] <= team['xg_chain']
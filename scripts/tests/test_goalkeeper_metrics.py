@@ -0,0 +1,47 @@
+import pytest
+
+from goalkeeper_metrics import goalkeeper_report, goalkeeper_summary, load_goalkeeper_table
+
+
+@pytest.fixture
+def sample(public_file):
+    return load_goalkeeper_table([public_file('test-portero.csv')])
+
+
+def test_sample_counts_match_the_app(sample):
+    # Portero.html: goles = res 'GOL'; paradas = 'OK' en Defensa/Blocaje/Duelo
+    summary = goalkeeper_summary(sample, 'player')
+    ter_stegen = summary.loc['TER STEGEN']
+    courtois = summary.loc['COURTOIS']
+
+    assert summary['conceded'].sum() == 0
+    assert ter_stegen['saves'] == 9
+    assert courtois['saves'] == 5
+    assert ter_stegen['save_rate'] == 1.0
+    assert courtois['save_rate'] == 1.0
+    assert ter_stegen['xg_faced'] == pytest.approx(3.11, abs=1e-4)
+    assert ter_stegen['goals_prevented'] == pytest.approx(3.11, abs=1e-4)
+    assert ter_stegen['actions'] == 17
+
+
+def test_goals_and_save_rate(sample):
+    # Un gol en una acción de Defensa: paradas / (paradas + goles)
+    sample = sample.copy()
+    sample['res'] = sample['res'].cat.add_categories(['GOL'])
+    first = sample.index[sample['player'] == 'COURTOIS'][0]
+    sample.loc[first, 'res'] = 'GOL'
+    courtois = goalkeeper_summary(sample, 'player').loc['COURTOIS']
+
+    assert courtois['conceded'] == 1
+    assert courtois['saves'] == 5
+    assert courtois['save_rate'] == pytest.approx(5 / 6)
+    assert courtois['xg_conceded'] == pytest.approx(0.42, abs=1e-4)
+    assert courtois['goals_prevented'] == pytest.approx(courtois['xg_faced'] - 1)
+
+
+def test_report_json(sample):
+    report = goalkeeper_report(sample)
+
+    assert report['rows'] == 31
+    assert set(report['career']) == {'TER STEGEN', 'COURTOIS'}
+    assert report['zones']['public|TER STEGEN|MC']['Defensa'] == 6
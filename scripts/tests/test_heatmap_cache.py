@@ -0,0 +1,33 @@
+import base64
+import os
+import shutil
+
+import heatmap_cache
+
+PNG = base64.b64encode(b'png').decode()
+
+
+def write_entry(root, key):
+    writer = heatmap_cache.CacheWriter(key, str(root))
+    writer.add({'type': 'team_heatmap', 'image': PNG})
+    writer.add({'type': 'player', 'player': 'A', 'image': PNG, 'stats': {'total_actions': 3}})
+    writer.commit()
+
+
+def test_records_round_trip(tmp_path):
+    write_entry(tmp_path, 'ab' * 32)
+    meta = heatmap_cache.lookup('ab' * 32, str(tmp_path))
+    records = heatmap_cache.load_records('ab' * 32, meta, str(tmp_path))
+
+    assert [r['type'] for r in records] == ['team_heatmap', 'player']
+    assert records[1]['stats'] == {'total_actions': 3}
+
+
+def test_entry_evicted_after_lookup_is_a_miss(tmp_path):
+    key = 'cd' * 32
+    write_entry(tmp_path, key)
+    meta = heatmap_cache.lookup(key, str(tmp_path))
+    # Otro proceso expulsa la entrada entre lookup() y la lectura
+    shutil.rmtree(os.path.join(str(tmp_path), key[:2], key))
+
+    assert heatmap_cache.load_records(key, meta, str(tmp_path)) is None
@@ -0,0 +1,9 @@
+from live_heatmaps import _sessions, live_update
+
+
+def test_lost_session_without_json_file_asks_for_resync():
+    result = live_update({'session': 'perdida', 'actions': [{'id': 1, 'team': 'HOME'}]})
+
+    assert result['resync_required'] is True
+    # No queda una sesión a medias con solo el último lote
+    assert ('perdida', 'HOME') not in _sessions
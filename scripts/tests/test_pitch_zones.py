@@ -0,0 +1,29 @@
+import math
+
+import numpy as np
+import pytest
+
+from pitch_zones import zone_indices, zone_labels
+
+
+def lane_zone(x, y):
+    """getLaneZone() de AttackMetrics.html"""
+    lane = 'IZQUIERDO' if y < 33 else 'DERECHO' if y > 66 else 'CENTRAL'
+    zone = min(math.floor(x / 16.6) + 1, 6)
+    return f'Z{zone} {lane}'
+
+
+@pytest.mark.parametrize('x, y', [
+    (16.6, 50), (16.5, 50), (50, 33), (50, 32.9), (50, 66), (50, 66.1), (16.6, 66), (99.9, 10),
+])
+def test_6x3_matches_the_web_on_edges(x, y):
+    labels = zone_labels('6x3')
+    flat = zone_indices(np.array([x]), np.array([y]), '6x3')
+
+    assert labels[flat[0]] == lane_zone(x, y)
+
+
+def test_3x3_keeps_edges_in_the_upper_zone():
+    flat = zone_indices(np.array([33.3, 66.6]), np.array([66.6, 33.3]), '3x3')
+
+    assert [zone_labels('3x3')[i] for i in flat] == ['Medio - Derecha', 'Ofensivo - Centro']
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from match_frame import match_frame
+from possession_metrics import metrics_table, possession_ids
+
+
+def action(team, player, type_, res='Completado', x=50, xg=None):
+    return {'team': team, 'player': player, 'type': type_, 'res': res, 'x': x, 'y': 50, 'xg': xg}
+
+
+# Posesiones esperadas a mano: 0 = filas 0-2 (cierra el disparo fuera), 1 = filas
+# 3-4 (cierra la pérdida), 2 = filas 5-6 (rival), fila 7 fuera del campo y
+# 3 = filas 8-10
+ACTIONS = [
+    action('HOME', 'P1', 'Pase'),
+    action('HOME', 'P2', 'Pase'),
+    action('HOME', 'P3', 'Disparo', 'Fuera', xg=0.3),
+    action('HOME', 'P1', 'Pase'),
+    action('HOME', 'P2', 'Perdida', 'Fallado'),
+    action('AWAY', 'Q1', 'Pase'),
+    action('AWAY', 'Q2', 'Disparo', 'Gol', xg=0.5),
+    action('HOME', 'P1', 'Pase', x=-5),
+    action('HOME', 'P2', 'Pase'),
+    action('HOME', 'P3', 'Pase'),
+    action('HOME', 'P1', 'Disparo', 'Parada', xg=0.2),
+]
+
+
+def test_possessions_break_on_loss_failure_and_rival():
+    ids = possession_ids(match_frame(ACTIONS))
+
+    assert ids.tolist() == [0, 0, 0, 1, 1, 2, 2, -1, 3, 3, 3]
+
+
+def test_chain_and_buildup_by_player():
+    table = metrics_table(match_frame(ACTIONS))
+    chain = {player: value for (_, player), value in table['xg_chain'].items()}
+    buildup = {player: value for (_, player), value in table['xg_buildup'].items()}
+
+    # xGChain: todo el xG de cada posesión en la que aparece el jugador
+    assert chain == pytest.approx({'P1': 0.5, 'P2': 0.5, 'P3': 0.5, 'Q1': 0.5, 'Q2': 0.5})
+    # xGBuildup: sin el disparo ni la acción previa (P2 en la posesión 0, P3 y Q1
+    # en las suyas); P1 suma la posesión 0 por su pase inicial aunque tire en la 3
+    assert buildup == pytest.approx({'P1': 0.3, 'P2': 0.2, 'P3': 0.0, 'Q1': 0.0, 'Q2': 0.0})
+    assert table.loc[('HOME', 'P1'), 'possessions'] == 3
+
+
+def test_possession_column_follows_the_same_rules():
+    frame = pd.DataFrame({
+        'team': ['HOME', 'HOME', 'HOME', 'AWAY', 'HOME'],
+        'possession': ['pos_b', 'pos_b', 'pos_b', 'pos_a', 'pos_a'],
+        'x': np.array([40, -3, 60, 50, 70], dtype=np.float32),
+    })
+
+    # Orden de aparición (no el de las categorías) y x < 0 fuera
+    assert possession_ids(frame).tolist() == [0, -1, 0, 1, 2]
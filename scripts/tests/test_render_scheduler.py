@@ -0,0 +1,42 @@
+import pytest
+
+from render_scheduler import RENDER_TIERS, RenderScheduler, estimate_cost, tier_dpi
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_cheaper_tiers_cost_less_and_use_fewer_pixels():
+    costs = [estimate_cost(tier, 500) for tier in RENDER_TIERS]
+
+    assert costs == sorted(costs, reverse=True)
+    assert [tier_dpi(tier, 100) for tier in RENDER_TIERS] == [100, 70, 60, 50]
+
+
+def test_deadline_counts_from_request_start():
+    clock = FakeClock(now=1.9)
+    # La petición empezó en 0: lectura y densidades ya gastaron 1.9 de los 2 s
+    scheduler = RenderScheduler([('A', 500), ('B', 500), ('C', 500)], deadline=2.0,
+                                clock=clock, started=0.0)
+
+    assert scheduler.remaining_budget() == pytest.approx(0.1)
+    assert scheduler.tier_for('A') != 'kde'
+    assert scheduler.degraded
+
+
+def test_summary_reports_a_missed_deadline():
+    clock = FakeClock()
+    scheduler = RenderScheduler([('A', 500)], deadline=1.0, clock=clock)
+    scheduler.record('A', scheduler.tier_for('A'), 0.2)
+    assert scheduler.summary()['deadline_met'] is True
+
+    clock.now = 1.2
+    summary = scheduler.summary()
+    assert summary['deadline_met'] is False
+    assert summary['elapsed_s'] == 1.2
+    assert 'deadline_met' not in RenderScheduler([('A', 500)]).summary()
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+from match_generator import synthetic_match
+from season_store import INDEX_FILE, INDEX_LOCK_FILE, SeasonStore
+
+SEASON_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'season-heatmap.py')
+
+
+def write_match(directory, name, seed):
+    path = os.path.join(directory, f'AttackMetrics_{name}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(synthetic_match(400, seed=seed), f)
+    return path
+
+
+def test_concurrent_stores_keep_every_match(tmp_path):
+    first = write_match(tmp_path, 'A_vs_B_20250101', 1)
+    second = write_match(tmp_path, 'C_vs_D_20250108', 2)
+    root = str(tmp_path / 'store')
+    # Dos escritores que leyeron el índice antes de que el otro escribiera
+    one, two = SeasonStore(root), SeasonStore(root)
+    one.add_match(first)
+    two.add_match(second)
+
+    with open(os.path.join(root, INDEX_FILE), encoding='utf-8') as f:
+        matches = json.load(f)['matches']
+    assert sorted(matches) == ['AttackMetrics_A_vs_B_20250101', 'AttackMetrics_C_vs_D_20250108']
+    assert not os.path.exists(os.path.join(root, INDEX_LOCK_FILE))
+
+
+def test_stale_lock_is_taken_over(tmp_path):
+    root = tmp_path / 'store'
+    store = SeasonStore(str(root))
+    # Bloqueo de un proceso que ya no existe
+    (root / INDEX_LOCK_FILE).write_text('999999999')
+    store.add_match(write_match(tmp_path, 'A_vs_B_20250101', 1))
+
+    assert 'AttackMetrics_A_vs_B_20250101' in SeasonStore(str(root)).index['matches']
+
+
+def test_version_change_keeps_matches_for_rebuild(tmp_path):
+    root = str(tmp_path / 'store')
+    SeasonStore(root).add_match(write_match(tmp_path, 'A_vs_B_20250101', 1))
+    index_path = os.path.join(root, INDEX_FILE)
+    with open(index_path, encoding='utf-8') as f:
+        index = json.load(f)
+    index['version'] -= 1
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+
+    store = SeasonStore(root)
+    assert store.index['matches'] == {}
+    # Otro partido añadido antes del rebuild no borra los pendientes
+    store.add_match(write_match(tmp_path, 'C_vs_D_20250108', 2))
+    assert list(SeasonStore(root).index['stale']) == ['AttackMetrics_A_vs_B_20250101']
+
+    done, failed = SeasonStore(root).rebuild()
+    assert [entry['match_id'] for entry in done] == ['AttackMetrics_A_vs_B_20250101']
+    assert failed == []
+    rebuilt = SeasonStore(root).index
+    assert sorted(rebuilt['matches']) == ['AttackMetrics_A_vs_B_20250101',
+                                          'AttackMetrics_C_vs_D_20250108']
+    assert rebuilt['stale'] == {}
+
+
+def test_add_directory_skips_store_files_and_bad_exports(tmp_path):
+    write_match(tmp_path, 'A_vs_B_20250101', 1)
+    (tmp_path / 'AttackMetrics_C_vs_D_20250108.json').write_text('{roto')
+    (tmp_path / 'notas.json').write_text('{}')
+    root = str(tmp_path / 'store')
+    command = [sys.executable, SEASON_SCRIPT, '--store', root, 'add', str(tmp_path)]
+    # La segunda vez el almacén (dentro de la carpeta) ya tiene índice y métricas
+    for _ in range(2):
+        result = subprocess.run(command, capture_output=True, text=True)
+        assert result.returncode == 1
+        assert '[OK] AttackMetrics_A_vs_B_20250101' in result.stdout
+        assert 'AttackMetrics_C_vs_D_20250108.json' in result.stderr
+
+    assert list(SeasonStore(root).index['matches']) == ['AttackMetrics_A_vs_B_20250101']
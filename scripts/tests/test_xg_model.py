@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from csv_ingest import load_csv_table
+from match_frame import match_frame
+from xg_model import compare_reference, fill_xg, player_key, predict, shot_table
+
+
+def test_player_key_drops_shirt_number():
+    names = pd.Series(['10-MESSI', ' 9 - Depay ', 'GRIEZMANN'])
+    assert player_key(names).tolist() == ['MESSI', 'DEPAY', 'GRIEZMANN']
+
+
+def test_analista_shots_match_datahub_reference(public_file):
+    _, analista = load_csv_table(public_file('test-analista-local.csv'))
+    _, datahub = load_csv_table(public_file('test-datahub.csv'))
+    shots = shot_table(analista)
+    matched = compare_reference(shots, datahub)
+
+    assert len(shots) == 11
+    assert len(matched) == 11
+    # Mismo reloj en ambos exports: 145 s es el gol de MESSI (xG 0.42, xGOT 0.78)
+    first = matched.loc[matched['seconds'] == 145].iloc[0]
+    assert first['player'] == '10-MESSI'
+    assert first['xg_ref'] == pytest.approx(0.42)
+    assert first['xgot_ref'] == pytest.approx(0.78)
+
+
+def test_closer_and_more_central_shots_score_higher():
+    xg = predict([95, 85, 70, 85], [50, 50, 50, 20])
+    assert xg[0] > xg[1] > xg[2]
+    assert xg[1] > xg[3]
+    assert np.all((xg > 0) & (xg < 1))
+
+
+def test_fill_xg_only_fills_missing_shots():
+    frame = match_frame([
+        {'team': 'HOME', 'player': 'A', 'type': 'Disparo', 'x': 90, 'y': 50, 'xg': 0.3},
+        {'team': 'HOME', 'player': 'A', 'type': 'Disparo', 'x': 90, 'y': 50},
+        {'team': 'HOME', 'player': 'A', 'type': 'Pase', 'x': 50, 'y': 50},
+    ])
+    assert fill_xg(frame) == 1
+    assert frame['xg'].iloc[0] == pytest.approx(0.3)
+    assert frame['xg'].iloc[1] == pytest.approx(frame['xg_model'].iloc[1])
+    assert np.isnan(frame['xg'].iloc[2])
+    assert frame['xg_filled'].tolist() == [False, True, False]
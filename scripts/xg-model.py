@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Puntúa con el modelo de xG todos los disparos de uno o varios partidos
+Lee JSON de Attack Metrics o CSV (directorios incluidos, recursivo), puntúa
+todos los disparos en una sola llamada y resume por partido o por jugador el xG
+del modelo frente al del export. Con --reference compara además con el xG y
+xGOT de un CSV de DataHub (disparos casados por equipo, jugador y minuto).
+
+Uso:
+    python xg-model.py <json|csv|directorio>... [--by match|player] [--reference datahub.csv]
+                       [--shots]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from stage_timing import set_context, stage
+
+
+def match_paths(paths):
+    """Ficheros de partido indicados o encontrados en los directorios"""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(('.json', '.csv')):
+                    yield os.path.join(root, name)
+
+
+def summarize(shots, by='match'):
+    """{grupo: resumen} del xG del modelo frente al del export"""
+    from xg_model import xg_summary
+
+    summaries = {'total': xg_summary(shots)}
+    if len(shots):
+        for label, group in shots.groupby(by, sort=True):
+            summaries[str(label)] = xg_summary(group)
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="xG del modelo para los disparos de varios partidos")
+    parser.add_argument('paths', nargs='+', help="JSON o CSV de partidos, o directorios")
+    parser.add_argument('--by', choices=('match', 'player'), default='match')
+    parser.add_argument('--reference', default=None,
+                        help="CSV de DataHub con xG y xGOT para comparar")
+    parser.add_argument('--shots', action='store_true', help="incluye cada disparo en el JSON")
+    args = parser.parse_args()
+    set_context(script='xg-model')
+
+    from xg_model import compare_reference, score_archive, xg_summary
+
+    try:
+        paths = list(match_paths(args.paths))
+        with stage('xg_score', files=len(paths)) as info:
+            shots = score_archive(paths)
+            info['rows'] = len(shots)
+        result = {'model': summarize(shots, args.by)}
+        if args.reference:
+            from csv_ingest import load_csv_table
+
+            _, reference = load_csv_table(args.reference)
+            matched = compare_reference(shots, reference)
+            result['reference'] = {name: xg_summary(matched, column)
+                                   for name, column in (('xg', 'xg_ref'), ('xgot', 'xgot_ref'))}
+        if args.shots:
+            result['shots'] = json.loads(shots.to_json(orient='records', double_precision=3))
+    except (OSError, ValueError, KeyError) as e:
+        print(json.dumps({'error': str(e)}))
+        return 1
+    print(json.dumps(result, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
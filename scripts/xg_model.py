@@ -0,0 +1,248 @@
+"""
+Modelo de xG propio: regresión logística sobre distancia y ángulo a portería
+Los coeficientes se leen de xg_model.json (junto a este módulo), no del código,
+para poder recalibrarlos sin tocar nada más. Los disparos se reconocen con
+SHOT_TYPES de possession_metrics ('Disparo', 'Remate', 'Tiro', 'Gol') y todos
+los de un partido o de un archivo entero se puntúan en una sola llamada
+vectorizada.
+
+Coordenadas del JSON (0-100 en ambos ejes, ataque hacia x = 100, portería en
+y = 50) escaladas a un campo de 105 x 68 m. El ángulo es el que abarca la
+portería desde el punto del disparo; es simétrico en y, así que da igual que el
+eje Y esté invertido.
+"""
+
+import functools
+import json
+import os
+import re
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xg_model.json')
+
+# Segundos de margen al casar disparos con las filas de un CSV de DataHub
+MATCH_TOLERANCE_SECONDS = 30
+
+# Dorsal delante del nombre en los exports de AnalistaPro ('10-MESSI')
+_SHIRT_PREFIX = re.compile(r'^\s*\d+\s*-\s*')
+
+# Columnas que se conservan de cada disparo
+SHOT_COLUMNS = ('seconds', 'team', 'player', 'type', 'res', 'x', 'y', 'xg', 'xgot', 'xg_filled')
+
+
+@functools.lru_cache(maxsize=None)
+def load_model(path=MODEL_PATH):
+    """Coeficientes del modelo (JSON); cacheados por ruta"""
+    with open(path, 'r', encoding='utf-8') as f:
+        model = json.load(f)
+    missing = [name for name in model['features'] if name not in model['coefficients']]
+    if missing:
+        raise ValueError(f"{path}: faltan coeficientes para {', '.join(missing)}")
+    return model
+
+
+def shot_features(x, y, model=None):
+    """{'distance': metros, 'angle': radianes} de cada disparo"""
+    import numpy as np
+
+    pitch = (model or load_model())['pitch']
+    # Distancias en metros a la línea de gol y al centro de la portería
+    dx = (100 - np.asarray(x, dtype=np.float64)) * pitch['length'] / 100
+    dy = (np.asarray(y, dtype=np.float64) - 50) * pitch['width'] / 100
+    half = pitch['goal_width'] / 2
+    # Ángulo entre los dos postes (arctan2 lo mantiene en [0, π] también sobre la línea)
+    angle = np.arctan2(2 * half * dx, dx * dx + dy * dy - half * half)
+    return {'distance': np.hypot(dx, dy), 'angle': np.where(angle < 0, angle + np.pi, angle)}
+
+
+def predict(x, y, model=None):
+    """Probabilidad de gol de cada disparo (NaN sin coordenadas)"""
+    import numpy as np
+
+    model = model or load_model()
+    features = shot_features(x, y, model)
+    logit = np.full(len(features['distance']), model['intercept'], dtype=np.float64)
+    for name in model['features']:
+        logit += model['coefficients'][name] * features[name]
+    low, high = model.get('clip', (0.0, 1.0))
+    return np.clip(1 / (1 + np.exp(-logit)), low, high)
+
+
+def _labels(frame, name, labels):
+    """Máscara de filas cuya columna está en labels"""
+    import numpy as np
+    from match_frame import category_codes
+
+    if name not in frame:
+        return np.zeros(len(frame), dtype=bool)
+    return category_codes(frame[name], labels) >= 0
+
+
+def shot_mask(frame):
+    """Filas que son disparo"""
+    from possession_metrics import SHOT_TYPES
+
+    return _labels(frame, 'type', SHOT_TYPES)
+
+
+def _coordinates(frame):
+    import numpy as np
+
+    if 'x' not in frame or 'y' not in frame:
+        return np.full(len(frame), np.nan), np.full(len(frame), np.nan)
+    return (frame['x'].to_numpy(dtype=np.float64, na_value=np.nan),
+            frame['y'].to_numpy(dtype=np.float64, na_value=np.nan))
+
+
+def score_shots(frame, model=None):
+    """xG del modelo por fila (NaN en las filas que no son disparo)"""
+    import numpy as np
+
+    xg = np.full(len(frame), np.nan)
+    shots = shot_mask(frame)
+    if shots.any():
+        x, y = _coordinates(frame)
+        xg[shots] = predict(x[shots], y[shots], model)
+    return xg
+
+
+def fill_xg(frame, model=None):
+    """Añade 'xg_model' y rellena el 'xg' que falte en los disparos; devuelve cuántos rellenó
+
+    'xg_filled' marca las filas rellenadas, que no cuentan al comparar con el export.
+    """
+    import numpy as np
+
+    modelled = score_shots(frame, model)
+    frame['xg_model'] = modelled.astype(np.float32)
+    tagged = frame['xg'].to_numpy(dtype=np.float64, na_value=np.nan) if 'xg' in frame \
+        else np.full(len(frame), np.nan)
+    missing = np.isnan(tagged) & ~np.isnan(modelled)
+    frame['xg_filled'] = missing
+    if missing.any():
+        frame['xg'] = np.where(missing, modelled, tagged).astype(np.float32)
+    return int(missing.sum())
+
+
+def _shot_rows(frame):
+    """Disparos con las columnas de SHOT_COLUMNS que haya y 'goal'"""
+    from possession_metrics import GOAL_RESULTS
+
+    shots = frame[shot_mask(frame)]
+    table = shots[[c for c in SHOT_COLUMNS if c in shots]].copy()
+    for column in ('x', 'y', 'xg'):
+        if column not in table:
+            table[column] = float('nan')
+    table['goal'] = _labels(shots, 'res', GOAL_RESULTS) | _labels(shots, 'type', GOAL_RESULTS)
+    return table
+
+
+def shot_table(frame, model=None):
+    """Disparos con el xG del export ('xg') y el del modelo ('xg_model')"""
+    table = _shot_rows(frame)
+    table['xg_model'] = predict(*_coordinates(table), model)
+    return table
+
+
+def score_archive(paths, model=None):
+    """Disparos de varios partidos (JSON o CSV) puntuados en una sola llamada
+
+    Devuelve la tabla de shot_table con una columna 'match' (nombre del fichero).
+    """
+    import pandas as pd
+    from csv_ingest import is_csv, load_csv_table
+    from match_frame import load_match
+
+    tables = []
+    for path in paths:
+        if is_csv(path):
+            _, frame = load_csv_table(path)
+        else:
+            _, frame = load_match(path)
+        table = _shot_rows(frame)
+        # Texto plano: las categorías de cada partido no coinciden
+        table = table.astype({c: str for c in ('team', 'player', 'type', 'res') if c in table})
+        tables.append(table.assign(match=os.path.splitext(os.path.basename(path))[0]))
+    if not tables:
+        return pd.DataFrame(columns=['match', *SHOT_COLUMNS, 'goal', 'xg_model'])
+    shots = pd.concat(tables, ignore_index=True)
+    shots['xg_model'] = predict(*_coordinates(shots), model)
+    return shots
+
+
+def player_key(names):
+    """Nombres comparables entre exports: sin dorsal inicial, sin espacios sobrantes y en mayúsculas"""
+    return names.astype(str).str.replace(_SHIRT_PREFIX, '', regex=True).str.strip().str.upper()
+
+
+def compare_reference(shots, reference, tolerance=MATCH_TOLERANCE_SECONDS):
+    """Casa disparos con las filas de un CSV de DataHub (mismo equipo y jugador, segundo más cercano)
+
+    Los jugadores se comparan con player_key: AnalistaPro escribe '10-MESSI' y
+    DataHub 'MESSI'.
+
+    shots: tabla de shot_table / score_archive; reference: tabla de load_csv_table.
+    Devuelve los disparos casados con 'xg_ref' y 'xgot_ref'.
+    """
+    import pandas as pd
+
+    keys = ['team', 'player_key']
+    # Sin reloj (NaN o -1) no hay con qué casar
+    left = shots[shots['seconds'] >= 0]
+    left = left.assign(team=left['team'].astype(str), player_key=player_key(left['player']))
+    right = reference[reference['seconds'] >= 0]
+    right = right.assign(team=right['team'].astype(str), player_key=player_key(right['player']))
+    right = right[keys + ['seconds', 'xg', 'xgot']].rename(
+        columns={'xg': 'xg_ref', 'xgot': 'xgot_ref'})
+    merged = pd.merge_asof(left.astype({'seconds': 'int64'}).sort_values('seconds'),
+                           right.astype({'seconds': 'int64'}).sort_values('seconds'),
+                           on='seconds', by=keys, direction='nearest', tolerance=tolerance)
+    return merged.dropna(subset=['xg_ref']).drop(columns='player_key').reset_index(drop=True)
+
+
+def xg_summary(shots, reference_column=None, digits=3):
+    """Totales y error del modelo frente al xG del export (o frente a reference_column)"""
+    import numpy as np
+
+    reference_column = reference_column or 'xg'
+    model = shots['xg_model'].to_numpy(dtype=np.float64, na_value=np.nan)
+    reference = shots[reference_column].to_numpy(dtype=np.float64, na_value=np.nan) \
+        if reference_column in shots else np.full(len(shots), np.nan)
+    both = ~np.isnan(model) & ~np.isnan(reference)
+    if reference_column == 'xg' and 'xg_filled' in shots:
+        # El xG rellenado por el propio modelo no es una referencia
+        both &= ~shots['xg_filled'].to_numpy(dtype=bool)
+    summary = {
+        'shots': int(len(shots)),
+        'scored': int((~np.isnan(model)).sum()),
+        'xg_model': round(float(np.nansum(model)), digits),
+        'compared': int(both.sum()),
+    }
+    if both.any():
+        diff = model[both] - reference[both]
+        summary.update({
+            reference_column: round(float(reference[both].sum()), digits),
+            'mean_abs_diff': round(float(np.abs(diff).mean()), digits),
+            'bias': round(float(diff.mean()), digits),
+        })
+        if both.sum() > 1 and reference[both].std() > 0 and model[both].std() > 0:
+            summary['correlation'] = round(float(np.corrcoef(model[both], reference[both])[0, 1]),
+                                           digits)
+    if 'goal' in shots:
+        summary['goals'] = int(shots['goal'].sum())
+    return summary
+
+
+def draw_shot_map(ax, shots, column='xg', color='#c0392b', zorder=12):
+    """Disparos sobre un campo ya dibujado: tamaño según el xG, goles rellenos"""
+    import numpy as np
+
+    x = shots['x'].to_numpy(dtype=np.float64, na_value=np.nan)
+    y = shots['y'].to_numpy(dtype=np.float64, na_value=np.nan)
+    xg = np.nan_to_num(shots[column].to_numpy(dtype=np.float64, na_value=np.nan))
+    goal = shots['goal'].to_numpy(dtype=bool) if 'goal' in shots else np.zeros(len(shots), bool)
+    sizes = 60 + 1400 * xg
+    # Dos capas: fallados (huecos) y goles (rellenos)
+    ax.scatter(x[~goal], y[~goal], s=sizes[~goal], facecolors='none', edgecolors=color,
+               linewidths=1.5, alpha=0.8, zorder=zorder)
+    ax.scatter(x[goal], y[goal], s=sizes[goal], c=color, edgecolors='black', linewidths=1,
+               alpha=0.9, zorder=zorder + 1)